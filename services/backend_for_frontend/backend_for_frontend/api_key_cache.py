@@ -0,0 +1,178 @@
+import hashlib
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import UserAPIKey
+
+
+class VerifiedAPIKeyCache:
+    """
+    Process-local cache of API keys that already passed hash verification.
+
+    Entries are keyed by a SHA-256 digest of the raw key, so the key itself is
+    never kept in memory, and live for ``API_KEY_CACHE_TTL`` seconds. The
+    result is also memoized on the request, so authentication and permission
+    checks share a single verification.
+
+    Each entry remembers the key's version token, kept per key prefix in the
+    ``API_KEY_CACHE_ALIAS`` Django cache and checked on every hit. Saving or
+    deleting a key drops its token (see ``signals.py``), which invalidates the
+    entry in every process sharing that cache; with a per-process cache
+    backend, other processes keep accepting a revoked key for up to the TTL.
+    Expired keys are never served from the cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # digest -> (api_key, expires_at, token)
+        self._digests_by_prefix = {}  # api_key.prefix -> digest
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[settings.API_KEY_CACHE_ALIAS]
+
+    def get(self, raw_key, request=None):
+        """
+        Return the ``UserAPIKey`` matching ``raw_key`` with its user loaded, or
+        ``None`` if the key is unknown, revoked or does not verify.
+        """
+        memo = getattr(request, '_verified_api_key', None)
+        if memo is not None and memo[0] == raw_key:
+            return memo[1]
+
+        digest = hashlib.sha256(raw_key.encode()).hexdigest()
+        api_key = self._lookup(digest)
+        if api_key is None:
+            # Taken before verifying, so a revocation in between invalidates what is stored.
+            token = self._token(raw_key)
+            api_key = self._verify(raw_key)
+            if api_key is not None:
+                self._store(digest, api_key, token)
+
+        if request is not None:
+            request._verified_api_key = (raw_key, api_key)
+        return api_key
+
+    async def aget(self, raw_key, request=None):
+        """Async counterpart of ``get`` for async views."""
+        memo = getattr(request, '_verified_api_key', None)
+        if memo is not None and memo[0] == raw_key:
+            return memo[1]
+
+        digest = hashlib.sha256(raw_key.encode()).hexdigest()
+        api_key = self._lookup(digest)
+        if api_key is None:
+            token = self._token(raw_key)
+            api_key = await self._averify(raw_key)
+            if api_key is not None:
+                self._store(digest, api_key, token)
+
+        if request is not None:
+            request._verified_api_key = (raw_key, api_key)
+        return api_key
+
+    def invalidate(self, prefix):
+        """Drop the cached verification of the key with ``prefix``, here and in every process sharing the cache."""
+        self.backend.delete(self._token_key(prefix))
+        with self._lock:
+            digest = self._digests_by_prefix.pop(prefix, None)
+            if digest is not None:
+                self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._digests_by_prefix.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def _lookup(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+        if entry is not None:
+            api_key, expires_at, token = entry
+            if (expires_at > time.monotonic() and not api_key.has_expired
+                    and self.backend.get(self._token_key(api_key.prefix)) == token):
+                with self._lock:
+                    self.hits += 1
+                return api_key
+        with self._lock:
+            if entry is not None and self._entries.get(digest) is entry:
+                del self._entries[digest]
+                self._digests_by_prefix.pop(entry[0].prefix, None)
+            self.misses += 1
+        return None
+
+    def _token(self, raw_key):
+        if settings.API_KEY_CACHE_TTL <= 0:
+            return None
+        token_key = self._token_key(raw_key.partition('.')[0])
+        token = self.backend.get(token_key)
+        if token is None:
+            token = uuid.uuid4().hex
+            # add() keeps the token of a concurrent request that got there first.
+            if not self.backend.add(token_key, token, None):
+                token = self.backend.get(token_key) or token
+        return token
+
+    def _token_key(self, prefix):
+        return f'api-key:{prefix}:version'
+
+    def _verify(self, raw_key):
+        prefix, _, _ = raw_key.partition('.')
+        queryset = UserAPIKey.objects.get_usable_keys().select_related('user')
+        try:
+            api_key = queryset.get(prefix=prefix)
+        except UserAPIKey.DoesNotExist:
+            return None
+        # get_usable_keys() only leaves out revoked keys.
+        if api_key.has_expired:
+            return None
+        return api_key if api_key.is_valid(raw_key) else None
+
+    async def _averify(self, raw_key):
+        prefix, _, _ = raw_key.partition('.')
+        queryset = UserAPIKey.objects.get_usable_keys().select_related('user')
+        try:
+            api_key = await queryset.aget(prefix=prefix)
+        except UserAPIKey.DoesNotExist:
+            return None
+        if api_key.has_expired:
+            return None
+        # is_valid may re-hash and save the key, which needs the sync ORM.
+        is_valid = await sync_to_async(api_key.is_valid)(raw_key)
+        return api_key if is_valid else None
+
+    def _store(self, digest, api_key, token):
+        ttl = settings.API_KEY_CACHE_TTL
+        if ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= settings.API_KEY_CACHE_MAX_ENTRIES:
+                oldest_digest, (oldest_key, _, _) = next(iter(self._entries.items()))
+                del self._entries[oldest_digest]
+                self._digests_by_prefix.pop(oldest_key.prefix, None)
+            self._entries[digest] = (api_key, time.monotonic() + ttl, token)
+            self._digests_by_prefix[api_key.prefix] = digest
+
+
+api_key_cache = VerifiedAPIKeyCache()
+
+
+def get_raw_key(request):
+    """Extract the API key from the ``Authorization`` header, if any."""
+    api_key = request.headers.get('Authorization')
+    if api_key and api_key.startswith('Api-Key '):
+        api_key = api_key.split(' ')[1]
+    return api_key
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BackendForFrontendConfig(AppConfig):
     name = 'backend_for_frontend'
+
+    def ready(self):
+        from . import signals  # noqa: F401
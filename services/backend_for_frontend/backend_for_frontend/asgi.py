@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_for_frontend.settings')
+# Under ASGI each request's ORM calls run in a thread of their own, so a
+# persistent connection outlives its thread and piles up instead of being
+# reused; close them after every request unless told otherwise.
+os.environ.setdefault('POSTGRES_BACKEND_FOR_FRONTEND_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
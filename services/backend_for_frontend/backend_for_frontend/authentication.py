@@ -1,7 +1,10 @@
+import functools
+
+from django.http import JsonResponse
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
-from .models import UserAPIKey
+from .api_key_cache import api_key_cache, get_raw_key
 
 import logging
 
@@ -10,23 +13,19 @@ logger = logging.getLogger(__name__)
 
 class APIKeyAuthentication(BaseAuthentication):
     def authenticate(self, request):
-        api_key = request.headers.get('Authorization')
+        api_key = get_raw_key(request)
 
         if not api_key:
             logger.debug('No API key provided')
             return None  # No se proporciona API key
 
-        # Remover el prefijo 'Api-Key' si se está usando
-        if api_key.startswith('Api-Key '):
-            api_key = api_key.split(' ')[1]
-
-        try:
-            api_key_obj = UserAPIKey.objects.get_from_key(api_key)
-        except UserAPIKey.DoesNotExist:
+        # La verificación se comparte con HasCustomAPIKey y se cachea por TTL.
+        api_key_obj = api_key_cache.get(api_key, request)
+        if api_key_obj is None:
             logger.debug('Invalid API key provided')
             raise AuthenticationFailed('Invalid API key')
 
-        # Obtener el usuario asociado a la clave API.
+        # Obtener el usuario asociado a la clave API (cargado con select_related).
         user = api_key_obj.user
         if user is None:
             logger.debug('No user associated with this API key')
@@ -34,3 +33,26 @@ class APIKeyAuthentication(BaseAuthentication):
 
         logger.debug('User authenticated successfully')
         return (user, api_key_obj)
+
+
+def async_api_key_required(view):
+    """
+    API key authentication for async (non-DRF) views, with the same rules as
+    ``APIKeyAuthentication`` + ``HasCustomAPIKey``.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        api_key = get_raw_key(request)
+        if not api_key:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+        api_key_obj = await api_key_cache.aget(api_key, request)
+        if api_key_obj is None or api_key_obj.revoked or api_key_obj.user is None:
+            logger.debug('Invalid API key provided')
+            return JsonResponse({'detail': 'Invalid API key'}, status=403)
+
+        request.user = api_key_obj.user
+        request.auth = api_key_obj
+        return await view(request, *args, **kwargs)
+
+    return wrapper
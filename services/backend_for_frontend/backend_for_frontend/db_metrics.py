@@ -0,0 +1,40 @@
+from django.db import connections
+
+
+def connection_stats(alias='default'):
+    """
+    Connection saturation of the Postgres server behind ``alias``: the
+    server-wide limit and usage, and this database's sessions by state, read
+    from ``pg_stat_activity``.
+    """
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT current_setting('max_connections')::int, "
+                       "current_setting('superuser_reserved_connections')::int")
+        max_connections, reserved = cursor.fetchone()
+        cursor.execute(
+            "SELECT count(*) FROM pg_stat_activity WHERE backend_type = 'client backend'"
+        )
+        in_use = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT coalesce(state, 'unknown'), count(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_type = 'client backend' GROUP BY 1"
+        )
+        by_state = dict(cursor.fetchall())
+
+    available = max_connections - reserved
+    settings_dict = connection.settings_dict
+    return {
+        'max_connections': available,
+        'in_use': in_use,
+        'saturation': round(in_use / available, 4) if available else None,
+        'database': {
+            'active': by_state.pop('active', 0),
+            'idle': by_state.pop('idle', 0),
+            'idle_in_transaction': by_state.pop('idle in transaction', 0)
+            + by_state.pop('idle in transaction (aborted)', 0),
+            'other': sum(by_state.values()),
+        },
+        'conn_max_age': settings_dict['CONN_MAX_AGE'],
+        'conn_health_checks': settings_dict['CONN_HEALTH_CHECKS'],
+    }
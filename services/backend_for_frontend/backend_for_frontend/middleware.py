@@ -0,0 +1,63 @@
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from .api_key_cache import get_raw_key
+from .routers import replica_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _pin_key(request):
+    raw_key = get_raw_key(request)
+    if not raw_key:
+        return None
+    return 'replica-pin:' + hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of safe requests to the replicas, except for clients that
+    wrote in the last ``READ_YOUR_WRITES_SECONDS``: those keep reading from
+    the primary so they see their own writes despite replication lag.
+
+    Clients are told apart by their API key. The pins live in the default
+    cache, which must be shared between workers for the window to hold across
+    processes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pin_key = _pin_key(request)
+        use_replica = self._may_use_replica(request) and (pin_key is None or cache.get(pin_key) is None)
+        with replica_reads(use_replica):
+            response = self.get_response(request)
+        if self._should_pin(request, pin_key):
+            cache.set(pin_key, True, settings.READ_YOUR_WRITES_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        pin_key = _pin_key(request)
+        use_replica = self._may_use_replica(request) and (pin_key is None or await cache.aget(pin_key) is None)
+        with replica_reads(use_replica):
+            response = await self.get_response(request)
+        if self._should_pin(request, pin_key):
+            await cache.aset(pin_key, True, settings.READ_YOUR_WRITES_SECONDS)
+        return response
+
+    def _may_use_replica(self, request):
+        return bool(settings.REPLICA_DATABASES) and request.method in SAFE_METHODS
+
+    def _should_pin(self, request, pin_key):
+        return (pin_key is not None and request.method not in SAFE_METHODS
+                and settings.READ_YOUR_WRITES_SECONDS > 0)
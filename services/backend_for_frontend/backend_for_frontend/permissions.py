@@ -1,20 +1,17 @@
 from rest_framework.permissions import BasePermission
-from .models import UserAPIKey
+
+from .api_key_cache import api_key_cache, get_raw_key
 
 
 class HasCustomAPIKey(BasePermission):
     def has_permission(self, request, view):
-        api_key = request.headers.get('Authorization')
+        api_key = get_raw_key(request)
 
         if not api_key:
             return False
 
-        if api_key.startswith('Api-Key '):
-            api_key = api_key.split(' ')[1]
-
-        try:
-            api_key_obj = UserAPIKey.objects.get_from_key(api_key)
-        except UserAPIKey.DoesNotExist:
+        api_key_obj = api_key_cache.get(api_key, request)
+        if api_key_obj is None:
             return False
 
         return not api_key_obj.revoked
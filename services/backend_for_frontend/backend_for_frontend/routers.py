@@ -0,0 +1,49 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Allow (or, with ``enabled=False``, forbid) replica reads inside the block."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def use_primary():
+    return replica_reads(False)
+
+
+class ReplicaRouter:
+    """
+    Send reads to one of ``settings.REPLICA_DATABASES`` and everything else to
+    ``default``.
+
+    Replica reads are opt-in: they only happen inside ``replica_reads()``,
+    which ``ReplicaRoutingMiddleware`` opens for safe requests. Writes, row
+    locks, management commands and the checks done by POST/PUT/PATCH/DELETE
+    requests always see the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.REPLICA_DATABASES and _replica_reads.get():
+            return random.choice(settings.REPLICA_DATABASES)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
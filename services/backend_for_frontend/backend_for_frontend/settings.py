@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend_for_frontend.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend_for_frontend.urls'
@@ -87,9 +88,66 @@ DATABASES = {
         'USER': os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_USER', 'main_ms'),
         'PASSWORD': os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_PASSWORD', 'test'),
         'HOST': os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_HOST', '127.0.0.1'),
-        'PORT': 5432,
+        'PORT': int(os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_PORT', 5432)),
+        # Persistent connections: each worker thread keeps its connection for
+        # CONN_MAX_AGE seconds instead of reconnecting on every request, and
+        # checks it is still usable before reusing it. asgi.py defaults it to 0.
+        'CONN_MAX_AGE': int(os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_CONN_HEALTH_CHECKS', 'true').lower() == 'true',
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_CONNECT_TIMEOUT', 5)),
+            # Server side limit for sessions left idle inside a transaction (ms, 0 disables it).
+            'options': '-c idle_in_transaction_session_timeout=%d' % int(
+                os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_IDLE_IN_TRANSACTION_TIMEOUT', 60000)
+            ),
+        },
+    },
+}
+
+# Read replicas: comma separated hosts, same credentials as the primary. Safe
+# requests read from them (see backend_for_frontend/routers.py); tests mirror
+# them onto the default test database.
+REPLICA_DATABASES = []
+for index, host in enumerate(filter(None, os.environ.get('POSTGRES_BACKEND_FOR_FRONTEND_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(alias)
+
+# Without replica hosts, 'replica' is a second alias onto the primary (a test
+# mirror of default). Nothing reads from it unless REPLICA_DATABASES names it,
+# which the tests do to exercise the routing without a second server.
+if not REPLICA_DATABASES:
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['backend_for_frontend.routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after one of its writes.
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('BACKEND_FOR_FRONTEND_READ_YOUR_WRITES_SECONDS', 5))
+
+# Cache: local memory by default; point BACKEND_FOR_FRONTEND_CACHE_BACKEND at
+# any Django cache backend (file based, Redis, Memcached) to share it between
+# workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('BACKEND_FOR_FRONTEND_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('BACKEND_FOR_FRONTEND_CACHE_LOCATION', 'backend-for-frontend'),
     },
 }
+if CACHES['default']['BACKEND'].endswith(('LocMemCache', 'FileBasedCache')):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('BACKEND_FOR_FRONTEND_CACHE_MAX_ENTRIES', 10000)),
+    }
+
+# Response cache for balances, detail rows and per-payment listings (see
+# loan/cache.py); 0 disables it.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TTL = int(os.environ.get('BACKEND_FOR_FRONTEND_RESPONSE_CACHE_TTL', 300))
+
+# Idempotency-Key replay store for create endpoints (see loan/idempotency.py).
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+IDEMPOTENCY_TTL = int(os.environ.get('BACKEND_FOR_FRONTEND_IDEMPOTENCY_TTL', 86400))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('BACKEND_FOR_FRONTEND_IDEMPOTENCY_LOCK_TIMEOUT', 30))
+IDEMPOTENCY_WAIT = int(os.environ.get('BACKEND_FOR_FRONTEND_IDEMPOTENCY_WAIT', 10))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -148,9 +206,64 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework_api_key.permissions.HasAPIKey',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'loan.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('BACKEND_FOR_FRONTEND_PAGE_SIZE', 100)),
 }
 
+PAGINATION_MAX_PAGE_SIZE = int(os.environ.get('BACKEND_FOR_FRONTEND_MAX_PAGE_SIZE', 1000))
+
+# Rows fetched per round trip by the streaming export endpoints.
+EXPORT_CHUNK_SIZE = int(os.environ.get('BACKEND_FOR_FRONTEND_EXPORT_CHUNK_SIZE', 2000))
+# Seconds the export watermark is set back so incremental pulls overlap; must
+# exceed the longest write transaction, or rows committed late are skipped.
+EXPORT_WATERMARK_LAG = int(os.environ.get('BACKEND_FOR_FRONTEND_EXPORT_WATERMARK_LAG', 60))
+
+# Bulk endpoints: largest accepted batch and rows per INSERT/UPDATE statement.
+BULK_MAX_ITEMS = int(os.environ.get('BACKEND_FOR_FRONTEND_BULK_MAX_ITEMS', 10000))
+BULK_BATCH_SIZE = int(os.environ.get('BACKEND_FOR_FRONTEND_BULK_BATCH_SIZE', 1000))
+
 
 # 
 
 SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY = 'erfvGJKGHJbKJHV'
+
+
+# Verified API key cache (see backend_for_frontend/api_key_cache.py). Revoking
+# or deleting a key reaches other worker processes through API_KEY_CACHE_ALIAS;
+# with a per-process backend (the LocMemCache default) they keep accepting the
+# key for up to API_KEY_CACHE_TTL seconds.
+API_KEY_CACHE_ALIAS = 'default'
+API_KEY_CACHE_TTL = int(os.environ.get('BACKEND_FOR_FRONTEND_API_KEY_CACHE_TTL', 60))
+API_KEY_CACHE_MAX_ENTRIES = int(os.environ.get('BACKEND_FOR_FRONTEND_API_KEY_CACHE_MAX_ENTRIES', 10000))
+
+# Payment allocation: 'sync' allocates inside the request, 'async' queues the
+# payment for the allocation workers (manage.py run_allocation_workers).
+PAYMENT_ALLOCATION = os.environ.get('BACKEND_FOR_FRONTEND_PAYMENT_ALLOCATION', 'sync')
+ALLOCATION_WORKERS = int(os.environ.get('BACKEND_FOR_FRONTEND_ALLOCATION_WORKERS', 4))
+ALLOCATION_BATCH_CUSTOMERS = int(os.environ.get('BACKEND_FOR_FRONTEND_ALLOCATION_BATCH_CUSTOMERS', 100))
+ALLOCATION_MAX_ATTEMPTS = int(os.environ.get('BACKEND_FOR_FRONTEND_ALLOCATION_MAX_ATTEMPTS', 5))
+ALLOCATION_POLL_INTERVAL = float(os.environ.get('BACKEND_FOR_FRONTEND_ALLOCATION_POLL_INTERVAL', 1))
+
+# Change feed (GET /loan/api/v1/events/): longest ?wait= a long-poll may ask
+# for, how often it looks for new events, and how long compact_outbox keeps them.
+EVENTS_MAX_WAIT = int(os.environ.get('BACKEND_FOR_FRONTEND_EVENTS_MAX_WAIT', 30))
+EVENTS_POLL_INTERVAL = float(os.environ.get('BACKEND_FOR_FRONTEND_EVENTS_POLL_INTERVAL', 0.5))
+OUTBOX_RETENTION_DAYS = int(os.environ.get('BACKEND_FOR_FRONTEND_OUTBOX_RETENTION_DAYS', 7))
+
+# Seconds a portfolio report (GET /loan/api/v1/reports/portfolio/) is cached per as-of date.
+PORTFOLIO_REPORT_CACHE_TTL = int(os.environ.get('BACKEND_FOR_FRONTEND_PORTFOLIO_REPORT_CACHE_TTL', 900))
+
+# Overdue loan sweeper (manage.py sweep_overdue_loans): days past the maximum
+# payment date before an overdue loan is defaulted, loan ids per chunk and
+# seconds to pause between chunks.
+LOAN_DEFAULT_AFTER_DAYS = int(os.environ.get('BACKEND_FOR_FRONTEND_LOAN_DEFAULT_AFTER_DAYS', 90))
+LOAN_SWEEP_CHUNK_SIZE = int(os.environ.get('BACKEND_FOR_FRONTEND_LOAN_SWEEP_CHUNK_SIZE', 5000))
+LOAN_SWEEP_PAUSE = float(os.environ.get('BACKEND_FOR_FRONTEND_LOAN_SWEEP_PAUSE', 0.1))
+
+# Loans per transaction when generating installment schedules (manage.py generate_schedules).
+SCHEDULE_CHUNK_SIZE = int(os.environ.get('BACKEND_FOR_FRONTEND_SCHEDULE_CHUNK_SIZE', 10000))
+
+# Daily interest and late fee accrual (manage.py accrue_loans): loan ids per
+# chunk and seconds to pause between chunks.
+ACCRUAL_CHUNK_SIZE = int(os.environ.get('BACKEND_FOR_FRONTEND_ACCRUAL_CHUNK_SIZE', 5000))
+ACCRUAL_PAUSE = float(os.environ.get('BACKEND_FOR_FRONTEND_ACCRUAL_PAUSE', 0.1))
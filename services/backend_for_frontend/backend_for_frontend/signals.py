@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .api_key_cache import api_key_cache
+from .models import UserAPIKey
+
+
+@receiver(post_save, sender=UserAPIKey)
+@receiver(post_delete, sender=UserAPIKey)
+def invalidate_cached_api_key(sender, instance, **kwargs):
+    # Revocar o borrar una clave la saca de la cache de inmediato.
+    api_key_cache.invalidate(instance.prefix)
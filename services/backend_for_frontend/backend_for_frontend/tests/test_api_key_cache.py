@@ -0,0 +1,87 @@
+# backend_for_frontend/tests/test_api_key_cache.py
+import json
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from backend_for_frontend.api_key_cache import api_key_cache
+from backend_for_frontend.models import UserAPIKey
+
+
+class VerifiedAPIKeyCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        api_key_cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.customer_url = reverse('customer-list')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+    def test_key_is_verified_once_across_requests(self):
+        with mock.patch.object(UserAPIKey, 'is_valid', autospec=True, return_value=True) as is_valid:
+            self.assertEqual(self.client.get(self.customer_url).status_code, 200)
+            self.assertEqual(self.client.get(self.customer_url).status_code, 200)
+
+        self.assertEqual(is_valid.call_count, 1)
+        self.assertEqual(api_key_cache.stats()['misses'], 1)
+        self.assertEqual(api_key_cache.stats()['hits'], 1)
+
+    def test_cached_request_does_not_query_api_keys(self):
+        self.client.get(self.customer_url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.customer_url)
+        api_key_table = UserAPIKey._meta.db_table
+        self.assertFalse(any(api_key_table in query['sql'] for query in queries))
+
+    def test_revoked_key_is_rejected_immediately(self):
+        self.assertEqual(self.client.get(self.customer_url).status_code, 200)
+
+        api_key = UserAPIKey.objects.get(prefix=self.admin_api_key.split('.')[0])
+        api_key.revoked = True
+        api_key.save()
+
+        self.assertEqual(self.client.get(self.customer_url).status_code, 403)
+
+    def test_deleted_key_is_rejected_immediately(self):
+        self.assertEqual(self.client.get(self.customer_url).status_code, 200)
+
+        UserAPIKey.objects.filter(prefix=self.admin_api_key.split('.')[0]).delete()
+
+        self.assertEqual(self.client.get(self.customer_url).status_code, 403)
+
+    def test_key_revoked_by_another_process_is_rejected(self):
+        self.assertEqual(self.client.get(self.customer_url).status_code, 200)
+
+        # The revoking process saved the key and dropped its token from the shared cache.
+        prefix = self.admin_api_key.split('.')[0]
+        UserAPIKey.objects.filter(prefix=prefix).update(revoked=True)
+        cache.delete(f'api-key:{prefix}:version')
+
+        self.assertEqual(self.client.get(self.customer_url).status_code, 403)
+
+    def test_key_expiring_while_cached_is_rejected(self):
+        expiry_date = timezone.now() + timedelta(hours=1)
+        UserAPIKey.objects.filter(prefix=self.admin_api_key.split('.')[0]).update(expiry_date=expiry_date)
+        self.assertEqual(self.client.get(self.customer_url).status_code, 200)
+
+        later = expiry_date + timedelta(minutes=1)
+        with mock.patch('rest_framework_api_key.models.timezone.now', return_value=later):
+            self.assertEqual(self.client.get(self.customer_url).status_code, 403)
+
+    def test_invalid_key_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key invalid.key')
+        self.assertEqual(self.client.get(self.customer_url).status_code, 403)
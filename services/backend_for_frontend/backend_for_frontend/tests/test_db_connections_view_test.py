@@ -0,0 +1,43 @@
+# backend_for_frontend/tests/test_db_connections_view_test.py
+import json
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.conf import settings
+from backend_for_frontend.models import UserAPIKey
+from django.contrib.auth.models import User
+
+
+class DatabaseConnectionsViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.db_connections_url = reverse('db-connections')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Reads pg_stat_activity')
+    def test_admin_can_read_saturation(self):
+        response = self.client.get(self.db_connections_url)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertGreaterEqual(data['in_use'], 1)
+        self.assertGreaterEqual(data['database']['active'], 1)
+        self.assertEqual(data['saturation'], round(data['in_use'] / data['max_connections'], 4))
+        self.assertEqual(data['conn_max_age'], settings.DATABASES['default']['CONN_MAX_AGE'])
+
+    def test_non_admin_is_denied(self):
+        user = User.objects.create_user(username='user', password='userpassword')
+        _, key = UserAPIKey.objects.create_key(name=user.username, user=user)
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + key)
+        response = self.client.get(self.db_connections_url)
+        self.assertEqual(response.status_code, 403)
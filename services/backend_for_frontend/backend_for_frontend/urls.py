@@ -16,12 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from .views import RegisterAdminView, RegisterUserView
+from .views import CacheStatsView, DatabaseConnectionsView, RegisterAdminView, RegisterUserView
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('loan/api/v1/async/', include('loan.async_urls')),
     path('loan/api/v1/', include('loan.urls')),
     path('register-admin/', RegisterAdminView.as_view(), name='register-admin'),
     path('register-user/', RegisterUserView.as_view(), name='register-user'),
+    path('metrics/db-connections/', DatabaseConnectionsView.as_view(), name='db-connections'),
+    path('metrics/cache/', CacheStatsView.as_view(), name='cache-stats'),
 ]
@@ -1,12 +1,17 @@
 from django.contrib.auth.models import User
 from django.http import JsonResponse
 from django.conf import settings
+from django.db import connection
 
 from rest_framework_api_key.models import APIKey
 from rest_framework.views import APIView
 from rest_framework_api_key.permissions import HasAPIKey
 
+from loan.cache import response_cache
+
+from .api_key_cache import api_key_cache
 from .authentication import APIKeyAuthentication
+from .db_metrics import connection_stats
 from .permissions import HasCustomAPIKey
 from .models import UserAPIKey
 
@@ -65,3 +70,26 @@ class RegisterUserView(APIView):
         
         return JsonResponse({'message': 'User created successfully', 'api_key': key}, status=201)
 
+
+class DatabaseConnectionsView(APIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasCustomAPIKey]
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_superuser:
+            return JsonResponse({'error': 'Permission denied. Only admins can read database metrics.'}, status=403)
+        if connection.vendor != 'postgresql':
+            return JsonResponse({'error': 'Connection metrics are only available on PostgreSQL'}, status=501)
+
+        return JsonResponse(connection_stats())
+
+
+class CacheStatsView(APIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasCustomAPIKey]
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_superuser:
+            return JsonResponse({'error': 'Permission denied. Only admins can read cache metrics.'}, status=403)
+
+        return JsonResponse({'api_keys': api_key_cache.stats(), 'responses': response_cache.stats()})
@@ -0,0 +1,78 @@
+"""
+Compare the serializer + stdlib JSON path with the ``RowReader`` + orjson
+fast path used by the list endpoints, on in-memory rows (no database), and
+check that both produce the same bytes.
+
+    DJANGO_MICROSERVICES_SECRET_KEY=x python benchmarks/serialization.py --rows 10000
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_for_frontend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from loan.models import Loan  # noqa: E402
+from loan.readers import row_reader  # noqa: E402
+from loan.renderers import ORJSONRenderer  # noqa: E402
+from loan.serializers import LoanSerializer  # noqa: E402
+
+
+def make_rows(count):
+    now = datetime.datetime(2024, 2, 12, 22, 29, 27, 177914, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            'id': i, 'external_id': f'external_{i:06}', 'amount': Decimal('1000.00'), 'status': 1,
+            'contract_version': '1.0', 'maximum_payment_date': now, 'taken_at': None, 'customer': i % 97 + 1,
+            'outstanding': Decimal('250.50'), 'created_at': now, 'updated_at': now,
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    reader = row_reader(LoanSerializer)
+    # Same key order as the .values(*reader.field_names) rows of the endpoints.
+    rows = [{name: row[name] for name in reader.field_names} for row in make_rows(args.rows)]
+    attnames = {'customer': 'customer_id'}
+    instances = [Loan(**{attnames.get(key, key): value for key, value in row.items()}) for row in rows]
+
+    def serializer_path():
+        return JSONRenderer().render(LoanSerializer(instances, many=True).data)
+
+    def fast_path():
+        return ORJSONRenderer().render(reader.convert([dict(row) for row in rows]))
+
+    slow_time, slow_bytes = best_of(args.repeat, serializer_path)
+    fast_time, fast_bytes = best_of(args.repeat, fast_path)
+
+    print(f'rows: {args.rows}  identical output: {slow_bytes == fast_bytes}')
+    print(f'serializer + json:   {slow_time * 1000:8.1f} ms')
+    print(f'row reader + orjson: {fast_time * 1000:8.1f} ms  ({slow_time / fast_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare WSGI and ASGI throughput of the read endpoints at a fixed concurrency.
+
+Start the same code base twice, e.g. (one process each, so the numbers compare
+a single worker):
+
+    gunicorn backend_for_frontend.wsgi -b 127.0.0.1:8001 -w 1 --threads 32
+    uvicorn backend_for_frontend.asgi:application --port 8002 --workers 1
+
+and run:
+
+    python benchmarks/wsgi_vs_asgi.py --api-key <key> \\
+        --target wsgi=http://127.0.0.1:8001/loan/api/v1/loans/ \\
+        --target asgi=http://127.0.0.1:8002/loan/api/v1/async/loans/
+
+Both list endpoints read ``.values()`` rows through the same ``RowReader``
+and render them with the same orjson renderer, so the server model is the
+only difference between the two targets.
+
+Each target gets ``--requests`` GETs from ``--concurrency`` in-flight clients;
+the script prints requests per second and latency percentiles. Only the
+standard library is used, so it runs from any machine that can reach the
+servers.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def run_target(url, api_key, concurrency, total):
+    parts = urlsplit(url)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    headers = {'Authorization': 'Api-Key ' + api_key, 'Connection': 'keep-alive'}
+    remaining = iter(range(total))
+    lock = threading.Lock()
+    latencies = []
+    failures = []
+
+    def client():
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(parts.hostname, parts.port, timeout=30)
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    break
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                (latencies if ok else failures).append(elapsed)
+        connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    wall = time.perf_counter() - started
+    return wall, latencies, failures
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL')
+    parser.add_argument('--api-key', required=True)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--warmup', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f'{"target":<8} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for target in args.target:
+        name, _, url = target.partition('=')
+        run_target(url, args.api_key, min(args.concurrency, args.warmup), args.warmup)
+        wall, latencies, failures = run_target(url, args.api_key, args.concurrency, args.requests)
+        print(f'{name:<8} {len(latencies) / wall:>9.1f} '
+              f'{statistics.median(latencies) * 1000 if latencies else float("nan"):>8.1f} '
+              f'{percentile(latencies, 0.95) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} '
+              f'{len(failures):>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import datetime
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count, DecimalField, Exists, ExpressionWrapper, F, Max, Min, OuterRef, Subquery, Sum
+)
+from django.utils import timezone
+
+from .cache import response_cache
+from .ledger import apply_balance_deltas, lock_balances
+from .models import ContractTerms, Loan, LoanAccrual, SweepCheckpoint
+from .outbox import record_events
+
+# Disbursed loans that still owe something; Pending loans do not accrue yet.
+ACCRUING_STATUSES = [2, 5, 6]
+RATE_SCALE = 1_000_000
+DAY_COUNT = 365
+
+
+def daily_charges(outstanding, annual_rate, late_fee_rate, late):
+    """
+    One day of interest and late fee for every loan at once, in integer cents.
+
+    ``outstanding`` is in cents and the rates are annual, in millionths
+    (``ContractTerms`` keeps six decimals), so ``outstanding * rate`` stays
+    exact in int64 for any rate up to ``MAX_ANNUAL_RATE`` (400%, enforced on
+    ``ContractTerms``) on the largest amount a loan can hold, and each charge
+    is rounded half up to the cent with integer arithmetic. The late fee only applies where ``late`` is true.
+    """
+    outstanding = np.asarray(outstanding, dtype=np.int64)
+    denominator = DAY_COUNT * RATE_SCALE
+    interest = (2 * outstanding * np.asarray(annual_rate, dtype=np.int64) + denominator) // (2 * denominator)
+    fee = (2 * outstanding * np.asarray(late_fee_rate, dtype=np.int64) + denominator) // (2 * denominator)
+    return interest, np.where(late, fee, 0)
+
+
+def accrue_loans(accrual_date, chunk_size=None, pause=None, max_chunks=None):
+    """
+    Accrue one day of interest and late fees on every disbursed loan with an
+    outstanding balance, for ``accrual_date``.
+
+    Loans are walked in id ranges of ``chunk_size``. Each chunk is one
+    transaction that locks the customers' ledger rows, reads the loans, computes
+    the charges with ``daily_charges``, bulk inserts the ``LoanAccrual`` rows and
+    adds them to ``outstanding`` with a single ``UPDATE``, recording a
+    ``loan.accrued`` event per charged loan. The pass keeps a
+    checkpoint per date, so a crashed run resumes where it stopped and a
+    finished date is not walked again; loans that already have an accrual for
+    the date are left out of every chunk, and the unique constraint on
+    ``(loan, accrual_date)`` backs that up. Returns the checkpoint.
+    """
+    chunk_size = chunk_size or settings.ACCRUAL_CHUNK_SIZE
+    pause = settings.ACCRUAL_PAUSE if pause is None else pause
+
+    checkpoint = _start_pass(accrual_date)
+    max_id = Loan.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    chunks = 0
+    while (checkpoint.finished_at is None and checkpoint.last_id < max_id
+           and (max_chunks is None or chunks < max_chunks)):
+        if chunks and pause:
+            time.sleep(pause)
+        checkpoint = _accrue_chunk(checkpoint.pk, accrual_date, chunk_size, max_id)
+        chunks += 1
+
+    if checkpoint.last_id >= max_id and checkpoint.finished_at is None:
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=['finished_at', 'updated_at'])
+    return checkpoint
+
+
+def accrual_totals(accrual_date):
+    """Loans accrued on ``accrual_date`` and the interest and fees charged."""
+    return LoanAccrual.objects.filter(accrual_date=accrual_date).aggregate(
+        loans=Count('id'), interest=Sum('interest'), fee=Sum('fee'))
+
+
+def _start_pass(accrual_date):
+    # Accruals of a date cover the loans that existed by the end of that day.
+    end_of_day = timezone.make_aware(datetime.datetime.combine(accrual_date + datetime.timedelta(days=1),
+                                                               datetime.time.min))
+    before_first = (Loan.objects.aggregate(min_id=Min('id'))['min_id'] or 1) - 1
+    checkpoint, _ = SweepCheckpoint.objects.get_or_create(
+        name=f'accrual:{accrual_date.isoformat()}',
+        defaults={'as_of': end_of_day, 'started_at': timezone.now(), 'last_id': before_first},
+    )
+    return checkpoint
+
+
+def _accrue_chunk(checkpoint_id, accrual_date, chunk_size, max_id):
+    with transaction.atomic():
+        checkpoint = SweepCheckpoint.objects.select_for_update().get(pk=checkpoint_id)
+        first_id = checkpoint.last_id + 1
+        last_id = min(checkpoint.last_id + chunk_size, max_id)
+        if first_id > last_id:
+            return checkpoint
+
+        accruing = Loan.objects.filter(
+            id__range=(first_id, last_id), status__in=ACCRUING_STATUSES, outstanding__gt=0,
+            created_at__lt=checkpoint.as_of,
+        ).exclude(Exists(LoanAccrual.objects.filter(loan=OuterRef('pk'), accrual_date=accrual_date)))
+        lock_balances(sorted(set(accruing.values_list('customer_id', flat=True))))
+        loans = list(accruing.order_by('id').values_list(
+            'id', 'customer_id', 'outstanding', 'maximum_payment_date', 'contract_version'))
+        accruals = _charge(loans, accrual_date)
+
+        LoanAccrual.objects.bulk_create(accruals, batch_size=settings.BULK_BATCH_SIZE)
+        charged = ExpressionWrapper(F('interest') + F('fee'), output_field=DecimalField(max_digits=12,
+                                                                                       decimal_places=2))
+        accrued = LoanAccrual.objects.filter(loan=OuterRef('pk'), accrual_date=accrual_date).values(total=charged)
+        loan_ids = [accrual.loan_id for accrual in accruals]
+        Loan.objects.filter(pk__in=loan_ids).update(
+            outstanding=F('outstanding') + Subquery(accrued), updated_at=timezone.now())
+
+        customers = {loan_id: customer_id for loan_id, customer_id, *_ in loans}
+        deltas = defaultdict(lambda: [Decimal(0), 0])
+        for accrual in accruals:
+            deltas[customers[accrual.loan_id]][0] += accrual.interest + accrual.fee
+        apply_balance_deltas(deltas)
+        record_events([
+            ('loan.accrued', accrual.loan_id, {'customer': customers[accrual.loan_id], 'accrual_date': accrual_date,
+                                               'interest': accrual.interest, 'fee': accrual.fee,
+                                               'outstanding': accrual.outstanding + accrual.interest + accrual.fee})
+            for accrual in accruals
+        ])
+        response_cache.invalidate('loan', loan_ids)
+
+        checkpoint.last_id = last_id
+        checkpoint.chunks += 1
+        checkpoint.save()
+        return checkpoint
+
+
+def _charge(loans, accrual_date):
+    """
+    ``LoanAccrual`` rows for ``loans``; loans with nothing to charge get none.
+    The late fee is charged for the whole of ``accrual_date`` only when the
+    loan was already past due as the day began.
+    """
+    if not loans:
+        return []
+    start_of_day = timezone.make_aware(datetime.datetime.combine(accrual_date, datetime.time.min))
+    terms = {
+        contract_version: (int(annual_rate * RATE_SCALE), int(late_fee_rate * RATE_SCALE))
+        for contract_version, annual_rate, late_fee_rate in ContractTerms.objects.filter(
+            contract_version__in={loan[4] for loan in loans}).values_list(
+            'contract_version', 'annual_rate', 'late_fee_rate')
+    }
+    count = len(loans)
+    outstanding = np.fromiter((int(loan[2] * 100) for loan in loans), dtype=np.int64, count=count)
+    annual_rate = np.fromiter((terms.get(loan[4], (0, 0))[0] for loan in loans), dtype=np.int64, count=count)
+    late_fee_rate = np.fromiter((terms.get(loan[4], (0, 0))[1] for loan in loans), dtype=np.int64, count=count)
+    late = np.fromiter((loan[3] < start_of_day for loan in loans), dtype=bool, count=count)
+    interest, fee = daily_charges(outstanding, annual_rate, late_fee_rate, late)
+
+    return [
+        LoanAccrual(loan_id=loan[0], accrual_date=accrual_date, outstanding=loan[2],
+                    interest=Decimal(loan_interest).scaleb(-2), fee=Decimal(loan_fee).scaleb(-2))
+        for loan, loan_interest, loan_fee in zip(loans, interest.tolist(), fee.tolist())
+        if loan_interest or loan_fee
+    ]
@@ -0,0 +1,197 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .cache import response_cache
+from .ledger import apply_balance_deltas
+from .models import AllocationTask, CustomerBalance, Loan, PaymentDetail, OPEN_LOAN_STATUSES
+from .outbox import allocation_events, record_events
+
+
+def load_open_loans(customer_ids):
+    """
+    Return the open loans of ``customer_ids`` grouped by customer, each group
+    ordered oldest-due first, using a single query.
+
+    Only the columns covered by ``loan_open_by_due_date_idx`` are loaded, so
+    Postgres can answer it with an index-only scan.
+    """
+    loans_by_customer = defaultdict(list)
+    loans = Loan.objects.filter(
+        customer_id__in=customer_ids, status__in=OPEN_LOAN_STATUSES
+    ).only(
+        'id', 'customer_id', 'maximum_payment_date', 'outstanding', 'status'
+    ).order_by('maximum_payment_date', 'id')
+    for loan in loans:
+        loans_by_customer[loan.customer_id].append(loan)
+    return loans_by_customer
+
+
+def plan_allocation(total_amount, loans):
+    """
+    Split ``total_amount`` across ``loans`` (already ordered oldest-due first).
+
+    Loans are updated in memory (``outstanding`` and ``status``), so the same
+    list can be handed to the next payment of the same customer. Returns a list
+    of ``(loan, amount)`` pairs.
+    """
+    remaining = Decimal(total_amount)
+    allocations = []
+
+    for loan in loans:
+        if remaining <= 0:
+            break
+        if loan.status not in OPEN_LOAN_STATUSES:
+            continue
+
+        amount = min(remaining, loan.outstanding)
+        loan.outstanding -= amount
+        if loan.outstanding <= 0:
+            loan.outstanding = Decimal(0)
+            loan.status = 4  # Paid
+        remaining -= amount
+        allocations.append((loan, amount))
+
+    return allocations
+
+
+def allocate_payments(payments, loans_by_customer, batch_size=None):
+    """
+    Distribute ``payments`` over their customer's open loans and persist it.
+
+    The split is computed in memory; the writes are a bulk insert of the
+    ``PaymentDetail`` rows, a bulk update of the touched loans and one update of
+    the customers' balance ledger, so the number of statements does not depend
+    on how many loans a customer has.
+
+    Callers must hold ``lock_balances`` for the payments' customers and have
+    loaded ``loans_by_customer`` after taking it.
+    """
+    details = []
+    touched_loans = {}
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+
+    for payment in payments:
+        loans = loans_by_customer.get(payment.customer_id, [])
+        for loan, amount in plan_allocation(payment.total_amount, loans):
+            details.append(PaymentDetail(payment=payment, loan=loan, amount=amount))
+            touched_loans[loan.pk] = loan
+            deltas[loan.customer_id][0] -= amount
+            if loan.status == 4:
+                deltas[loan.customer_id][1] -= 1
+
+    # bulk_update skips auto_now, so keep updated_at moving by hand.
+    now = timezone.now()
+    for loan in touched_loans.values():
+        loan.updated_at = now
+
+    with transaction.atomic():
+        PaymentDetail.objects.bulk_create(details, batch_size=batch_size)
+        Loan.objects.bulk_update(
+            touched_loans.values(), ['outstanding', 'status', 'updated_at'], batch_size=batch_size
+        )
+        apply_balance_deltas(deltas)
+        record_events(allocation_events(payments, details))
+        response_cache.invalidate('loan', touched_loans)
+        response_cache.invalidate('payment-details', [payment.pk for payment in payments])
+
+    return details
+
+
+def queued_amount(customer_id):
+    """Total of the customer's payments accepted but not allocated yet."""
+    return queued_amounts([customer_id]).get(customer_id, Decimal(0))
+
+
+def queued_amounts(customer_ids):
+    """``{customer_id: queued total}`` for those of ``customer_ids`` with queued payments, in one query."""
+    return dict(
+        AllocationTask.objects.filter(customer_id__in=customer_ids).values('customer_id').annotate(
+            total=Sum('payment__total_amount')).values_list('customer_id', 'total')
+    )
+
+
+def allocate_queued(max_customers=None):
+    """
+    Allocate the queued payments of up to ``max_customers`` customers and
+    return how many payments were allocated.
+
+    Customers are claimed by locking their ledger rows with ``SKIP LOCKED``
+    in the same statement that picks them, oldest queued payment first, so
+    workers running side by side take the next customers nobody holds instead
+    of waiting on each other's, and a customer whose ledger is held by a
+    request is left for the next round. All queued
+    payments of a claimed customer are allocated together, oldest first. If
+    the batch fails, every customer is retried on its own so one bad payment
+    does not hold the others back; failing tasks are kept with their error
+    and given up on after ``ALLOCATION_MAX_ATTEMPTS``.
+    """
+    max_customers = max_customers or settings.ALLOCATION_BATCH_CUSTOMERS
+    # Queued customers always have a ledger row: create_queued locks it first.
+    first_queued = AllocationTask.objects.filter(customer_id=OuterRef('customer_id'), status=1).order_by(
+        'payment_id').values('payment_id')[:1]
+
+    with transaction.atomic():
+        claimed = list(
+            CustomerBalance.objects.select_for_update(skip_locked=True).annotate(
+                first_payment=Subquery(first_queued)
+            ).filter(first_payment__isnull=False).order_by('first_payment').values_list(
+                'customer_id', flat=True)[:max_customers]
+        )
+        if not claimed:
+            return 0
+        tasks = list(
+            AllocationTask.objects.filter(customer_id__in=claimed, status=1).select_related(
+                'payment'
+            ).order_by('payment_id')
+        )
+        if not tasks:
+            return 0
+
+        try:
+            with transaction.atomic():
+                _allocate_tasks(tasks, claimed)
+            return len(tasks)
+        except Exception:
+            # Find out which customers fail below.
+            pass
+
+        allocated = 0
+        for customer_id in claimed:
+            customer_tasks = [task for task in tasks if task.customer_id == customer_id]
+            try:
+                with transaction.atomic():
+                    _allocate_tasks(customer_tasks, [customer_id])
+                allocated += len(customer_tasks)
+            except Exception as exc:
+                _record_failure(customer_tasks, exc)
+        return allocated
+
+
+def _allocate_tasks(tasks, customer_ids):
+    details = allocate_payments([task.payment for task in tasks], load_open_loans(customer_ids),
+                                batch_size=settings.BULK_BATCH_SIZE)
+    allocated = defaultdict(Decimal)
+    for detail in details:
+        allocated[detail.payment.pk] += detail.amount
+    for task in tasks:
+        if allocated[task.payment_id] < task.payment.total_amount:
+            # Rolls the allocation back rather than dropping the rest of the payment.
+            raise ValueError(f'Payment {task.payment_id} exceeds the open debt by '
+                             f'{task.payment.total_amount - allocated[task.payment_id]:.2f}')
+    AllocationTask.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+
+
+def _record_failure(tasks, exc):
+    now = timezone.now()
+    for task in tasks:
+        task.updated_at = now
+        task.attempts += 1
+        task.last_error = f'{type(exc).__name__}: {exc}'
+        if task.attempts >= settings.ALLOCATION_MAX_ATTEMPTS:
+            task.status = 2  # Failed
+    AllocationTask.objects.bulk_update(tasks, ['attempts', 'last_error', 'status', 'updated_at'])
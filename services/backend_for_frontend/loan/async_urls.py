@@ -0,0 +1,14 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('customers/', async_views.customer_list, name='async-customer-list'),
+    path('customers/<int:pk>/', async_views.customer_detail, name='async-customer-detail'),
+    path('customers/<int:pk>/balance/', async_views.customer_balance, name='async-customer-balance'),
+    path('loans/', async_views.loan_list, name='async-loan-list'),
+    path('loans/<int:pk>/', async_views.loan_detail, name='async-loan-detail'),
+    path('payments/', async_views.payment_list, name='async-payment-list'),
+    path('payments/<int:pk>/', async_views.payment_detail, name='async-payment-detail'),
+    path('payment-detail/', async_views.payment_detail_list, name='async-payment-detail-list'),
+    path('events/', async_views.event_list, name='async-event-list'),
+]
@@ -0,0 +1,230 @@
+"""
+Async-native read endpoints, mounted under ``/loan/api/v1/async/``.
+
+They mirror the GET endpoints of the DRF viewsets (same ``RowReader`` and
+orjson rendering as ``FastReadMixin``, same keyset pagination) but run on the event loop when served through
+``backend_for_frontend.asgi``, so a worker does not park a thread per request
+while it waits on Postgres. Writes stay on the DRF viewsets.
+"""
+import asyncio
+import time
+from base64 import b64decode, b64encode
+from decimal import Decimal
+from urllib import parse
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Customer, CustomerBalance, Loan, Payment, PaymentDetail, OPEN_LOAN_STATUSES
+from .outbox import aread_events
+from .readers import row_reader
+from .renderers import ORJSONRenderer
+from .serializers import (
+    CustomerSerializer, LoanSerializer, PaymentSerializer, PaymentDetailSerializer, CustomerBalanceSerializer,
+    OutboxEventSerializer
+)
+from backend_for_frontend.authentication import async_api_key_required
+
+CURSOR_QUERY_PARAM = 'cursor'
+PAGE_SIZE_QUERY_PARAM = 'page_size'
+
+_renderer = ORJSONRenderer()
+
+
+class InvalidPage(Exception):
+    pass
+
+
+class InvalidParameter(Exception):
+    """A query parameter that does not validate; answered with a 400 naming it."""
+
+    def __init__(self, name, message):
+        super().__init__(message)
+        self.name = name
+
+
+def _encode_cursor(position, reverse=False):
+    # Same token as KeysetPagination, so cursors work on both paths.
+    tokens = {'r': '1', 'p': position} if reverse else {'p': position}
+    querystring = parse.urlencode(tokens)
+    return b64encode(querystring.encode('ascii')).decode('ascii')
+
+
+def _decode_cursor(encoded):
+    """``(position, reverse)`` of a cursor; offsets never occur on a unique ordering."""
+    try:
+        tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+        if tokens.get('o', ['0'])[0] != '0':
+            raise ValueError('Offset cursors are not supported')
+        return int(tokens['p'][0]), bool(int(tokens.get('r', ['0'])[0]))
+    except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+        raise InvalidPage('Invalid cursor')
+
+
+def _page_size(request):
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    requested = request.GET.get(PAGE_SIZE_QUERY_PARAM)
+    if requested:
+        try:
+            page_size = int(requested)
+        except ValueError:
+            return page_size
+        if page_size <= 0:
+            return settings.REST_FRAMEWORK['PAGE_SIZE']
+    return min(page_size, settings.PAGINATION_MAX_PAGE_SIZE)
+
+
+async def _paginated_list(request, queryset, serializer_class):
+    try:
+        encoded = request.GET.get(CURSOR_QUERY_PARAM)
+        position, reverse = _decode_cursor(encoded) if encoded else (None, False)
+    except InvalidPage as exc:
+        return JsonResponse({'detail': str(exc)}, status=404)
+
+    page_size = _page_size(request)
+    if position is not None:
+        queryset = queryset.filter(id__lt=position) if reverse else queryset.filter(id__gt=position)
+    reader = row_reader(serializer_class)
+    rows = [row async for row in queryset.order_by('-id' if reverse else 'id').values(
+        *reader.field_names)[:page_size + 1]]
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    # The links KeysetPagination builds: the edge rows of the page, or the
+    # cursor itself when the page came back empty.
+    has_next, has_previous = (position is not None, more) if reverse else (more, position is not None)
+    base_url = request.build_absolute_uri()
+    next_url = previous_url = None
+    if has_next:
+        next_url = replace_query_param(base_url, CURSOR_QUERY_PARAM,
+                                       _encode_cursor(rows[-1]['id'] if rows else position))
+    if has_previous:
+        previous_url = replace_query_param(base_url, CURSOR_QUERY_PARAM,
+                                           _encode_cursor(rows[0]['id'] if rows else position, reverse=True))
+
+    return _render({'next': next_url, 'previous': previous_url, 'results': reader.convert(rows)})
+
+
+async def _detail(queryset, pk, serializer_class):
+    reader = row_reader(serializer_class)
+    try:
+        row = await queryset.values(*reader.field_names).aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        return JsonResponse({'detail': 'No %s matches the given query.' % queryset.model._meta.object_name},
+                            status=404)
+    return _render(reader.convert([row])[0])
+
+
+def _render(data):
+    # Same bytes as the FastReadMixin responses of the DRF viewsets.
+    return HttpResponse(_renderer.render(data), content_type='application/json')
+
+
+@require_GET
+@async_api_key_required
+async def customer_list(request):
+    return await _paginated_list(request, Customer.objects.all(), CustomerSerializer)
+
+
+@require_GET
+@async_api_key_required
+async def customer_detail(request, pk):
+    return await _detail(Customer.objects.all(), pk, CustomerSerializer)
+
+
+@require_GET
+@async_api_key_required
+async def customer_balance(request, pk):
+    try:
+        balance = await CustomerBalance.objects.select_related('customer').aget(customer_id=pk)
+    except CustomerBalance.DoesNotExist:
+        # No ledger row yet: answer from the loans without writing one.
+        try:
+            customer = await Customer.objects.aget(pk=pk)
+        except Customer.DoesNotExist:
+            return JsonResponse({'detail': 'No Customer matches the given query.'}, status=404)
+        totals = await Loan.objects.filter(customer=customer, status__in=OPEN_LOAN_STATUSES).aaggregate(
+            total_debt=Sum('outstanding'), open_loan_count=Count('id')
+        )
+        total_debt = totals['total_debt'] or Decimal(0)
+        balance = CustomerBalance(customer=customer, total_debt=total_debt,
+                                  available_amount=customer.score - total_debt,
+                                  open_loan_count=totals['open_loan_count'])
+    # DRF's encoder, so the amounts are numbers here too.
+    return JsonResponse(CustomerBalanceSerializer(balance).data, encoder=JSONEncoder)
+
+
+@require_GET
+@async_api_key_required
+async def loan_list(request):
+    return await _paginated_list(request, Loan.objects.all(), LoanSerializer)
+
+
+@require_GET
+@async_api_key_required
+async def loan_detail(request, pk):
+    return await _detail(Loan.objects.all(), pk, LoanSerializer)
+
+
+@require_GET
+@async_api_key_required
+async def payment_list(request):
+    return await _paginated_list(request, Payment.objects.all(), PaymentSerializer)
+
+
+@require_GET
+@async_api_key_required
+async def payment_detail(request, pk):
+    return await _detail(Payment.objects.all(), pk, PaymentSerializer)
+
+
+@require_GET
+@async_api_key_required
+async def payment_detail_list(request):
+    return await _paginated_list(request, PaymentDetail.objects.all(), PaymentDetailSerializer)
+
+
+def _non_negative_int(request, name, default, maximum=None):
+    value = request.GET.get(name)
+    if not value:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise InvalidParameter(name, 'A valid integer is required.')
+    if value < 0:
+        raise InvalidParameter(name, 'Ensure this value is greater than or equal to 0.')
+    return min(value, maximum) if maximum is not None else value
+
+
+@require_GET
+@async_api_key_required
+async def event_list(request):
+    """Change feed long-poll that waits on the event loop instead of a worker thread."""
+    try:
+        after = _non_negative_int(request, 'after', 0)
+        limit = max(_non_negative_int(request, 'limit', settings.REST_FRAMEWORK['PAGE_SIZE'],
+                                      settings.PAGINATION_MAX_PAGE_SIZE), 1)
+        wait = _non_negative_int(request, 'wait', 0, settings.EVENTS_MAX_WAIT)
+    except InvalidParameter as exc:
+        return JsonResponse({exc.name: [str(exc)]}, status=400)
+    deadline = time.monotonic() + wait
+
+    events = await aread_events(after, limit)
+    while not events and time.monotonic() < deadline:
+        await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+        events = await aread_events(after, limit)
+
+    if events and events[0].seq != after + 1:
+        return JsonResponse({'error': f'Events after {after} were compacted', 'oldest_seq': events[0].seq},
+                            status=410)
+    return JsonResponse({
+        'events': OutboxEventSerializer(events, many=True).data,
+        'last_seq': events[-1].seq if events else after,
+    })
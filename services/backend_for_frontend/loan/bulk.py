@@ -0,0 +1,205 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from rest_framework import status
+
+from .allocation import allocate_payments, load_open_loans, queued_amounts
+from .cache import response_cache
+from .ledger import apply_balance_deltas, lock_balances
+from .models import Customer, Loan, Payment
+from .outbox import loan_created_events, loan_transition_events, record_events
+from .schedules import build_schedules
+from .serializers import BulkLoanSerializer, BulkPaymentSerializer
+
+
+def _validate_items(items, serializer_class):
+    """Validate every item on its own; return ``(valid, errors)`` keyed by index."""
+    valid = {}
+    errors = {}
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+    return valid, errors
+
+
+def _reject_duplicates(valid, errors, model):
+    """Reject items whose ``external_id`` repeats in the batch or already exists."""
+    external_ids = [data['external_id'] for data in valid.values()]
+    existing = set(
+        model.objects.filter(external_id__in=external_ids).values_list('external_id', flat=True)
+    )
+    seen = set()
+    for index, data in list(valid.items()):
+        external_id = data['external_id']
+        if external_id in existing or external_id in seen:
+            errors[index] = {'external_id': [f'{model._meta.verbose_name} with this external id already exists.']}
+            del valid[index]
+        seen.add(external_id)
+
+
+def _results(items, created, errors):
+    results = []
+    for index, item in enumerate(items):
+        if index in created:
+            results.append({'index': index, 'status': 'created', 'id': created[index].id,
+                            'external_id': created[index].external_id})
+        else:
+            results.append({'index': index, 'status': 'rejected', 'errors': errors[index]})
+    return {'created': len(created), 'rejected': len(errors), 'results': results}
+
+
+def bulk_status(result):
+    """201 when every item was created, 400 when none was, 207 otherwise."""
+    if not result['rejected']:
+        return status.HTTP_201_CREATED
+    if not result['created']:
+        return status.HTTP_400_BAD_REQUEST
+    return status.HTTP_207_MULTI_STATUS
+
+
+def ingest_payments(items):
+    """
+    Create and allocate a batch of payments.
+
+    Items are validated independently and a failing item does not stop the
+    rest. Duplicates, customers and open loans are loaded with one query each
+    for the whole batch; the debt check and the oldest-due-first allocation run
+    in memory in request order, and accepted payments are written with bulk
+    inserts and updates in one transaction.
+    """
+    valid, errors = _validate_items(items, BulkPaymentSerializer)
+    _reject_duplicates(valid, errors, Payment)
+
+    customer_ids = {data['customer'] for data in valid.values()}
+    existing_customers = set(Customer.objects.filter(id__in=customer_ids).values_list('id', flat=True))
+
+    batch_size = settings.BULK_BATCH_SIZE
+    with transaction.atomic():
+        lock_balances(existing_customers)
+        loans_by_customer = load_open_loans(existing_customers)
+        remaining_debt = defaultdict(Decimal)
+        for customer_id, loans in loans_by_customer.items():
+            remaining_debt[customer_id] = sum((loan.outstanding for loan in loans), Decimal(0))
+        # Payments still waiting for the allocation workers already cover part of the debt.
+        for customer_id, queued in queued_amounts(existing_customers).items():
+            remaining_debt[customer_id] -= queued
+
+        accepted = {}
+        for index, data in valid.items():
+            customer_id = data['customer']
+            if customer_id not in existing_customers:
+                errors[index] = {'customer': [f'Invalid pk "{customer_id}" - object does not exist.']}
+            elif data['total_amount'] > remaining_debt[customer_id]:
+                errors[index] = {'error': 'Payment amount exceeds total debt'}
+            else:
+                remaining_debt[customer_id] -= data['total_amount']
+                accepted[index] = Payment(
+                    external_id=data['external_id'], customer_id=customer_id,
+                    total_amount=data['total_amount'], paid_at=data['paid_at'], status=1,
+                )
+
+        Payment.objects.bulk_create(accepted.values(), batch_size=batch_size)
+        response_cache.invalidate('payment', [payment.pk for payment in accepted.values()])
+        allocate_payments(accepted.values(), loans_by_customer, batch_size=batch_size)
+
+    return _results(items, accepted, errors)
+
+
+def originate_loans(items):
+    """
+    Create a batch of loans, checking each customer's credit limit cumulatively.
+
+    Scores and current debt for every referenced customer come from two
+    queries (customers and their locked balance ledger rows). Items are then checked
+    in request order, each one against what the earlier accepted loans of the
+    same customer left available, and the accepted loans are bulk inserted
+    along with their installment schedules.
+    """
+    valid, errors = _validate_items(items, BulkLoanSerializer)
+    _reject_duplicates(valid, errors, Loan)
+
+    with transaction.atomic():
+        customers = Customer.objects.in_bulk({data['customer'] for data in valid.values()})
+        balances = lock_balances(list(customers))
+        available = {
+            customer_id: customer.score - balances[customer_id].total_debt
+            for customer_id, customer in customers.items()
+        }
+
+        accepted = {}
+        deltas = defaultdict(lambda: [Decimal(0), 0])
+        for index, data in valid.items():
+            customer_id = data['customer']
+            if customer_id not in customers:
+                errors[index] = {'customer': [f'Invalid pk "{customer_id}" - object does not exist.']}
+            elif data['amount'] > available[customer_id]:
+                errors[index] = {'error': 'Loan amount exceeds customer credit limit'}
+            else:
+                available[customer_id] -= data['amount']
+                deltas[customer_id][0] += data['amount']
+                deltas[customer_id][1] += 1
+                accepted[index] = Loan(
+                    external_id=data['external_id'], customer_id=customer_id, amount=data['amount'],
+                    outstanding=data['amount'], status=1, contract_version=data.get('contract_version'),
+                    maximum_payment_date=data['maximum_payment_date'], taken_at=data.get('taken_at'),
+                )
+
+        Loan.objects.bulk_create(accepted.values(), batch_size=settings.BULK_BATCH_SIZE)
+        build_schedules(accepted.values())
+        response_cache.invalidate('loan', [loan.pk for loan in accepted.values()])
+        apply_balance_deltas(deltas)
+        record_events(loan_created_events(accepted.values()))
+
+    return _results(items, accepted, errors)
+
+
+def transition_loans(ids, external_ids, new_status):
+    """
+    Move the Pending loans among ``ids`` and ``external_ids`` to ``new_status``
+    (Active or Rejected) with one conditional ``UPDATE ... WHERE status = 1``.
+
+    The customers' ledger rows are locked first, so the loans reported as
+    transitioned are exactly the ones the update changed. Rejected loans no
+    longer count as debt and are taken off the ledger.
+    """
+    found = list(Loan.objects.filter(Q(id__in=ids) | Q(external_id__in=external_ids)).values_list(
+        'id', 'external_id', 'customer_id'))
+    found_ids = {loan_id for loan_id, _, _ in found}
+    found_external_ids = {external_id for _, external_id, _ in found}
+    not_found = ([loan_id for loan_id in ids if loan_id not in found_ids]
+                 + [external_id for external_id in external_ids if external_id not in found_external_ids])
+
+    with transaction.atomic():
+        lock_balances(sorted({customer_id for _, _, customer_id in found}))
+        loans = list(Loan.objects.filter(pk__in=found_ids).only(
+            'id', 'external_id', 'customer_id', 'status', 'outstanding').order_by('id'))
+        pending = [loan for loan in loans if loan.status == 1]
+        ineligible = [{'id': loan.id, 'external_id': loan.external_id, 'status': loan.status}
+                      for loan in loans if loan.status != 1]
+        Loan.objects.filter(pk__in=[loan.pk for loan in pending], status=1).update(
+            status=new_status, updated_at=timezone.now())
+
+        if new_status == 3:  # Rejected
+            deltas = defaultdict(lambda: [Decimal(0), 0])
+            for loan in pending:
+                deltas[loan.customer_id][0] -= loan.outstanding
+                deltas[loan.customer_id][1] -= 1
+            apply_balance_deltas(deltas)
+        for loan in pending:
+            loan.status = new_status
+        record_events(loan_transition_events(pending))
+        response_cache.invalidate('loan', [loan.pk for loan in pending])
+
+    return {
+        'transitioned': [{'id': loan.id, 'external_id': loan.external_id} for loan in pending],
+        'ineligible': ineligible,
+        'not_found': not_found,
+    }
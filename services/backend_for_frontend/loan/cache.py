@@ -0,0 +1,92 @@
+import hashlib
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from backend_for_frontend.routers import use_primary
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """
+    Cache of computed response data (balances, detail rows, per-payment
+    listings) in the ``RESPONSE_CACHE_ALIAS`` Django cache.
+
+    Entries are grouped per ``(kind, object_id)`` under a version token.
+    Invalidating an object drops its token, which orphans every entry cached
+    for it (all ``?fields=`` variants, all pages) at once. Writers invalidate
+    right away and again once their transaction commits, so a value computed
+    from pre-commit data is never served after the commit. Values are always
+    computed from the primary.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    @property
+    def backend(self):
+        return caches[settings.RESPONSE_CACHE_ALIAS]
+
+    def get_or_set(self, kind, object_id, compute, variant='', timeout=None):
+        """Return the cached value for ``(kind, object_id, variant)``, computing it on a miss."""
+        timeout = settings.RESPONSE_CACHE_TTL if timeout is None else timeout
+        if timeout <= 0:
+            return compute()
+
+        variant = hashlib.sha1(variant.encode()).hexdigest() if variant else ''
+        key = f'{kind}:{object_id}:{self._version(kind, object_id)}:{variant}'
+        value = self.backend.get(key, _MISSING)
+        self._count(kind, hit=value is not _MISSING)
+        if value is _MISSING:
+            with use_primary():
+                value = compute()
+            self.backend.set(key, value, timeout)
+        return value
+
+    def invalidate(self, kind, object_ids):
+        """Drop every cached value of ``object_ids`` now and after the current transaction commits."""
+        keys = [self._version_key(kind, object_id) for object_id in set(object_ids)]
+        if not keys:
+            return
+        self.backend.delete_many(keys)
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: self.backend.delete_many(keys))
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for kind, counts in sorted(self._stats.items()):
+                total = counts['hits'] + counts['misses']
+                stats[kind] = {**counts, 'hit_rate': round(counts['hits'] / total, 4) if total else None}
+            return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _version(self, kind, object_id):
+        version_key = self._version_key(kind, object_id)
+        version = self.backend.get(version_key)
+        if version is None:
+            token = uuid.uuid4().hex
+            # add() keeps the token of a concurrent reader that got there first.
+            if self.backend.add(version_key, token, None):
+                return token
+            version = self.backend.get(version_key) or token
+        return version
+
+    def _version_key(self, kind, object_id):
+        return f'{kind}:{object_id}:version'
+
+    def _count(self, kind, hit):
+        with self._lock:
+            self._stats[kind]['hits' if hit else 'misses'] += 1
+
+
+response_cache = ResponseCache()
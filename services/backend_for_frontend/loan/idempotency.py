@@ -0,0 +1,91 @@
+import functools
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend_for_frontend.models import UserAPIKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def _client_id(request):
+    if isinstance(request.auth, UserAPIKey):
+        return f'key:{request.auth.pk}'
+    return f'user:{request.user.pk}'
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method}:{request.path}:{body}'.encode()).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(stored['data'], status=stored['status'], headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(view_method):
+    """
+    ``Idempotency-Key`` support for a create action.
+
+    The first request with a given key (per API key) runs the view and its
+    response is kept for ``IDEMPOTENCY_TTL`` seconds; retries with the same
+    key and body replay it without touching the database, and a different
+    body with the same key gets a 422. While the first request is running,
+    duplicates wait up to ``IDEMPOTENCY_WAIT`` seconds for its result instead
+    of doing the work again. Only successful responses are kept; a rejected
+    request created nothing, so its retries simply run again.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            return view_method(self, request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{IDEMPOTENCY_HEADER} cannot be longer than {MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        store = caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        result_key = f'idempotency:{_client_id(request)}:{digest}'
+        lock_key = f'{result_key}:lock'
+        fingerprint = _fingerprint(request)
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        token = uuid.uuid4().hex
+        while True:
+            stored = store.get(result_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            if store.add(lock_key, token, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                break
+            if time.monotonic() >= deadline:
+                return Response({'error': f'A request with this {IDEMPOTENCY_HEADER} is still in progress'},
+                                status=status.HTTP_409_CONFLICT)
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code < 400:
+                store.set(result_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': json.loads(json.dumps(response.data, default=str)),
+                }, settings.IDEMPOTENCY_TTL)
+            return response
+        finally:
+            if store.get(lock_key) == token:
+                store.delete(lock_key)
+
+    return wrapper
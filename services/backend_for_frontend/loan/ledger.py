@@ -0,0 +1,148 @@
+from decimal import Decimal
+
+from django.db import router
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .cache import response_cache
+from .models import Customer, CustomerBalance, OPEN_LOAN_STATUSES
+from backend_for_frontend.routers import use_primary
+
+
+def expected_balances(customer_ids=None):
+    """
+    Recompute balances from the loans table: one grouped query returning
+    ``id``, ``score``, ``total_debt`` and ``open_loan_count`` per customer.
+    """
+    open_loans = Q(loan__status__in=OPEN_LOAN_STATUSES)
+    customers = Customer.objects.all()
+    if customer_ids is not None:
+        customers = customers.filter(id__in=customer_ids)
+    return customers.values('id', 'score').annotate(
+        total_debt=Sum('loan__outstanding', filter=open_loans),
+        open_loan_count=Count('loan', filter=open_loans),
+    ).order_by('id')
+
+
+def balance_from_row(row):
+    total_debt = row['total_debt'] or Decimal(0)
+    return CustomerBalance(
+        customer_id=row['id'],
+        total_debt=total_debt,
+        available_amount=row['score'] - total_debt,
+        open_loan_count=row['open_loan_count'],
+    )
+
+
+def ensure_balances(customer_ids):
+    """
+    Return ``{customer_id: CustomerBalance}`` for ``customer_ids``.
+
+    Customers without a ledger row yet get one computed from their loans. Call
+    this before touching the loans so the deltas applied afterwards are not
+    counted twice.
+    """
+    balances = CustomerBalance.objects.in_bulk(customer_ids)
+    missing = set(customer_ids) - set(balances)
+    if missing:
+        CustomerBalance.objects.bulk_create(
+            [balance_from_row(row) for row in expected_balances(missing)], ignore_conflicts=True
+        )
+        # Read the new rows back from where they were written, not from a replica.
+        written = CustomerBalance.objects.using(router.db_for_write(CustomerBalance))
+        balances.update(written.in_bulk(missing))
+    return balances
+
+
+def lock_balances(customer_ids):
+    """
+    Lock the ledger rows of ``customer_ids`` (``SELECT ... FOR UPDATE``) and
+    return them as ``{customer_id: CustomerBalance}``.
+
+    The ledger row is the per-customer lock: every credit/debt check and every
+    write to a customer's loans takes it first, inside ``transaction.atomic``.
+    Requests for different customers never wait on each other, and rows are
+    locked in customer id order so batches cannot deadlock.
+    """
+    locked = CustomerBalance.objects.select_for_update().order_by('customer_id')
+    balances = locked.in_bulk(customer_ids)
+    missing = set(customer_ids) - set(balances)
+    if missing:
+        with use_primary():
+            ensure_balances(missing)
+        balances.update(locked.in_bulk(missing))
+    return balances
+
+
+def claim_balances(customer_ids):
+    """
+    Lock the ledger rows of whichever ``customer_ids`` nobody else holds
+    (``SELECT ... FOR UPDATE SKIP LOCKED``) and return their ids.
+
+    For background jobs: a customer busy with a request is skipped instead of
+    waited for, and can be picked up again later.
+    """
+    ensure_balances(customer_ids)
+    return list(
+        CustomerBalance.objects.select_for_update(skip_locked=True).filter(
+            customer_id__in=customer_ids
+        ).order_by('customer_id').values_list('customer_id', flat=True)
+    )
+
+
+def apply_balance_deltas(deltas):
+    """
+    Apply ``{customer_id: (debt_delta, open_loan_delta)}`` to the ledger in a
+    single UPDATE. Values are relative (``F()``), so concurrent writers do not
+    overwrite each other.
+    """
+    now = timezone.now()
+    balances = [
+        CustomerBalance(
+            customer_id=customer_id,
+            total_debt=F('total_debt') + debt_delta,
+            available_amount=F('available_amount') - debt_delta,
+            open_loan_count=F('open_loan_count') + open_loan_delta,
+            updated_at=now,
+        )
+        for customer_id, (debt_delta, open_loan_delta) in deltas.items()
+        if debt_delta or open_loan_delta
+    ]
+    CustomerBalance.objects.bulk_update(
+        balances, ['total_debt', 'available_amount', 'open_loan_count', 'updated_at']
+    )
+    response_cache.invalidate('balance', [balance.customer_id for balance in balances])
+
+
+def record_score_change(customer):
+    CustomerBalance.objects.filter(customer=customer).update(
+        available_amount=customer.score - F('total_debt'), updated_at=timezone.now()
+    )
+    response_cache.invalidate('balance', [customer.pk])
+
+
+def find_drift(customer_ids=None):
+    """
+    Yield ``(stored, expected)`` ledger rows that disagree with the loans
+    table. ``stored`` is ``None`` when the customer has no ledger row.
+    """
+    stored_balances = CustomerBalance.objects.order_by('customer_id')
+    if customer_ids is not None:
+        stored_balances = stored_balances.filter(customer_id__in=customer_ids)
+
+    # Both sides are ordered by customer id, so walk them side by side instead
+    # of holding either one in memory.
+    stored_rows = stored_balances.iterator()
+    stored = next(stored_rows, None)
+    for row in expected_balances(customer_ids).iterator():
+        expected = balance_from_row(row)
+        while stored is not None and stored.customer_id < expected.customer_id:
+            stored = next(stored_rows, None)
+
+        current = stored if stored is not None and stored.customer_id == expected.customer_id else None
+        if current is None or (
+            current.total_debt != expected.total_debt
+            or current.available_amount != expected.available_amount
+            or current.open_loan_count != expected.open_loan_count
+        ):
+            yield current, expected
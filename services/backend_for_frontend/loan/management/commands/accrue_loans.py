@@ -0,0 +1,32 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from loan.accruals import accrual_totals, accrue_loans
+
+
+class Command(BaseCommand):
+    help = 'Accrue one day of interest and late fees on open loans; safe to rerun for the same date.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat, default=None,
+                            help='Accrual date (YYYY-MM-DD); defaults to yesterday.')
+        parser.add_argument('--chunk-size', type=int, default=settings.ACCRUAL_CHUNK_SIZE,
+                            help='Loan ids covered by each chunk.')
+        parser.add_argument('--pause', type=float, default=settings.ACCRUAL_PAUSE,
+                            help='Seconds to wait between chunks.')
+        parser.add_argument('--max-chunks', type=int, default=None,
+                            help='Stop after this many chunks; the next run resumes from there.')
+
+    def handle(self, *args, **options):
+        accrual_date = options['date'] or timezone.localdate() - datetime.timedelta(days=1)
+        checkpoint = accrue_loans(accrual_date, chunk_size=options['chunk_size'], pause=options['pause'],
+                                  max_chunks=options['max_chunks'])
+        totals = accrual_totals(accrual_date)
+        state = 'finished' if checkpoint.finished_at else f'stopped after loan id {checkpoint.last_id}'
+        self.stdout.write(self.style.SUCCESS(
+            f'Accrual for {accrual_date} {state}: {totals["loans"]} loan(s), '
+            f'interest {totals["interest"] or 0:.2f}, fees {totals["fee"] or 0:.2f}.'
+        ))
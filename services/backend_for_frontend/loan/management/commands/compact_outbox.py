@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from loan.models import OutboxEvent
+from loan.outbox import sequence_events
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed events older than the retention period.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.OUTBOX_RETENTION_DAYS,
+                            help='Keep events newer than this many days.')
+        parser.add_argument('--chunk-size', type=int, default=settings.BULK_BATCH_SIZE,
+                            help='Events deleted per statement.')
+
+    def handle(self, *args, **options):
+        sequence_events()
+        cutoff = timezone.now() - timedelta(days=options['retention_days'])
+        # The newest event always stays: it carries the sequence forward.
+        last_seq = OutboxEvent.objects.aggregate(last=Max('seq'))['last']
+        if last_seq is None:
+            self.stdout.write(self.style.SUCCESS('Deleted 0 event(s).'))
+            return
+
+        # Only a prefix of the sequence is deleted, so consumers can tell a gap means lost events.
+        first_kept = OutboxEvent.objects.filter(seq__isnull=False, created_at__gte=cutoff).aggregate(
+            first=Min('seq'))['first']
+        boundary = min(first_kept or last_seq, last_seq)
+        expired = OutboxEvent.objects.filter(seq__lt=boundary).order_by('seq')
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            deleted += OutboxEvent.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} event(s).'))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from loan.models import Loan
+from loan.schedules import build_schedules
+
+
+class Command(BaseCommand):
+    help = 'Generate the installment schedules of loans that have none, e.g. after an import, in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contract-version', action='append', dest='contract_versions', default=None,
+                            help='Only loans of this contract version (repeatable).')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Regenerate existing schedules too, e.g. after the terms were corrected.')
+        parser.add_argument('--chunk-size', type=int, default=settings.SCHEDULE_CHUNK_SIZE,
+                            help='Loans generated per transaction.')
+
+    def handle(self, *args, **options):
+        loans = Loan.objects.only('id', 'amount', 'contract_version', 'maximum_payment_date').order_by('id')
+        if options['contract_versions']:
+            loans = loans.filter(contract_version__in=options['contract_versions'])
+        if not options['rebuild']:
+            loans = loans.filter(installments__isnull=True)
+
+        last_id, generated, written = 0, 0, 0
+        while True:
+            chunk = list(loans.filter(id__gt=last_id)[:options['chunk_size']])
+            if not chunk:
+                break
+            with transaction.atomic():
+                written += build_schedules(chunk)
+            generated += len(chunk)
+            last_id = chunk[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f'Generated {written} installment(s) for {generated} loan(s).'))
@@ -0,0 +1,19 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from loan.reports import portfolio_report
+
+
+class Command(BaseCommand):
+    help = 'Print the portfolio report (status totals, aging buckets, collections) as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                            help='Report date (YYYY-MM-DD); defaults to today.')
+
+    def handle(self, *args, **options):
+        report = portfolio_report(options['as_of'] or timezone.localdate())
+        self.stdout.write(json.dumps(report, indent=2))
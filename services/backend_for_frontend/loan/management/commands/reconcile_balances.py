@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from loan.ledger import balance_from_row, expected_balances, find_drift
+from loan.models import CustomerBalance
+
+
+class Command(BaseCommand):
+    help = 'Compare the customer balance ledger with the loans table and report drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Overwrite drifted rows with the recomputed values.')
+        parser.add_argument('--customer', type=int, action='append', dest='customer_ids',
+                            help='Only check this customer id (can be repeated).')
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for stored, expected in find_drift(options['customer_ids']):
+            drifted += 1
+            if stored is None:
+                self.stdout.write(f'customer {expected.customer_id}: missing ledger row')
+            else:
+                self.stdout.write(
+                    f'customer {expected.customer_id}: '
+                    f'total_debt {stored.total_debt} != {expected.total_debt}, '
+                    f'available_amount {stored.available_amount} != {expected.available_amount}, '
+                    f'open_loan_count {stored.open_loan_count} != {expected.open_loan_count}'
+                )
+
+            if options['fix']:
+                self.fix(expected.customer_id)
+
+        if drifted:
+            action = 'Fixed' if options['fix'] else 'Found'
+            self.stdout.write(self.style.WARNING(f'{action} {drifted} drifted balance(s).'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Ledger matches the loans table.'))
+
+    def fix(self, customer_id):
+        # Recompute right before writing; the streamed value may be stale by now.
+        with transaction.atomic():
+            expected = balance_from_row(expected_balances([customer_id]).get())
+            CustomerBalance.objects.update_or_create(
+                customer_id=customer_id,
+                defaults={
+                    'total_debt': expected.total_debt,
+                    'available_amount': expected.available_amount,
+                    'open_loan_count': expected.open_loan_count,
+                },
+            )
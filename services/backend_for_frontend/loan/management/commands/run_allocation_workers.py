@@ -0,0 +1,51 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from loan.allocation import allocate_queued
+
+
+class Command(BaseCommand):
+    help = 'Allocate queued payments with a pool of worker threads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.ALLOCATION_WORKERS,
+                            help='Number of worker threads.')
+        parser.add_argument('--batch-customers', type=int, default=settings.ALLOCATION_BATCH_CUSTOMERS,
+                            help='Customers claimed per batch by each worker.')
+        parser.add_argument('--poll-interval', type=float, default=settings.ALLOCATION_POLL_INTERVAL,
+                            help='Seconds an idle worker waits before looking at the queue again.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        allocated = []
+
+        def work():
+            try:
+                while not stop.is_set():
+                    count = allocate_queued(options['batch_customers'])
+                    allocated.append(count)
+                    if count:
+                        continue
+                    if options['once']:
+                        break
+                    stop.wait(options['poll_interval'])
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work, name=f'allocation-{i}') for i in range(options['workers'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        self.stdout.write(self.style.SUCCESS(f'Allocated {sum(allocated)} payment(s).'))
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from loan.outbox import sequence_events
+
+
+class Command(BaseCommand):
+    help = 'Number new change feed events as their transactions settle, so /events/ can serve them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=settings.EVENTS_POLL_INTERVAL,
+                            help='Seconds to wait when there is nothing to sequence.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once nothing is left to sequence.')
+
+    def handle(self, *args, **options):
+        sequenced = 0
+        try:
+            while True:
+                count = sequence_events()
+                sequenced += count
+                if count:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Sequenced {sequenced} event(s).'))
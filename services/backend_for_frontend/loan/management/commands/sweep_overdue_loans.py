@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from loan.sweeper import sweep_overdue_loans
+
+
+class Command(BaseCommand):
+    help = 'Move loans past their maximum payment date to Overdue or Defaulted, in resumable chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.LOAN_SWEEP_CHUNK_SIZE,
+                            help='Loan ids covered by each chunk.')
+        parser.add_argument('--pause', type=float, default=settings.LOAN_SWEEP_PAUSE,
+                            help='Seconds to wait between chunks.')
+        parser.add_argument('--max-chunks', type=int, default=None,
+                            help='Stop after this many chunks; the next run resumes from there.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Start a new pass instead of resuming an unfinished one.')
+
+    def handle(self, *args, **options):
+        checkpoint = sweep_overdue_loans(chunk_size=options['chunk_size'], pause=options['pause'],
+                                         max_chunks=options['max_chunks'], restart=options['restart'])
+        state = 'finished' if checkpoint.finished_at else f'stopped after loan id {checkpoint.last_id}'
+        self.stdout.write(self.style.SUCCESS(
+            f'Pass started {checkpoint.started_at:%Y-%m-%d %H:%M:%S} {state}: '
+            f'{checkpoint.overdue} overdue, {checkpoint.defaulted} defaulted, '
+            f'{checkpoint.skipped} skipped in {checkpoint.chunks} chunk(s).'
+        ))
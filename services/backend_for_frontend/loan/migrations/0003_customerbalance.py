@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:01
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_balances(apps, schema_editor):
+    Customer = apps.get_model('loan', 'Customer')
+    CustomerBalance = apps.get_model('loan', 'CustomerBalance')
+
+    open_loans = Q(loan__status__in=[1, 2])
+    rows = Customer.objects.values('id', 'score').annotate(
+        total_debt=Sum('loan__outstanding', filter=open_loans),
+        open_loan_count=Count('loan', filter=open_loans),
+    ).order_by('id')
+
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        total_debt = row['total_debt'] or Decimal(0)
+        batch.append(CustomerBalance(
+            customer_id=row['id'],
+            total_debt=total_debt,
+            available_amount=row['score'] - total_debt,
+            open_loan_count=row['open_loan_count'],
+        ))
+        if len(batch) == 2000:
+            CustomerBalance.objects.bulk_create(batch)
+            batch = []
+    CustomerBalance.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0002_alter_payment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerBalance',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='loan.customer')),
+                ('total_debt', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('available_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('open_loan_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:02
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; it builds the
+    # indexes without blocking writes on the live tables.
+    atomic = False
+
+    dependencies = [
+        ('loan', '0003_customerbalance'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('status__in', [1, 2])), fields=['customer', 'maximum_payment_date', 'id'], include=('outstanding', 'status'), name='loan_open_by_due_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='loan',
+            index=models.Index(fields=['updated_at', 'id'], name='loan_updated_at_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['updated_at', 'id'], name='payment_updated_at_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='paymentdetail',
+            index=models.Index(fields=['updated_at', 'id'], name='detail_updated_at_id_idx'),
+        ),
+    ]
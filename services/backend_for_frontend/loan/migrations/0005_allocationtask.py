@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllocationTask',
+            fields=[
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='allocation_task', serialize=False, to='loan.payment')),
+                ('status', models.SmallIntegerField(choices=[(1, 'Queued'), (2, 'Failed')], default=1)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='loan.customer')),
+            ],
+        ),
+    ]
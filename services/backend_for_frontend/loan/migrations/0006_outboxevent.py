@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:49
+
+import django.core.serializers.json
+import loan.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0005_allocationtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(blank=True, null=True, unique=True)),
+                ('xid', models.BigIntegerField(db_default=loan.models.TransactionId(), null=True)),
+                ('kind', models.CharField(max_length=40)),
+                ('entity_id', models.BigIntegerField()),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('seq__isnull', True)), fields=['xid', 'id'], name='outbox_unsequenced_idx')],
+            },
+        ),
+    ]
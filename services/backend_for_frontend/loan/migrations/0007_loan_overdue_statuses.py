@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:57
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The open loans index is rebuilt for the new statuses under a temporary
+    # name before the old one is dropped, so allocation and credit checks are
+    # never left without it; CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('loan', '0006_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SweepCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=60, unique=True)),
+                ('as_of', models.DateTimeField()),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('chunks', models.PositiveIntegerField(default=0)),
+                ('overdue', models.PositiveBigIntegerField(default=0)),
+                ('defaulted', models.PositiveBigIntegerField(default=0)),
+                ('skipped', models.PositiveBigIntegerField(default=0)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='loan',
+            name='status',
+            field=models.SmallIntegerField(choices=[(1, 'Pending'), (2, 'Active'), (3, 'Rejected'), (4, 'Paid'), (5, 'Overdue'), (6, 'Defaulted')], default=1),
+        ),
+        AddIndexConcurrently(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('status__in', [1, 2, 5, 6])), fields=['customer', 'maximum_payment_date', 'id'], include=('outstanding', 'status'), name='loan_open_by_due_date_new_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='loan',
+            name='loan_open_by_due_date_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='loan',
+            new_name='loan_open_by_due_date_idx',
+            old_name='loan_open_by_due_date_new_idx',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0007_loan_overdue_statuses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractTerms',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contract_version', models.CharField(max_length=30, unique=True)),
+                ('installments', models.PositiveSmallIntegerField()),
+                ('period_days', models.PositiveSmallIntegerField(default=30)),
+                ('annual_rate', models.DecimalField(decimal_places=6, default=0, max_digits=7)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LoanInstallment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('due_date', models.DateTimeField()),
+                ('principal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('interest', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payment', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='loan.loan')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='loaninstallment',
+            constraint=models.UniqueConstraint(fields=('loan', 'number'), name='installment_loan_number_unique'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0008_installment_schedules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contractterms',
+            name='late_fee_rate',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=7),
+        ),
+        migrations.CreateModel(
+            name='LoanAccrual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accrual_date', models.DateField()),
+                ('outstanding', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('interest', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fee', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accruals', to='loan.loan')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='loanaccrual',
+            constraint=models.UniqueConstraint(fields=('loan', 'accrual_date'), name='accrual_loan_date_unique'),
+        ),
+    ]
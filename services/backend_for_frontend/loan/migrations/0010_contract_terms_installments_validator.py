@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:33
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0009_loan_accruals'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contractterms',
+            name='installments',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
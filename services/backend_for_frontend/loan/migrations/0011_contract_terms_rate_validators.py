@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:34
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0010_contract_terms_installments_validator'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contractterms',
+            name='annual_rate',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=7, validators=[django.core.validators.MinValueValidator(Decimal('0')), django.core.validators.MaxValueValidator(Decimal('4'))]),
+        ),
+        migrations.AlterField(
+            model_name='contractterms',
+            name='late_fee_rate',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=7, validators=[django.core.validators.MinValueValidator(Decimal('0')), django.core.validators.MaxValueValidator(Decimal('4'))]),
+        ),
+    ]
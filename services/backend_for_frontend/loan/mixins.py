@@ -0,0 +1,171 @@
+import hashlib
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from .cache import response_cache
+from .exports import export_response
+from .readers import row_reader
+from .renderers import ORJSONRenderer
+
+
+class ExportMixin:
+    """Adds a streaming ``GET <resource>/export/`` action to a viewset."""
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return export_response(request, self.get_queryset(), self.basename)
+
+
+class FastReadMixin:
+    """
+    Serves ``list`` and ``retrieve`` from ``.values()`` rows converted by a
+    ``RowReader`` and rendered with orjson, skipping model instances and the
+    serializer. The response bytes are the same as the serializer's.
+
+    ``?fields=a,b`` and ``?exclude=c`` (comma separated) trim both the
+    response and the columns selected.
+    """
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def get_requested_fields(self):
+        """Field names asked for with ``?fields=``/``?exclude=``, or ``None`` for all."""
+        fields = _split_names(self.request.query_params.get('fields'))
+        exclude = _split_names(self.request.query_params.get('exclude'))
+        if not fields and not exclude:
+            return None
+
+        available = row_reader(self.get_serializer_class()).field_names
+        unknown = (fields | exclude) - set(available)
+        if unknown:
+            raise ValidationError({'fields': [f'Unknown field(s): {", ".join(sorted(unknown))}']})
+        selected = (fields or set(available)) - exclude
+        if not selected:
+            raise ValidationError({'fields': ['At least one field must be selected']})
+        return frozenset(selected)
+
+    def get_row_reader(self):
+        return row_reader(self.get_serializer_class(), self.get_requested_fields())
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_row_reader()
+        queryset = self.filter_queryset(self.get_queryset())
+        # The cursor is built from the primary key, so it is read even when not asked for.
+        pk_name = queryset.model._meta.pk.name
+        extra = () if pk_name in reader.field_names else (pk_name,)
+        queryset = queryset.values(*reader.field_names, *extra)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            rows = reader.convert(page)
+            response = self.get_paginated_response(rows)
+        else:
+            rows = reader.convert(list(queryset))
+            response = Response(rows)
+
+        # Dropped only once the paginator has built its links from them.
+        for row in rows:
+            for name in extra:
+                del row[name]
+        return response
+
+    def get_detail_row(self, field_names):
+        """``.values(*field_names)`` row of the object being retrieved; raises ``Http404``."""
+        queryset = self.filter_queryset(self.get_queryset()).values(*field_names)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = self.get_row_reader()
+        row = self.get_detail_row(reader.field_names)
+        return Response(reader.convert([{name: row[name] for name in reader.field_names}])[0])
+
+
+class CachedDetailMixin:
+    """
+    Keeps the full row behind ``retrieve`` in the response cache, under the
+    viewset's basename and the object's pk, so detail reads and their ``ETag``
+    checks skip the database until the row is written again (see
+    ``loan/signals.py``). Goes before ``ConditionalRetrieveMixin`` and
+    ``FastReadMixin``.
+    """
+
+    def get_cache_pk(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return int(self.kwargs[lookup_url_kwarg])
+        except ValueError:
+            raise Http404
+
+    def get_cached_row(self):
+        if not hasattr(self, '_cached_row'):
+            field_names = row_reader(self.get_serializer_class()).field_names
+            self._cached_row = response_cache.get_or_set(
+                self.basename, self.get_cache_pk(),
+                lambda: super(CachedDetailMixin, self).get_detail_row(field_names),
+            )
+        return self._cached_row
+
+    def get_detail_row(self, field_names):
+        return self.get_cached_row()
+
+    def get_last_modified(self):
+        try:
+            return self.get_cached_row()['updated_at']
+        except Http404:
+            return None
+
+
+class ConditionalRetrieveMixin:
+    """
+    Conditional GET on ``retrieve``: ``ETag`` and ``Last-Modified`` come from
+    the row's ``id`` and ``updated_at``, so ``If-None-Match`` and
+    ``If-Modified-Since`` are answered with a 304 after a single
+    ``values_list('updated_at')`` lookup (or a response cache hit, with
+    ``CachedDetailMixin``), before anything is serialized.
+    """
+
+    def get_last_modified(self):
+        """``updated_at`` of the object being retrieved, or ``None`` if there is none."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            return self.filter_queryset(self.get_queryset()).filter(**lookup).values_list(
+                'updated_at', flat=True).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            return None
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = self.get_last_modified()
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        etag = self.get_etag(request, lookup_url_kwarg, updated_at)
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_etag(self, request, lookup_url_kwarg, updated_at):
+        # Strong validator: one per row version and representation (query
+        # string such as ?fields=, and negotiated format).
+        version = ':'.join([
+            str(self.kwargs[lookup_url_kwarg]), updated_at.isoformat(),
+            request.query_params.urlencode(), request.accepted_renderer.format,
+        ])
+        return '"%s"' % hashlib.sha1(version.encode()).hexdigest()
+
+
+def _split_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
@@ -1,3 +1,7 @@
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 CUSTOMER_STATUS_CHOICES = [
@@ -10,13 +14,27 @@ LOAN_STATUS_CHOICES = [
     (2, 'Active'),
     (3, 'Rejected'),
     (4, 'Paid'),
+    (5, 'Overdue'),
+    (6, 'Defaulted'),
 ]
 
+# Loans that still carry debt for the customer (Pending, Active, Overdue and Defaulted).
+OPEN_LOAN_STATUSES = [1, 2, 5, 6]
+
+# Highest annual rate (400%) the accrual job can charge exactly; see ``accruals.daily_charges``.
+MAX_ANNUAL_RATE = Decimal('4')
+RATE_VALIDATORS = [MinValueValidator(Decimal('0')), MaxValueValidator(MAX_ANNUAL_RATE)]
+
 PAYMENT_STATUS_CHOICES = [
     (1, 'Completed'),
     (2, 'Rejected'),
 ]
 
+ALLOCATION_TASK_STATUS_CHOICES = [
+    (1, 'Queued'),
+    (2, 'Failed'),
+]
+
 
 class Customer(models.Model):
     external_id = models.CharField(max_length=60, unique=True)
@@ -41,6 +59,20 @@ class Loan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Credit checks, payment allocation and balances: open loans of a
+            # customer, oldest due first, answered from the index alone.
+            models.Index(
+                fields=['customer', 'maximum_payment_date', 'id'],
+                include=['outstanding', 'status'],
+                condition=models.Q(status__in=OPEN_LOAN_STATUSES),
+                name='loan_open_by_due_date_idx',
+            ),
+            # Incremental exports ordered by (updated_at, id).
+            models.Index(fields=['updated_at', 'id'], name='loan_updated_at_id_idx'),
+        ]
+
     def __str__(self):
         return self.external_id
 
@@ -53,6 +85,11 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='payment_updated_at_id_idx'),
+        ]
+
     def __str__(self):
         return self.external_id
 
@@ -63,5 +100,132 @@ class PaymentDetail(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='detail_updated_at_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.payment.external_id} -> {self.loan.external_id}"
+
+class CustomerBalance(models.Model):
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='balance')
+    total_debt = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    available_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    open_loan_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.customer_id}: {self.total_debt}"
+
+class AllocationTask(models.Model):
+    """A payment waiting to be allocated over its customer's loans by the allocation workers."""
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='allocation_task')
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    status = models.SmallIntegerField(choices=ALLOCATION_TASK_STATUS_CHOICES, default=1)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.payment_id}: {self.get_status_display()}"
+
+class TransactionId(models.Func):
+    """Id of the current Postgres transaction; NULL on backends without one."""
+    function = 'txid_current'
+    template = '%(function)s()'
+    output_field = models.BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return 'NULL', []
+
+class OutboxEvent(models.Model):
+    """
+    A change to a loan or payment, written in the transaction that made it.
+
+    ``seq`` is assigned once the writing transaction can no longer be
+    overtaken by an earlier one (see ``loan/outbox.py``), so consumers can
+    page through it with a plain ``seq > after`` cursor.
+    """
+    seq = models.BigIntegerField(unique=True, null=True, blank=True)
+    xid = models.BigIntegerField(db_default=TransactionId(), null=True)
+    kind = models.CharField(max_length=40)
+    entity_id = models.BigIntegerField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['xid', 'id'], condition=models.Q(seq__isnull=True),
+                         name='outbox_unsequenced_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.seq}: {self.kind} {self.entity_id}"
+
+class SweepCheckpoint(models.Model):
+    """Progress of a chunked background pass over a table, so an interrupted run resumes where it stopped."""
+    name = models.CharField(max_length=60, unique=True)
+    as_of = models.DateTimeField()
+    last_id = models.BigIntegerField(default=0)
+    chunks = models.PositiveIntegerField(default=0)
+    overdue = models.PositiveBigIntegerField(default=0)
+    defaulted = models.PositiveBigIntegerField(default=0)
+    skipped = models.PositiveBigIntegerField(default=0)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+class ContractTerms(models.Model):
+    """Installment terms of a ``Loan.contract_version``; the last installment falls on the loan's maximum payment date."""
+    contract_version = models.CharField(max_length=30, unique=True)
+    installments = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
+    # Days between installments; only a single installment may do without one.
+    period_days = models.PositiveSmallIntegerField(default=30)
+    annual_rate = models.DecimalField(max_digits=7, decimal_places=6, default=0, validators=RATE_VALIDATORS)
+    # Extra annual rate accrued on loans past their maximum payment date.
+    late_fee_rate = models.DecimalField(max_digits=7, decimal_places=6, default=0, validators=RATE_VALIDATORS)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.contract_version
+
+class LoanInstallment(models.Model):
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='installments')
+    number = models.PositiveSmallIntegerField()
+    due_date = models.DateTimeField()
+    principal = models.DecimalField(max_digits=12, decimal_places=2)
+    interest = models.DecimalField(max_digits=12, decimal_places=2)
+    payment = models.DecimalField(max_digits=12, decimal_places=2)
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'number'], name='installment_loan_number_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.loan_id} #{self.number}"
+
+class LoanAccrual(models.Model):
+    """Interest and late fee added to a loan's outstanding for one day; at most one per loan and date."""
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='accruals')
+    accrual_date = models.DateField()
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2)
+    interest = models.DecimalField(max_digits=12, decimal_places=2)
+    fee = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'accrual_date'], name='accrual_loan_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.loan_id} {self.accrual_date}: {self.interest} + {self.fee}"
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.db.models.expressions import RawSQL
+
+from backend_for_frontend.routers import use_primary
+
+from .models import OutboxEvent
+
+# pg_try_advisory_xact_lock key serializing the sequencer.
+SEQUENCER_LOCK_ID = 720_020
+
+
+def record_events(events):
+    """
+    Write ``(kind, entity_id, payload)`` events to the outbox. Call it inside
+    the transaction making the change, so the events commit (or roll back)
+    with it.
+    """
+    OutboxEvent.objects.bulk_create(
+        [OutboxEvent(kind=kind, entity_id=entity_id, payload=payload) for kind, entity_id, payload in events],
+        batch_size=settings.BULK_BATCH_SIZE,
+    )
+
+
+def loan_created_events(loans):
+    return [
+        ('loan.created', loan.pk, {'customer': loan.customer_id, 'external_id': loan.external_id,
+                                   'amount': loan.amount, 'outstanding': loan.outstanding, 'status': loan.status})
+        for loan in loans
+    ]
+
+
+def allocation_events(payments, details):
+    """``payment.allocated`` for each payment and ``loan.paid`` for each loan the payments paid off."""
+    details_by_payment = {payment.pk: [] for payment in payments}
+    paid_loans = {}
+    for detail in details:
+        details_by_payment[detail.payment.pk].append({'loan': detail.loan.pk, 'amount': detail.amount})
+        if detail.loan.status == 4:
+            paid_loans[detail.loan.pk] = detail.loan
+
+    events = [
+        ('payment.allocated', payment.pk, {'customer': payment.customer_id, 'external_id': payment.external_id,
+                                           'total_amount': payment.total_amount,
+                                           'details': details_by_payment[payment.pk]})
+        for payment in payments
+    ]
+    events += [
+        ('loan.paid', loan.pk, {'customer': loan.customer_id, 'paid_at': loan.updated_at})
+        for loan in paid_loans.values()
+    ]
+    return events
+
+
+def loan_transition_events(loans):
+    """``loan.activated`` or ``loan.rejected`` for loans just moved out of Pending."""
+    kinds = {2: 'loan.activated', 3: 'loan.rejected'}
+    return [(kinds[loan.status], loan.pk, {'customer': loan.customer_id}) for loan in loans]
+
+
+def payment_confirmed_events(payment):
+    return [('payment.confirmed', payment.pk, {'customer': payment.customer_id, 'external_id': payment.external_id,
+                                               'status': payment.status})]
+
+
+def sequence_events(limit=None):
+    """
+    Give the next ``seq`` numbers to events whose transaction has settled and
+    return how many were sequenced.
+
+    Ids are handed out when a transaction inserts, not when it commits, so a
+    plain ``id > after`` cursor would skip an event committed after a later
+    id was already read. On Postgres an event is only sequenced once every
+    transaction older than its own has finished, in transaction order. The
+    sequencer holds an advisory lock, so ``seq`` has no gaps and never goes
+    back; while another sequencer holds it this returns 0 right away instead
+    of queueing behind it. Other backends serialize writers already and use
+    insertion order.
+
+    Runs in ``manage.py sequence_outbox``, not in the feed's read path.
+    """
+    with use_primary(), transaction.atomic():
+        ready = OutboxEvent.objects.filter(seq__isnull=True)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [SEQUENCER_LOCK_ID])
+                if not cursor.fetchone()[0]:
+                    return 0
+            ready = ready.filter(
+                Q(xid__lt=RawSQL('txid_snapshot_xmin(txid_current_snapshot())', []))
+                | Q(xid=RawSQL('txid_current_if_assigned()', []))
+            )
+        events = list(ready.order_by('xid', 'id').only('id')[:limit or settings.BULK_BATCH_SIZE])
+        if not events:
+            return 0
+
+        last = OutboxEvent.objects.aggregate(last=Max('seq'))['last'] or 0
+        for offset, event in enumerate(events, 1):
+            event.seq = last + offset
+        OutboxEvent.objects.bulk_update(events, ['seq'])
+        return len(events)
+
+
+def read_events(after, limit):
+    """Sequenced events with ``seq > after``, oldest first. Read-only."""
+    with use_primary():
+        return list(OutboxEvent.objects.filter(seq__gt=after).order_by('seq')[:limit])
+
+
+async def aread_events(after, limit):
+    """Async counterpart of ``read_events`` for the async feed endpoint."""
+    with use_primary():
+        return [event async for event in OutboxEvent.objects.filter(seq__gt=after).order_by('seq')[:limit]]
@@ -0,0 +1,16 @@
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the primary key.
+
+    The cursor is DRF's opaque base64 token and always encodes an ``id``, which
+    is unique, so each page is a range scan on the primary key index and page N
+    costs the same as page 1.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
@@ -0,0 +1,96 @@
+import decimal
+import functools
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, fields, relations
+from rest_framework.settings import api_settings
+
+# Fields whose representation of a database value is the value itself.
+_PASSTHROUGH_FIELDS = (fields.CharField, fields.IntegerField, fields.ChoiceField)
+
+
+class RowReader:
+    """
+    Turns ``.values()`` rows into the same dicts a serializer would produce
+    for the matching model instances.
+
+    The serializer's fields are inspected once: plain columns are passed
+    through, decimals and datetimes get a converter that mirrors
+    ``DecimalField``/``DateTimeField``, and anything else uses the field's
+    own ``to_representation``. ``field_names`` restricts the reader to a
+    subset of the fields, kept in the serializer's order.
+    """
+
+    def __init__(self, serializer_class, field_names=None):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        model_fields = {field.name for field in model._meta.concrete_fields}
+
+        self.field_names = []
+        self._converters = []
+        for name, field in serializer.fields.items():
+            if field.write_only or (field_names is not None and name not in field_names):
+                continue
+            if field.source != name or name not in model_fields:
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name} is not a plain model field and cannot be read from rows'
+                )
+            self.field_names.append(name)
+            converter = self._converter_for(field)
+            if converter is not None:
+                self._converters.append((name, converter))
+        self.field_names = tuple(self.field_names)
+
+    def _converter_for(self, field):
+        if isinstance(field, _PASSTHROUGH_FIELDS):
+            return None
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+            return None
+        if isinstance(field, fields.DecimalField) and self._is_plain_decimal(field):
+            return self._decimal_converter(field)
+        if isinstance(field, fields.DateTimeField) and self._is_iso_datetime(field):
+            return self._datetime_converter(field)
+        return field.to_representation
+
+    def _is_plain_decimal(self, field):
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        return (coerce_to_string and field.decimal_places is not None
+                and not field.localize and not field.normalize_output)
+
+    def _is_iso_datetime(self, field):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        return output_format is not None and output_format.lower() == ISO_8601 and not hasattr(field, 'timezone')
+
+    def _decimal_converter(self, field):
+        quantum = decimal.Decimal('.1') ** field.decimal_places
+        rounding = field.rounding
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+
+        def convert(value):
+            return '{:f}'.format(value.quantize(quantum, rounding=rounding, context=context))
+        return convert
+
+    def _datetime_converter(self, field):
+        def convert(value):
+            value = value.astimezone(timezone.get_current_timezone()).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return convert
+
+    def convert(self, rows):
+        """Convert ``rows`` (dicts keyed by ``field_names``) in place and return them."""
+        for row in rows:
+            for name, converter in self._converters:
+                value = row[name]
+                if value is not None:
+                    row[name] = converter(value)
+        return rows
+
+
+@functools.lru_cache(maxsize=256)
+def row_reader(serializer_class, field_names=None):
+    return RowReader(serializer_class, field_names)
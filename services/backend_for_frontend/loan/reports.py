@@ -0,0 +1,106 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Loan, PaymentDetail, LOAN_STATUS_CHOICES, OPEN_LOAN_STATUSES
+
+# (label, lowest, highest) days past maximum_payment_date; None is unbounded.
+AGING_BUCKETS = [
+    ('current', None, -1),
+    ('0-30', 0, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None),
+]
+
+# Loans whose amount was actually lent: Active, Paid, Overdue and Defaulted.
+DISBURSED_STATUSES = [2, 4, 5, 6]
+
+CENTS = Decimal('0.01')
+
+
+def _money(value):
+    return str((value or Decimal(0)).quantize(CENTS))
+
+
+def _rate(part, total):
+    return round(float(part / total), 4) if total else None
+
+
+def _aging_filter(cutoff, lowest, highest):
+    # A loan is ``n`` days past due when its maximum payment date falls within
+    # the ``n``-th day before ``cutoff`` (the end of the as-of date).
+    condition = Q()
+    if lowest is not None:
+        condition &= Q(maximum_payment_date__lt=cutoff - timedelta(days=lowest))
+    if highest is not None:
+        condition &= Q(maximum_payment_date__gte=cutoff - timedelta(days=highest + 1))
+    return condition
+
+
+def portfolio_report(as_of):
+    """
+    Portfolio figures as of the end of ``as_of`` (a date in the current time zone).
+
+    Every section is one aggregate query (``GROUP BY`` or ``FILTER``), so the
+    database scans the loans once per section and nothing is paged into Python.
+    Loans created and payments made after ``as_of`` are left out; statuses and
+    outstanding amounts are the current ones.
+    """
+    cutoff = timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min))
+    loans = Loan.objects.all()
+    details = PaymentDetail.objects.filter(payment__paid_at__lt=cutoff)
+    if cutoff <= timezone.now():
+        loans = loans.filter(created_at__lt=cutoff)
+        details = details.filter(loan__created_at__lt=cutoff)
+
+    status_names = dict(LOAN_STATUS_CHOICES)
+    by_status = {}
+    originated = Decimal(0)
+    for row in loans.order_by('status').values('status').annotate(
+        count=Count('id'), amount=Sum('amount'), outstanding=Sum('outstanding')
+    ):
+        by_status[status_names.get(row['status'], str(row['status']))] = {
+            'count': row['count'], 'amount': _money(row['amount']), 'outstanding': _money(row['outstanding']),
+        }
+        if row['status'] in DISBURSED_STATUSES:
+            originated += row['amount']
+
+    aggregates = {}
+    for label, lowest, highest in AGING_BUCKETS:
+        condition = _aging_filter(cutoff, lowest, highest)
+        aggregates[f'{label}_count'] = Count('id', filter=condition)
+        aggregates[f'{label}_outstanding'] = Sum('outstanding', filter=condition)
+    aging_row = loans.filter(status__in=OPEN_LOAN_STATUSES).aggregate(**aggregates)
+    aging = {
+        label: {'count': aging_row[f'{label}_count'], 'outstanding': _money(aging_row[f'{label}_outstanding'])}
+        for label, _, _ in AGING_BUCKETS
+    }
+    open_outstanding = sum((aging_row[f'{label}_outstanding'] or Decimal(0) for label, _, _ in AGING_BUCKETS),
+                           Decimal(0))
+    past_due = open_outstanding - (aging_row['current_outstanding'] or Decimal(0))
+
+    collections = details.aggregate(
+        collected=Sum('amount'),
+        last_30_days=Sum('amount', filter=Q(payment__paid_at__gte=cutoff - timedelta(days=30))),
+    )
+    collected = collections['collected'] or Decimal(0)
+
+    return {
+        'as_of': as_of.isoformat(),
+        'by_status': by_status,
+        'aging': aging,
+        'delinquency': {
+            'open_outstanding': _money(open_outstanding),
+            'past_due_outstanding': _money(past_due),
+            'past_due_rate': _rate(past_due, open_outstanding),
+        },
+        'collections': {
+            'originated': _money(originated),
+            'collected': _money(collected),
+            'collected_last_30_days': _money(collections['last_30_days']),
+            'collection_rate': _rate(collected, originated),
+        },
+    }
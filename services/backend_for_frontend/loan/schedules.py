@@ -0,0 +1,108 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from .cache import response_cache
+from .models import ContractTerms, LoanInstallment
+
+MICROSECONDS_PER_DAY = 86_400_000_000
+
+
+def amortize(principal, installments, period_rate):
+    """
+    French (constant payment) amortization of every loan in ``principal``, an
+    int64 array of amounts in cents, at once.
+
+    Returns the ``(payment, principal, interest, balance)`` int64 arrays of
+    shape ``(loans, installments)``, in cents. The payment is rounded to the
+    cent and the last installment takes whatever rounding left, so the
+    principal column always adds up to the amount lent.
+    """
+    principal = np.asarray(principal, dtype=np.int64)
+    if period_rate:
+        payment = np.rint(principal * period_rate / (1 - (1 + period_rate) ** -installments)).astype(np.int64)
+    else:
+        payment = -(-principal // installments)
+
+    shape = (len(principal), installments)
+    paid = np.empty(shape, dtype=np.int64)
+    interest = np.empty(shape, dtype=np.int64)
+    balance = np.empty(shape, dtype=np.int64)
+    remaining = principal.copy()
+    # One step per installment number, each one over all the loans.
+    for k in range(installments):
+        interest[:, k] = np.rint(remaining * period_rate)
+        if k == installments - 1:
+            paid[:, k] = remaining
+        else:
+            paid[:, k] = np.clip(payment - interest[:, k], 0, remaining)
+        remaining = remaining - paid[:, k]
+        balance[:, k] = remaining
+    return paid + interest, paid, interest, balance
+
+
+def build_schedules(loans):
+    """
+    (Re)generate the installment schedules of ``loans`` from the terms of
+    their ``contract_version``.
+
+    Loans sharing terms are amortized together by ``amortize`` and the rows
+    are written with ``bulk_create``, so a batch costs one query for the terms,
+    one delete and one insert per ``BULK_BATCH_SIZE`` installments whatever its
+    size. Loans without known terms get a single installment for the whole
+    amount on their maximum payment date. Returns the number of rows written.
+    """
+    loans = list(loans)
+    if not loans:
+        return 0
+    terms = ContractTerms.objects.in_bulk({loan.contract_version for loan in loans if loan.contract_version},
+                                          field_name='contract_version')
+    groups = {}
+    for loan in loans:
+        groups.setdefault(terms.get(loan.contract_version), []).append(loan)
+
+    loan_ids = [loan.pk for loan in loans]
+    LoanInstallment.objects.filter(loan_id__in=loan_ids).delete()
+    written = 0
+    for group_terms, group in groups.items():
+        rows = _installments(group_terms, group)
+        LoanInstallment.objects.bulk_create(rows, batch_size=settings.BULK_BATCH_SIZE)
+        written += len(rows)
+    response_cache.invalidate('schedule', loan_ids)
+    return written
+
+
+def _installments(terms, loans):
+    if terms is None:
+        installments, period_days, period_rate = 1, 0, 0.0
+    else:
+        installments, period_days = terms.installments, terms.period_days
+        period_rate = float(terms.annual_rate) * period_days / 365
+
+    cents = np.fromiter((int(loan.amount * 100) for loan in loans), dtype=np.int64, count=len(loans))
+    maturity = np.fromiter((round(loan.maximum_payment_date.timestamp() * 1_000_000) for loan in loans),
+                           dtype=np.int64, count=len(loans))
+    payment, principal, interest, balance = amortize(cents, installments, period_rate)
+
+    # The last installment is due on the maximum payment date, the others one period apart before it.
+    periods_left = np.arange(installments - 1, -1, -1, dtype=np.int64) * period_days * MICROSECONDS_PER_DAY
+    due = (maturity[:, None] - periods_left).astype('datetime64[us]')
+
+    utc = datetime.timezone.utc
+    numbers = range(1, installments + 1)
+    return [
+        LoanInstallment(
+            loan_id=loan.pk, number=number, due_date=due_date.replace(tzinfo=utc),
+            payment=_money(row_payment), principal=_money(row_principal),
+            interest=_money(row_interest), balance=_money(row_balance),
+        )
+        for loan, *columns in zip(loans, due.tolist(), payment.tolist(), principal.tolist(),
+                                  interest.tolist(), balance.tolist())
+        for number, due_date, row_payment, row_principal, row_interest, row_balance in zip(numbers, *columns)
+    ]
+
+
+def _money(cents):
+    return Decimal(cents).scaleb(-2)
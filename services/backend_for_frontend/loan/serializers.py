@@ -1,12 +1,50 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Customer, Loan, Payment, PaymentDetail
-from django.db.models import Sum
+from .models import (
+    ContractTerms, Customer, CustomerBalance, Loan, LoanInstallment, OutboxEvent, Payment, PaymentDetail
+)
 
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = '__all__'
 
+class CustomerListSerializer(serializers.ListSerializer):
+    """
+    Batch onboarding: checks ``external_id`` uniqueness for the whole list with
+    one query and inserts with ``bulk_create``.
+    """
+
+    def to_internal_value(self, data):
+        validated = super().to_internal_value(data)
+
+        external_ids = [item['external_id'] for item in validated]
+        existing = set(
+            Customer.objects.filter(external_id__in=external_ids).values_list('external_id', flat=True)
+        )
+        errors = []
+        seen = set()
+        for external_id in external_ids:
+            if external_id in existing or external_id in seen:
+                errors.append({'external_id': ['customer with this external id already exists.']})
+            else:
+                errors.append({})
+            seen.add(external_id)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated
+
+    def create(self, validated_data):
+        customers = [Customer(**item) for item in validated_data]
+        return Customer.objects.bulk_create(customers, batch_size=settings.BULK_BATCH_SIZE)
+
+class CustomerBulkSerializer(CustomerSerializer):
+    class Meta(CustomerSerializer.Meta):
+        # Uniqueness is checked once for the whole list by CustomerListSerializer.
+        extra_kwargs = {'external_id': {'validators': []}}
+        list_serializer_class = CustomerListSerializer
+
 class LoanSerializer(serializers.ModelSerializer):
     class Meta:
         model = Loan
@@ -25,18 +63,68 @@ class PaymentDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['status']
 
 class CustomerBalanceSerializer(serializers.ModelSerializer):
-    total_debt = serializers.SerializerMethodField()
-    available_amount = serializers.SerializerMethodField()
+    external_id = serializers.CharField(source='customer.external_id')
+    score = serializers.DecimalField(source='customer.score', max_digits=12, decimal_places=2)
+    # Rendered as JSON numbers, as they were before the ledger.
+    total_debt = serializers.DecimalField(max_digits=14, decimal_places=2, coerce_to_string=False)
+    available_amount = serializers.DecimalField(max_digits=14, decimal_places=2, coerce_to_string=False)
 
     class Meta:
-        model = Customer
-        fields = ['external_id', 'score', 'total_debt', 'available_amount']
+        model = CustomerBalance
+        fields = ['external_id', 'score', 'total_debt', 'available_amount', 'open_loan_count']
 
-    def get_total_debt(self, obj):
-        loans = Loan.objects.filter(customer=obj, status__in=[1, 2])
-        total_debt = loans.aggregate(total=Sum('outstanding'))['total']
-        return total_debt if total_debt is not None else 0
+class BulkPaymentSerializer(serializers.Serializer):
+    """
+    One item of ``POST /payments/bulk/``. The customer is a plain id and
+    ``external_id`` has no unique validator, so validating an item runs no
+    queries; the bulk ingestion checks both for the whole batch at once.
+    """
+    external_id = serializers.CharField(max_length=60)
+    customer = serializers.IntegerField()
+    total_amount = serializers.DecimalField(max_digits=20, decimal_places=10)
+    paid_at = serializers.DateTimeField()
 
-    def get_available_amount(self, obj):
-        total_debt = self.get_total_debt(obj)
-        return obj.score - total_debt
\ No newline at end of file
+class BulkLoanSerializer(serializers.Serializer):
+    """One item of ``POST /loans/bulk/``; see ``BulkPaymentSerializer``."""
+    external_id = serializers.CharField(max_length=60)
+    customer = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    contract_version = serializers.CharField(max_length=30, required=False, allow_null=True, allow_blank=True)
+    maximum_payment_date = serializers.DateTimeField()
+    taken_at = serializers.DateTimeField(required=False, allow_null=True)
+
+class OutboxEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OutboxEvent
+        fields = ['seq', 'kind', 'entity_id', 'payload', 'created_at']
+
+class LoanTransitionSerializer(serializers.Serializer):
+    """Body of ``POST /loans/activate/`` and ``/loans/reject/``: the loans, by id and/or external id."""
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list,
+                                max_length=settings.BULK_MAX_ITEMS)
+    external_ids = serializers.ListField(child=serializers.CharField(max_length=60), required=False, default=list,
+                                         max_length=settings.BULK_MAX_ITEMS)
+
+    def validate(self, attrs):
+        if not attrs['ids'] and not attrs['external_ids']:
+            raise serializers.ValidationError('Provide ids or external_ids.')
+        return attrs
+
+class ContractTermsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ContractTerms
+        fields = '__all__'
+
+    def validate(self, attrs):
+        # Partial updates are checked against the stored terms.
+        installments = attrs.get('installments', getattr(self.instance, 'installments', None))
+        period_days = attrs.get('period_days', getattr(self.instance, 'period_days', 30))
+        if installments and installments > 1 and period_days < 1:
+            raise serializers.ValidationError(
+                {'period_days': ['Must be at least 1 when there is more than one installment.']})
+        return attrs
+
+class LoanInstallmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LoanInstallment
+        fields = ['number', 'due_date', 'payment', 'principal', 'interest', 'balance']
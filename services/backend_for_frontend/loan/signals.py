@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import response_cache
+from .models import Customer, CustomerBalance, Loan, Payment, PaymentDetail
+
+
+# Single-row writes (API, admin, shell); bulk writes invalidate explicitly.
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer(sender, instance, **kwargs):
+    response_cache.invalidate('customer', [instance.pk])
+    response_cache.invalidate('balance', [instance.pk])
+
+
+@receiver(post_save, sender=CustomerBalance)
+@receiver(post_delete, sender=CustomerBalance)
+def invalidate_balance(sender, instance, **kwargs):
+    response_cache.invalidate('balance', [instance.customer_id])
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def invalidate_loan(sender, instance, **kwargs):
+    response_cache.invalidate('loan', [instance.pk])
+    response_cache.invalidate('schedule', [instance.pk])
+    response_cache.invalidate('balance', [instance.customer_id])
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_payment(sender, instance, **kwargs):
+    response_cache.invalidate('payment', [instance.pk])
+    response_cache.invalidate('payment-details', [instance.pk])
+
+
+@receiver(post_save, sender=PaymentDetail)
+@receiver(post_delete, sender=PaymentDetail)
+def invalidate_payment_detail(sender, instance, **kwargs):
+    response_cache.invalidate('payment-detail', [instance.pk])
+    response_cache.invalidate('payment-details', [instance.payment_id])
@@ -0,0 +1,110 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .cache import response_cache
+from .ledger import claim_balances
+from .models import Loan, SweepCheckpoint
+from .outbox import record_events
+
+SWEEP_NAME = 'overdue-loans'
+ACTIVE = 2
+OVERDUE = 5
+DEFAULTED = 6
+
+
+def sweep_overdue_loans(chunk_size=None, pause=None, max_chunks=None, restart=False):
+    """
+    Move Active loans past their ``maximum_payment_date`` to Overdue, and
+    Active or Overdue loans more than ``LOAN_DEFAULT_AFTER_DAYS`` past it to
+    Defaulted. Pending loans were never disbursed and are left alone.
+
+    Loans are walked in id ranges of ``chunk_size``, each one a short
+    transaction that claims the customers' ledger rows, reads the due loans
+    again under those locks and moves them with two set-based ``UPDATE``
+    statements, and that also moves the checkpoint, so an interrupted pass resumes where it
+    stopped (with the cutoff it started with) and concurrent runs take turns
+    instead of repeating work. Customers whose ledger is held by a request are
+    skipped rather than waited for and are picked up by the next pass. Returns
+    the checkpoint, whose counters cover the whole pass.
+    """
+    chunk_size = chunk_size or settings.LOAN_SWEEP_CHUNK_SIZE
+    pause = settings.LOAN_SWEEP_PAUSE if pause is None else pause
+
+    checkpoint = _start_pass(restart)
+    max_id = Loan.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    chunks = 0
+    while checkpoint.last_id < max_id and (max_chunks is None or chunks < max_chunks):
+        if chunks and pause:
+            time.sleep(pause)
+        checkpoint = _sweep_chunk(checkpoint.pk, chunk_size, max_id)
+        chunks += 1
+
+    if checkpoint.last_id >= max_id and checkpoint.finished_at is None:
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=['finished_at', 'updated_at'])
+    return checkpoint
+
+
+def _start_pass(restart):
+    now = timezone.now()
+    before_first = (Loan.objects.aggregate(min_id=Min('id'))['min_id'] or 1) - 1
+    checkpoint, created = SweepCheckpoint.objects.get_or_create(
+        name=SWEEP_NAME, defaults={'as_of': now, 'started_at': now, 'last_id': before_first}
+    )
+    if not created and (restart or checkpoint.finished_at is not None):
+        checkpoint.as_of = checkpoint.started_at = now
+        checkpoint.last_id = before_first
+        checkpoint.chunks = 0
+        checkpoint.overdue = checkpoint.defaulted = checkpoint.skipped = 0
+        checkpoint.finished_at = None
+        checkpoint.save()
+    return checkpoint
+
+
+def _sweep_chunk(checkpoint_id, chunk_size, max_id):
+    with transaction.atomic():
+        checkpoint = SweepCheckpoint.objects.select_for_update().get(pk=checkpoint_id)
+        first_id = checkpoint.last_id + 1
+        last_id = min(checkpoint.last_id + chunk_size, max_id)
+        if first_id > last_id:
+            return checkpoint
+
+        default_cutoff = checkpoint.as_of - timedelta(days=settings.LOAN_DEFAULT_AFTER_DAYS)
+        in_chunk = Loan.objects.filter(id__range=(first_id, last_id))
+        due = in_chunk.filter(maximum_payment_date__lt=checkpoint.as_of).filter(
+            Q(status=ACTIVE) | Q(status=OVERDUE, maximum_payment_date__lt=default_cutoff))
+        candidates = list(due.values_list('customer_id', flat=True))
+
+        claimed = set(claim_balances(set(candidates))) if candidates else set()
+        # Read again under the ledger locks: a loan paid off in the meantime is no longer due.
+        applied = [
+            (loan_id, customer_id, DEFAULTED if due_date < default_cutoff else OVERDUE)
+            for loan_id, customer_id, due_date in due.filter(customer_id__in=claimed).values_list(
+                'id', 'customer_id', 'maximum_payment_date')
+        ]
+        now = timezone.now()
+        defaulted = Loan.objects.filter(
+            id__in=[loan_id for loan_id, _, status in applied if status == DEFAULTED]
+        ).update(status=DEFAULTED, updated_at=now)
+        overdue = Loan.objects.filter(
+            id__in=[loan_id for loan_id, _, status in applied if status == OVERDUE]
+        ).update(status=OVERDUE, updated_at=now)
+
+        record_events([
+            ('loan.defaulted' if status == DEFAULTED else 'loan.overdue', loan_id, {'customer': customer_id})
+            for loan_id, customer_id, status in applied
+        ])
+        response_cache.invalidate('loan', [loan_id for loan_id, _, _ in applied])
+
+        checkpoint.last_id = last_id
+        checkpoint.chunks += 1
+        checkpoint.defaulted += defaulted
+        checkpoint.overdue += overdue
+        checkpoint.skipped += sum(1 for customer_id in candidates if customer_id not in claimed)
+        checkpoint.save()
+        return checkpoint
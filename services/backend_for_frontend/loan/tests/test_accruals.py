@@ -0,0 +1,173 @@
+import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.accruals import accrue_loans, daily_charges
+from loan.ledger import find_drift
+from loan.models import (
+    ContractTerms, Customer, CustomerBalance, Loan, LoanAccrual, OutboxEvent, SweepCheckpoint
+)
+
+
+class AccrualTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        # 36.5% a year is 0.1% a day, plus another 0.1% a day once past due.
+        ContractTerms.objects.create(contract_version='1.0', installments=1, annual_rate=Decimal('0.365'),
+                                     late_fee_rate=Decimal('0.365'))
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('100000'), preapproved_at=timezone.now()
+        )
+        self.accrual_date = timezone.localdate()
+        now = timezone.now()
+        for name, status, outstanding, days_past_due, contract_version in [
+                ('current', 2, '1000', -10, '1.0'), ('late', 2, '500', 10, '1.0'), ('overdue', 5, '200', 40, '1.0'),
+                ('pending', 1, '1000', -10, '1.0'), ('paid', 4, '0', 10, '1.0'), ('no_terms', 2, '1000', 10, '9.9'),
+                ('created_later', 2, '1000', -10, '1.0')]:
+            Loan.objects.create(external_id=name, customer=self.customer, amount=Decimal('1000'), status=status,
+                                outstanding=Decimal(outstanding), contract_version=contract_version,
+                                maximum_payment_date=now - timedelta(days=days_past_due))
+        Loan.objects.filter(external_id='created_later').update(created_at=now + timedelta(days=2))
+
+    def outstanding(self):
+        return dict(Loan.objects.values_list('external_id', 'outstanding'))
+
+    def test_accrual(self):
+        balance_before = self.client.get(reverse('customer-balance', args=[self.customer.id]))
+        debt_before = json.loads(balance_before.content, parse_float=Decimal)['total_debt']
+
+        checkpoint = accrue_loans(self.accrual_date, pause=0)
+        self.assertIsNotNone(checkpoint.finished_at)
+        self.assertEqual(
+            {accrual.loan.external_id: (accrual.outstanding, accrual.interest, accrual.fee)
+             for accrual in LoanAccrual.objects.select_related('loan')},
+            {'current': (Decimal('1000'), Decimal('1.00'), Decimal('0')),
+             'late': (Decimal('500'), Decimal('0.50'), Decimal('0.50')),
+             'overdue': (Decimal('200'), Decimal('0.20'), Decimal('0.20'))},
+        )
+        outstanding = self.outstanding()
+        self.assertEqual((outstanding['current'], outstanding['late'], outstanding['overdue']),
+                         (Decimal('1001.00'), Decimal('501.00'), Decimal('200.40')))
+        self.assertEqual((outstanding['pending'], outstanding['no_terms'], outstanding['created_later']),
+                         (Decimal('1000'), Decimal('1000'), Decimal('1000')))
+
+        balance = json.loads(self.client.get(reverse('customer-balance', args=[self.customer.id])).content,
+                             parse_float=Decimal)
+        self.assertEqual(balance['total_debt'], debt_before + Decimal('2.40'))
+        self.assertEqual(list(find_drift()), [])
+
+    def test_loans_falling_due_during_the_day_are_not_late_yet(self):
+        start_of_day = timezone.make_aware(datetime.combine(self.accrual_date, time.min))
+        for external_id, maximum_payment_date in [('due_today', start_of_day + timedelta(hours=12)),
+                                                  ('due_at_midnight', start_of_day),
+                                                  ('due_yesterday', start_of_day - timedelta(seconds=1))]:
+            Loan.objects.create(external_id=external_id, customer=self.customer, amount=Decimal('1000'), status=2,
+                                outstanding=Decimal('1000'), contract_version='1.0',
+                                maximum_payment_date=maximum_payment_date)
+        Loan.objects.filter(external_id__startswith='due_').update(created_at=start_of_day - timedelta(days=30))
+
+        accrue_loans(self.accrual_date, pause=0)
+        self.assertEqual(
+            dict(LoanAccrual.objects.filter(loan__external_id__startswith='due_').values_list(
+                'loan__external_id', 'fee')),
+            {'due_today': Decimal('0'), 'due_at_midnight': Decimal('0'), 'due_yesterday': Decimal('1.00')},
+        )
+
+    def test_accruals_are_published_on_the_change_feed(self):
+        accrue_loans(self.accrual_date, pause=0)
+        events = {event.entity_id: event.payload for event in OutboxEvent.objects.filter(kind='loan.accrued')}
+        late = Loan.objects.get(external_id='late')
+        self.assertEqual(set(events), set(LoanAccrual.objects.values_list('loan_id', flat=True)))
+        self.assertEqual(events[late.pk], {'customer': self.customer.pk, 'accrual_date': self.accrual_date.isoformat(),
+                                           'interest': '0.50', 'fee': '0.50', 'outstanding': '501.00'})
+
+        # Rerunning the date charges nothing and publishes nothing.
+        accrue_loans(self.accrual_date, pause=0)
+        self.assertEqual(OutboxEvent.objects.filter(kind='loan.accrued').count(), len(events))
+
+    def test_rerunning_a_date_is_a_no_op(self):
+        accrue_loans(self.accrual_date, pause=0)
+        after_first_run = self.outstanding()
+
+        with CaptureQueriesContext(connection) as queries:
+            accrue_loans(self.accrual_date, pause=0)
+        self.assertFalse([query for query in queries if 'loan_loanaccrual' in query['sql']])
+
+        # Without the checkpoint (e.g. deleted by hand) loans already accrued are still left out.
+        SweepCheckpoint.objects.filter(name__startswith='accrual:').delete()
+        accrue_loans(self.accrual_date, pause=0)
+        self.assertEqual(self.outstanding(), after_first_run)
+        self.assertEqual(LoanAccrual.objects.count(), 3)
+
+        # The next day accrues on the new outstanding.
+        accrue_loans(self.accrual_date + timedelta(days=1), pause=0)
+        self.assertEqual(LoanAccrual.objects.get(loan__external_id='current',
+                                                 accrual_date=self.accrual_date + timedelta(days=1)).interest,
+                         Decimal('1.00'))
+        self.assertEqual(self.outstanding()['current'], Decimal('1002.00'))
+
+    def test_interrupted_run_resumes(self):
+        first_id = Loan.objects.order_by('id').first().id
+        checkpoint = accrue_loans(self.accrual_date, chunk_size=2, pause=0, max_chunks=1)
+        self.assertIsNone(checkpoint.finished_at)
+        self.assertEqual(checkpoint.last_id, first_id + 1)
+        self.assertEqual(LoanAccrual.objects.count(), 2)
+
+        checkpoint = accrue_loans(self.accrual_date, chunk_size=2, pause=0)
+        self.assertIsNotNone(checkpoint.finished_at)
+        self.assertEqual(checkpoint.chunks, 4)
+        self.assertEqual(LoanAccrual.objects.count(), 3)
+
+    def test_accrual_invalidates_the_cached_loan(self):
+        loan = Loan.objects.get(external_id='current')
+        url = reverse('loan-detail', args=[loan.id])
+        self.assertEqual(json.loads(self.client.get(url).content)['outstanding'], '1000.00')
+        accrue_loans(self.accrual_date, pause=0)
+        self.assertEqual(json.loads(self.client.get(url).content)['outstanding'], '1001.00')
+
+    def test_daily_charges_round_half_up_to_the_cent(self):
+        interest, fee = daily_charges([100000, 365, 364, 100000], [120000, 500000, 500000, 0],
+                                      [0, 500000, 500000, 365000], [False, True, False, True])
+        self.assertEqual(interest.tolist(), [33, 1, 0, 0])
+        self.assertEqual(fee.tolist(), [0, 1, 0, 100])
+
+    def test_rates_are_capped_where_the_charges_stay_exact(self):
+        url = reverse('contractterms-list')
+        for rates in [{'annual_rate': '4.5'}, {'late_fee_rate': '9.999999'}, {'annual_rate': '-0.1'}]:
+            response = self.client.post(url, data={'contract_version': '2.0', 'installments': 1, **rates},
+                                        format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(list(json.loads(response.content)), list(rates))
+
+        # The cap on the largest outstanding a loan can hold still fits in int64.
+        interest, fee = daily_charges([999_999_999_999], [4_000_000], [4_000_000], [True])
+        self.assertEqual((interest.tolist(), fee.tolist()), ([10_958_904_110], [10_958_904_110]))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('accrue_loans', date=self.accrual_date, pause=0, stdout=out)
+        self.assertIn(f'Accrual for {self.accrual_date} finished: 3 loan(s), interest 1.70, fees 0.70.',
+                      out.getvalue())
+        self.assertEqual(CustomerBalance.objects.get(customer=self.customer).total_debt,
+                         sum(Loan.objects.filter(status__in=[1, 2, 5, 6]).values_list('outstanding', flat=True)))
@@ -0,0 +1,213 @@
+import json
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from django.contrib.auth.models import User
+from backend_for_frontend.models import UserAPIKey
+from loan import allocation
+from loan.allocation import allocate_queued
+from loan.ledger import ensure_balances, find_drift, lock_balances
+from loan.models import AllocationTask, Customer, CustomerBalance, Loan, Payment, PaymentDetail
+
+
+@override_settings(PAYMENT_ALLOCATION='async')
+class AllocationQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.customers = []
+        for i in range(2):
+            customer = Customer.objects.create(
+                external_id=f'external_{i:02}', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+            )
+            CustomerBalance.objects.create(customer=customer, total_debt=Decimal('1000'),
+                                           available_amount=Decimal('3000'), open_loan_count=1)
+            Loan.objects.create(external_id=f'external_{i:02}-01', customer=customer, amount=Decimal('1000'),
+                                outstanding=Decimal('1000'), maximum_payment_date=timezone.now())
+            self.customers.append(customer)
+
+    def pay(self, external_id, customer, amount):
+        payload = {'external_id': external_id, 'customer': customer.id,
+                   'total_amount': amount, 'paid_at': '2023-06-12T12:00:00Z'}
+        return self.client.post(reverse('payment-list'), data=payload, format='json')
+
+    def allocation_state(self, payment_id):
+        return json.loads(self.client.get(reverse('payment-allocation', args=[payment_id])).content)
+
+    def test_payment_is_accepted_and_allocated_later(self):
+        response = self.pay('payment_01', self.customers[0], 400.0)
+        self.assertEqual(response.status_code, 202)
+        payment_id = json.loads(response.content)['id']
+        self.assertEqual(self.allocation_state(payment_id)['state'], 'queued')
+        self.assertFalse(PaymentDetail.objects.exists())
+        self.assertEqual(Loan.objects.get(customer=self.customers[0]).outstanding, Decimal('1000'))
+
+        self.assertEqual(allocate_queued(), 1)
+        self.assertEqual(self.allocation_state(payment_id)['state'], 'allocated')
+        self.assertEqual(Loan.objects.get(customer=self.customers[0]).outstanding, Decimal('600'))
+        self.assertEqual(CustomerBalance.objects.get(customer=self.customers[0]).total_debt, Decimal('600'))
+        self.assertEqual(list(find_drift()), [])
+
+    def test_queued_payments_count_against_the_debt(self):
+        self.assertEqual(self.pay('payment_01', self.customers[0], 700.0).status_code, 202)
+        self.assertEqual(self.pay('payment_02', self.customers[0], 400.0).status_code, 400)
+        self.assertEqual(self.pay('payment_03', self.customers[0], 300.0).status_code, 202)
+
+        self.assertEqual(allocate_queued(), 2)
+        loan = Loan.objects.get(customer=self.customers[0])
+        self.assertEqual((loan.outstanding, loan.status), (Decimal('0'), 4))
+        self.assertEqual(PaymentDetail.objects.count(), 2)
+
+    def test_bulk_payments_count_queued_payments_against_the_debt(self):
+        self.assertEqual(self.pay('payment_01', self.customers[0], 700.0).status_code, 202)
+        items = [{'external_id': f'payment_bulk_{i}', 'customer': self.customers[0].id, 'total_amount': amount,
+                  'paid_at': '2023-06-12T12:00:00Z'} for i, amount in enumerate(['400.00', '300.00'])]
+        result = json.loads(self.client.post(reverse('payment-bulk'), data=items, format='json').content)
+        self.assertEqual([item['status'] for item in result['results']], ['rejected', 'created'])
+
+        self.assertEqual(allocate_queued(), 1)
+        self.assertFalse(AllocationTask.objects.exists())
+        self.assertEqual(Loan.objects.get(customer=self.customers[0]).outstanding, Decimal('0'))
+
+    def test_payments_the_debt_cannot_absorb_stay_queued(self):
+        payment = Payment.objects.create(external_id='payment_01', customer=self.customers[0],
+                                         total_amount=Decimal('1200'), paid_at=timezone.now())
+        AllocationTask.objects.create(payment=payment, customer=self.customers[0])
+
+        self.assertEqual(allocate_queued(), 0)
+        state = self.allocation_state(payment.id)
+        self.assertEqual((state['state'], state['last_error']),
+                         ('queued', f'ValueError: Payment {payment.id} exceeds the open debt by 200.00'))
+        self.assertFalse(PaymentDetail.objects.exists())
+        self.assertEqual(Loan.objects.get(customer=self.customers[0]).outstanding, Decimal('1000'))
+
+    @override_settings(ALLOCATION_MAX_ATTEMPTS=2)
+    def test_failing_customer_does_not_block_the_others(self):
+        failing = self.customers[0]
+        payment_id = json.loads(self.pay('payment_01', failing, 100.0).content)['id']
+        self.pay('payment_02', self.customers[1], 100.0)
+        real_allocate = allocation.allocate_payments
+
+        def allocate(payments, loans_by_customer, batch_size=None):
+            if any(payment.customer_id == failing.id for payment in payments):
+                raise ValueError('boom')
+            return real_allocate(payments, loans_by_customer, batch_size)
+
+        with mock.patch.object(allocation, 'allocate_payments', allocate):
+            self.assertEqual(allocate_queued(), 1)
+            self.assertEqual(self.allocation_state(payment_id), {'payment': payment_id, 'state': 'queued',
+                                                                 'attempts': 1, 'last_error': 'ValueError: boom'})
+            self.assertEqual(allocate_queued(), 0)
+
+        self.assertEqual(self.allocation_state(payment_id)['state'], 'failed')
+        self.assertEqual(allocate_queued(), 0)
+        self.assertEqual(Loan.objects.get(customer=self.customers[1]).outstanding, Decimal('900'))
+
+    @override_settings(PAYMENT_ALLOCATION='sync')
+    def test_sync_mode_allocates_in_the_request(self):
+        response = self.pay('payment_01', self.customers[0], 400.0)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(AllocationTask.objects.exists())
+        self.assertEqual(self.allocation_state(json.loads(response.content)['id'])['state'], 'allocated')
+
+
+    def test_sync_payments_leave_the_debt_queued_payments_reserved(self):
+        self.assertEqual(self.pay('payment_01', self.customers[0], 700.0).status_code, 202)
+        with override_settings(PAYMENT_ALLOCATION='sync'):
+            self.assertEqual(self.pay('payment_02', self.customers[0], 400.0).status_code, 400)
+            self.assertEqual(self.pay('payment_03', self.customers[0], 300.0).status_code, 201)
+
+        self.assertEqual(allocate_queued(), 1)
+        self.assertFalse(AllocationTask.objects.exists())
+        self.assertEqual(Loan.objects.get(customer=self.customers[0]).outstanding, Decimal('0'))
+        self.assertEqual(list(find_drift()), [])
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class AllocationWorkerPoolTest(TransactionTestCase):
+    def test_workers_drain_the_queue(self):
+        user = User.objects.create_superuser(username='admin', password='adminpassword')
+        _, api_key = UserAPIKey.objects.create_key(name=user.username, user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Api-Key ' + api_key)
+
+        with override_settings(PAYMENT_ALLOCATION='async'):
+            for i in range(20):
+                customer = Customer.objects.create(
+                    external_id=f'external_{i:02}', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+                )
+                client.post(reverse('loan-list'), data={
+                    'external_id': f'external_{i:02}-01', 'customer': customer.id, 'amount': 1000.0,
+                    'contract_version': '1.0', 'maximum_payment_date': '2024-02-12T22:29:27Z'}, format='json')
+                for j in range(3):
+                    response = client.post(reverse('payment-list'), data={
+                        'external_id': f'payment_{i:02}-{j}', 'customer': customer.id,
+                        'total_amount': 100.0, 'paid_at': '2023-06-12T12:00:00Z'}, format='json')
+                    self.assertEqual(response.status_code, 202)
+
+        out = StringIO()
+        call_command('run_allocation_workers', workers=4, batch_customers=3, once=True, stdout=out)
+        self.assertIn('Allocated 60 payment(s).', out.getvalue())
+        self.assertFalse(AllocationTask.objects.exists())
+        self.assertEqual(PaymentDetail.objects.count(), 60)
+        self.assertEqual(set(Loan.objects.values_list('outstanding', flat=True)), {Decimal('700')})
+        self.assertEqual(list(find_drift()), [])
+        self.assertEqual(Payment.objects.count(), 60)
+
+    @override_settings(PAYMENT_ALLOCATION='async')
+    def test_a_held_customer_does_not_stall_the_next_claim(self):
+        customers = []
+        for i in range(2):
+            customer = Customer.objects.create(
+                external_id=f'external_{i:02}', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+            )
+            Loan.objects.create(external_id=f'external_{i:02}-01', customer=customer, amount=Decimal('1000'),
+                                outstanding=Decimal('1000'), status=2, maximum_payment_date=timezone.now())
+            payment = Payment.objects.create(external_id=f'payment_{i:02}', customer=customer,
+                                             total_amount=Decimal('100'), paid_at=timezone.now())
+            AllocationTask.objects.create(payment=payment, customer=customer)
+            customers.append(customer)
+        # customers[0] has the oldest queued payment and is held by another worker.
+        ensure_balances([customer.id for customer in customers])
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_ledger():
+            try:
+                with transaction.atomic():
+                    lock_balances([customers[0].id])
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_ledger)
+        thread.start()
+        locked.wait(10)
+        try:
+            self.assertEqual(allocate_queued(max_customers=1), 1)
+        finally:
+            release.set()
+            thread.join(10)
+
+        self.assertEqual(list(AllocationTask.objects.values_list('customer_id', flat=True)), [customers[0].id])
+        self.assertEqual(Loan.objects.get(customer=customers[1]).outstanding, Decimal('900'))
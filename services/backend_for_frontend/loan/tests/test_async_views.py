@@ -0,0 +1,114 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, CustomerBalance, Loan
+from loan.outbox import record_events, sequence_events
+
+
+class AsyncReadEndpointsTest(TestCase):
+    def setUp(self):
+        client = APIClient()
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+        response = client.post(reverse('register-admin'), data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.headers = {'Authorization': 'Api-Key ' + self.admin_api_key}
+
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        for i in range(3):
+            Loan.objects.create(external_id=f'external_01-{i:02}', customer=self.customer, amount=Decimal('1000'),
+                                outstanding=Decimal('1000'), maximum_payment_date=timezone.now())
+
+    async def test_requires_api_key(self):
+        response = await self.async_client.get(reverse('async-loan-list'))
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get(reverse('async-loan-list'),
+                                             headers={'Authorization': 'Api-Key invalid.key'})
+        self.assertEqual(response.status_code, 403)
+
+    async def test_detail_matches_sync_endpoint(self):
+        loan = await Loan.objects.afirst()
+        response = await self.async_client.get(reverse('async-loan-detail', args=[loan.id]), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        sync_client = APIClient()
+        sync_client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+        expected = await sync_to_async(sync_client.get)(reverse('loan-detail', args=[loan.id]))
+        # Same reader and renderer, so the very same bytes.
+        self.assertEqual(response.content, expected.content)
+
+        response = await self.async_client.get(reverse('async-loan-detail', args=[999999]), headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_list_pages_with_keyset_cursor(self):
+        url = reverse('async-loan-list')
+        response = await self.async_client.get(url, {'page_size': 2}, headers=self.headers)
+        first = json.loads(response.content)
+        self.assertEqual([loan['external_id'] for loan in first['results']], ['external_01-00', 'external_01-01'])
+
+        response = await self.async_client.get(first['next'], headers=self.headers)
+        second = json.loads(response.content)
+        self.assertEqual([loan['external_id'] for loan in second['results']], ['external_01-02'])
+        self.assertIsNone(second['next'])
+
+        response = await self.async_client.get(url, {'cursor': 'not-a-cursor'}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_list_links_match_the_sync_pagination(self):
+        sync_client = APIClient()
+        sync_client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+        sync_url, async_url = reverse('loan-list'), reverse('async-loan-list')
+
+        def cursors(page):
+            return [link and parse_qs(urlsplit(link).query)['cursor'][0] for link in (page['next'], page['previous'])]
+
+        # Forward to the last page, then back to the first one through the previous links.
+        sync_page = json.loads((await sync_to_async(sync_client.get)(sync_url, {'page_size': 1})).content)
+        async_page = json.loads((await self.async_client.get(async_url, {'page_size': 1},
+                                                             headers=self.headers)).content)
+        for link in ['next', 'next', 'previous', 'previous']:
+            self.assertEqual(async_page['results'], sync_page['results'])
+            self.assertEqual(cursors(async_page), cursors(sync_page))
+            sync_page = json.loads((await sync_to_async(sync_client.get)(sync_page[link])).content)
+            async_page = json.loads((await self.async_client.get(async_page[link], headers=self.headers)).content)
+        self.assertEqual(cursors(async_page), cursors(sync_page))
+        self.assertEqual([loan['external_id'] for loan in async_page['results']], ['external_01-00'])
+        self.assertIsNone(async_page['previous'])
+
+    async def test_balance_without_ledger_row(self):
+        await CustomerBalance.objects.filter(customer=self.customer).adelete()
+        response = await self.async_client.get(reverse('async-customer-balance', args=[self.customer.id]),
+                                             headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['external_id'], 'external_01')
+        self.assertEqual((data['total_debt'], data['available_amount']), (3000.0, 1000.0))
+        self.assertEqual(data['open_loan_count'], 3)
+
+    async def test_only_get_is_allowed(self):
+        response = await self.async_client.post(reverse('async-customer-list'), {}, headers=self.headers)
+        self.assertEqual(response.status_code, 405)
+
+    async def test_event_feed(self):
+        await sync_to_async(record_events)([('loan.created', 1, {}), ('loan.created', 2, {})])
+        await sync_to_async(sequence_events)()
+        response = await self.async_client.get(reverse('async-event-list'), {'after': 1, 'wait': 1},
+                                               headers=self.headers)
+        feed = json.loads(response.content)
+        self.assertEqual(([event['entity_id'] for event in feed['events']], feed['last_seq']), ([2], 2))
+
+        for params, error in [({'after': 'abc'}, {'after': ['A valid integer is required.']}),
+                              ({'wait': -1}, {'wait': ['Ensure this value is greater than or equal to 0.']})]:
+            response = await self.async_client.get(reverse('async-event-list'), params, headers=self.headers)
+            self.assertEqual((response.status_code, json.loads(response.content)), (400, error))
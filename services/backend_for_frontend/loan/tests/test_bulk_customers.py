@@ -0,0 +1,78 @@
+import json
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, CustomerBalance
+
+
+class BulkCustomerCreateTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.customer_url = reverse('customer-list')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+        # Warm the API key cache so measured requests pay the same auth cost.
+        self.client.get(self.customer_url)
+
+    def customers(self, prefix, count):
+        return [
+            {
+                'external_id': f'{prefix}_{i:03}',
+                'score': 1000.0 + i,
+                'preapproved_at': '2023-02-12T22:29:27.177914Z'
+            }
+            for i in range(count)
+        ]
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        with CaptureQueriesContext(connection) as small_queries:
+            response = self.client.post(self.customer_url, data=self.customers('small', 2), format='json')
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.client.post(self.customer_url, data=self.customers('large', 50), format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(Customer.objects.filter(external_id__startswith='large_').count(), 50)
+        self.assertEqual(len(json.loads(response.content)), 50)
+
+    def test_duplicates_are_reported_per_row(self):
+        self.client.post(self.customer_url, data=self.customers('existing', 1), format='json')
+        payload = self.customers('new', 2) + self.customers('existing', 1) + self.customers('new', 1)
+
+        response = self.client.post(self.customer_url, data=payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = json.loads(response.content)
+        self.assertEqual(errors[:2], [{}, {}])
+        self.assertIn('external_id', errors[2])
+        self.assertIn('external_id', errors[3])
+        self.assertFalse(Customer.objects.filter(external_id__startswith='new_').exists())
+
+    def test_batch_creates_balance_rows(self):
+        self.client.post(self.customer_url, data=self.customers('batch', 3), format='json')
+        balance = CustomerBalance.objects.get(customer__external_id='batch_002')
+        self.assertEqual(balance.available_amount, Decimal('1002.00'))
+        self.assertEqual(balance.total_debt, Decimal('0.00'))
+
+    @override_settings(BULK_MAX_ITEMS=3)
+    def test_batch_size_is_capped(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.customer_url, data=self.customers('too_many', 4), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'error': 'A batch cannot have more than 3 items'})
+        self.assertFalse([query for query in queries if 'loan_customer' in query['sql']])
+
+        response = self.client.post(self.customer_url, data=self.customers('enough', 3), format='json')
+        self.assertEqual(response.status_code, 201)
@@ -0,0 +1,94 @@
+import json
+from decimal import Decimal
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, CustomerBalance, Loan
+
+
+class BulkLoanOriginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.bulk_url = reverse('loan-bulk')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+        # Warm the API key cache so measured requests pay the same auth cost.
+        self.client.get(reverse('loan-list'))
+
+        self.first = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('1000'), preapproved_at=timezone.now()
+        )
+        self.second = Customer.objects.create(
+            external_id='external_02', status=1, score=Decimal('500'), preapproved_at=timezone.now()
+        )
+        Loan.objects.create(external_id='external_01-00', customer=self.first, amount=Decimal('200'),
+                            outstanding=Decimal('200'), maximum_payment_date=timezone.now())
+
+    def loan(self, external_id, customer, amount):
+        return {
+            'external_id': external_id,
+            'customer': customer.id,
+            'amount': amount,
+            'contract_version': '1.0',
+            'maximum_payment_date': '2024-02-12T22:29:27.177914Z'
+        }
+
+    def test_credit_limit_is_cumulative_within_the_batch(self):
+        payload = [
+            self.loan('external_01-01', self.first, 500.0),
+            self.loan('external_02-01', self.second, 500.0),
+            self.loan('external_01-02', self.first, 400.0),
+            self.loan('external_01-03', self.first, 300.0),
+        ]
+        response = self.client.post(self.bulk_url, data=payload, format='json')
+        self.assertEqual(response.status_code, 207)
+
+        data = json.loads(response.content)
+        self.assertEqual([result['status'] for result in data['results']],
+                         ['created', 'created', 'rejected', 'created'])
+        self.assertEqual(data['results'][2]['errors']['error'], 'Loan amount exceeds customer credit limit')
+        self.assertFalse(Loan.objects.filter(external_id='external_01-02').exists())
+
+        loan = Loan.objects.get(external_id='external_01-03')
+        self.assertEqual((loan.status, loan.outstanding), (1, Decimal('300.00')))
+        balance = CustomerBalance.objects.get(customer=self.first)
+        self.assertEqual(balance.total_debt, Decimal('1000.00'))
+        self.assertEqual(balance.open_loan_count, 3)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        # The first batch also creates the customers' ledger rows.
+        warmup = [self.loan('warmup_01', self.first, 1.0), self.loan('warmup_02', self.second, 1.0)]
+        self.client.post(self.bulk_url, data=warmup, format='json')
+        small = [self.loan('small_01', self.first, 1.0)]
+        large = [self.loan(f'large_{i:02}', [self.first, self.second][i % 2], 1.0) for i in range(20)]
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post(self.bulk_url, data=small, format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.client.post(self.bulk_url, data=large, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_rejects_duplicates_and_unknown_customers(self):
+        payload = [
+            self.loan('external_01-00', self.first, 1.0),
+            {**self.loan('external_09-01', self.first, 1.0), 'customer': 999999},
+        ]
+        response = self.client.post(self.bulk_url, data=payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        results = json.loads(response.content)['results']
+        self.assertIn('external_id', results[0]['errors'])
+        self.assertIn('customer', results[1]['errors'])
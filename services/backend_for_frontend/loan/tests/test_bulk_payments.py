@@ -0,0 +1,131 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan import bulk
+from loan.models import Customer, CustomerBalance, Loan, Payment, PaymentDetail
+
+
+class BulkPaymentTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.bulk_url = reverse('payment-bulk')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+        # Warm the API key cache so measured requests pay the same auth cost.
+        self.client.get(reverse('payment-list'))
+
+        self.customers = [self.create_customer_with_loans(f'external_{i:02}', 3) for i in range(2)]
+
+    def create_customer_with_loans(self, external_id, loan_count):
+        customer = Customer.objects.create(
+            external_id=external_id, status=1, score=Decimal('100000'), preapproved_at=timezone.now()
+        )
+        Loan.objects.bulk_create([
+            Loan(
+                external_id=f'{external_id}-{i:02}', customer=customer, amount=Decimal('100.00'),
+                outstanding=Decimal('100.00'), maximum_payment_date=timezone.now() + timedelta(days=i)
+            )
+            for i in range(loan_count)
+        ])
+        return customer
+
+    def payment(self, external_id, customer, total_amount):
+        return {
+            'external_id': external_id,
+            'customer': customer.id,
+            'total_amount': total_amount,
+            'paid_at': '2023-06-12T12:00:00Z'
+        }
+
+    def test_bulk_allocates_payments_in_request_order(self):
+        first, second = self.customers
+        payload = [
+            self.payment('payment_01', first, 150.0),
+            self.payment('payment_02', second, 300.0),
+            self.payment('payment_03', first, 100.0),
+        ]
+        response = self.client.post(self.bulk_url, data=payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content)['created'], 3)
+
+        outstanding = list(Loan.objects.filter(customer=first).order_by('maximum_payment_date')
+                           .values_list('outstanding', flat=True))
+        self.assertEqual(outstanding, [Decimal('0.00'), Decimal('0.00'), Decimal('50.00')])
+        self.assertEqual(PaymentDetail.objects.filter(payment__external_id='payment_03').count(), 2)
+        self.assertFalse(Loan.objects.filter(customer=second).exclude(status=4).exists())
+        self.assertEqual(CustomerBalance.objects.get(customer=first).total_debt, Decimal('50.00'))
+
+    def test_bulk_reports_partial_failures(self):
+        first, second = self.customers
+        Payment.objects.create(external_id='payment_existing', customer=first,
+                               total_amount=Decimal('1'), paid_at=timezone.now())
+        payload = [
+            self.payment('payment_01', first, 100.0),
+            self.payment('payment_existing', first, 10.0),
+            self.payment('payment_01', second, 10.0),
+            self.payment('payment_02', second, 1000.0),
+            {'external_id': 'payment_03', 'customer': 999999, 'total_amount': 1.0, 'paid_at': '2023-06-12T12:00:00Z'},
+            {'external_id': 'payment_04'},
+        ]
+        response = self.client.post(self.bulk_url, data=payload, format='json')
+        self.assertEqual(response.status_code, 207)
+
+        data = json.loads(response.content)
+        self.assertEqual(data['created'], 1)
+        self.assertEqual([result['status'] for result in data['results']],
+                         ['created', 'rejected', 'rejected', 'rejected', 'rejected', 'rejected'])
+        self.assertIn('external_id', data['results'][1]['errors'])
+        self.assertIn('external_id', data['results'][2]['errors'])
+        self.assertEqual(data['results'][3]['errors']['error'], 'Payment amount exceeds total debt')
+        self.assertIn('customer', data['results'][4]['errors'])
+        self.assertIn('total_amount', data['results'][5]['errors'])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        first, second = self.customers
+        small = [self.payment('small_01', first, 10.0)]
+        large = [self.payment(f'large_{i:02}', [first, second][i % 2], 10.0) for i in range(20)]
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post(self.bulk_url, data=small, format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.client.post(self.bulk_url, data=large, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_bulk_requires_a_list(self):
+        response = self.client.post(self.bulk_url, data=self.payment('payment_01', self.customers[0], 1.0),
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_external_id_taken_after_the_duplicate_check_is_a_conflict(self):
+        customer = self.customers[0]
+        real_reject_duplicates = bulk._reject_duplicates
+
+        def reject_duplicates_then_race(valid, errors, model):
+            real_reject_duplicates(valid, errors, model)
+            Payment.objects.create(external_id='payment_02', customer=customer, total_amount=Decimal('1.00'),
+                                   paid_at=timezone.now())
+
+        items = [self.payment('payment_01', customer, 10.0), self.payment('payment_02', customer, 10.0)]
+        with mock.patch.object(bulk, '_reject_duplicates', reject_duplicates_then_race):
+            response = self.client.post(self.bulk_url, data=items, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(list(Payment.objects.values_list('external_id', flat=True)), ['payment_02'])
+        self.assertFalse(PaymentDetail.objects.exists())
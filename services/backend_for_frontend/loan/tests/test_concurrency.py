@@ -0,0 +1,121 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from backend_for_frontend.models import UserAPIKey
+from loan.ledger import lock_balances
+from loan.models import Customer, CustomerBalance, Loan, PaymentDetail
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CustomerLockingTest(TransactionTestCase):
+    """Parallel clients against a real database; needs row-level locks (Postgres)."""
+
+    def setUp(self):
+        user = User.objects.create_superuser(username='admin', password='adminpassword')
+        _, self.api_key = UserAPIKey.objects.create_key(name=user.username, user=user)
+        self.loan_url = reverse('loan-list')
+        self.payment_url = reverse('payment-list')
+
+    def create_customer(self, external_id, score, debt=None):
+        customer = Customer.objects.create(
+            external_id=external_id, status=1, score=Decimal(score), preapproved_at=timezone.now()
+        )
+        if debt is not None:
+            Loan.objects.create(external_id=f'{external_id}-00', customer=customer, amount=Decimal(debt),
+                                outstanding=Decimal(debt), maximum_payment_date=timezone.now())
+        return customer
+
+    def post(self, url, payload, barrier=None):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.api_key)
+        try:
+            if barrier is not None:
+                barrier.wait()
+            return client.post(url, data=payload, format='json').status_code
+        finally:
+            connection.close()
+
+    def post_in_parallel(self, url, payloads):
+        barrier = threading.Barrier(len(payloads))
+        with ThreadPoolExecutor(len(payloads)) as pool:
+            return list(pool.map(lambda payload: self.post(url, payload, barrier), payloads))
+
+    def payment(self, external_id, customer, total_amount):
+        return {'external_id': external_id, 'customer': customer.id,
+                'total_amount': total_amount, 'paid_at': '2023-06-12T12:00:00Z'}
+
+    def test_parallel_payments_never_over_allocate(self):
+        customer = self.create_customer('external_01', 4000, debt=1000)
+        payloads = [self.payment(f'payment_{i:02}', customer, 200.0) for i in range(10)]
+
+        statuses = self.post_in_parallel(self.payment_url, payloads)
+
+        self.assertEqual(statuses.count(201), 5)
+        self.assertEqual(statuses.count(400), 5)
+        self.assertEqual(PaymentDetail.objects.aggregate(total=Sum('amount'))['total'], Decimal('1000'))
+        self.assertEqual(Loan.objects.get(customer=customer).outstanding, Decimal('0.00'))
+        self.assertEqual(CustomerBalance.objects.get(customer=customer).total_debt, Decimal('0.00'))
+
+    def test_parallel_loans_respect_credit_limit(self):
+        customer = self.create_customer('external_01', 1000)
+        payloads = [
+            {'external_id': f'external_01-{i:02}', 'customer': customer.id, 'amount': 300.0,
+             'contract_version': '1.0', 'maximum_payment_date': '2024-02-12T22:29:27Z'}
+            for i in range(10)
+        ]
+
+        statuses = self.post_in_parallel(self.loan_url, payloads)
+
+        self.assertEqual(statuses.count(201), 3)
+        self.assertEqual(Loan.objects.filter(customer=customer).count(), 3)
+        self.assertEqual(CustomerBalance.objects.get(customer=customer).total_debt, Decimal('900.00'))
+
+    def test_lock_only_serializes_the_same_customer(self):
+        busy = self.create_customer('external_01', 4000, debt=1000)
+        idle = self.create_customer('external_02', 4000, debt=1000)
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    lock_balances([busy.id])
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        locked.wait(5)
+        try:
+            with ThreadPoolExecutor(2) as pool:
+                same = pool.submit(self.post, self.payment_url, self.payment('payment_busy', busy, 100.0))
+                other = pool.submit(self.post, self.payment_url, self.payment('payment_idle', idle, 100.0))
+
+                self.assertEqual(other.result(timeout=5), 201)
+                self.assertFalse(same.done())
+
+                release.set()
+                self.assertEqual(same.result(timeout=10), 201)
+        finally:
+            release.set()
+            holder.join()
+
+    def test_parallel_customers_all_succeed(self):
+        customers = [self.create_customer(f'external_{i:02}', 4000, debt=1000) for i in range(8)]
+        payloads = [self.payment(f'payment_{i:02}', customer, 250.0) for i, customer in enumerate(customers)]
+
+        statuses = self.post_in_parallel(self.payment_url, payloads)
+
+        self.assertEqual(statuses, [201] * len(customers))
+        self.assertEqual(
+            set(CustomerBalance.objects.values_list('total_debt', flat=True)), {Decimal('750.00')}
+        )
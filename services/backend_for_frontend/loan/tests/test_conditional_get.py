@@ -0,0 +1,73 @@
+import json
+from decimal import Decimal
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, Loan
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        self.loan = Loan.objects.create(external_id='external_01-01', customer=customer, amount=Decimal('1000'),
+                                        outstanding=Decimal('1000'), maximum_payment_date=timezone.now())
+        self.loan_url = reverse('loan-detail', args=[self.loan.id])
+
+    def test_unchanged_loan_returns_304_without_reading_the_loan(self):
+        response = self.client.get(self.loan_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.loan_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        # Answered from the cached row.
+        self.assertEqual([query['sql'] for query in queries if 'loan_loan' in query['sql']], [])
+
+    def test_change_invalidates_etag(self):
+        etag = self.client.get(self.loan_url)['ETag']
+        self.loan.outstanding = Decimal('500')
+        self.loan.save()
+
+        response = self.client.get(self.loan_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['outstanding'], '500.00')
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.loan_url)['Last-Modified']
+        response = self.client.get(self.loan_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_requested_fields(self):
+        full = self.client.get(self.loan_url)['ETag']
+        response = self.client.get(self.loan_url, {'fields': 'status'}, HTTP_IF_NONE_MATCH=full)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'status': 1})
+
+    def test_missing_object_is_404(self):
+        response = self.client.get(reverse('loan-detail', args=[999999]), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('customer-detail', args=['abc']))
+        self.assertEqual(response.status_code, 404)
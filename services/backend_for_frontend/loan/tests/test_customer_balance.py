@@ -0,0 +1,97 @@
+import io
+import json
+from decimal import Decimal
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, CustomerBalance, Loan
+
+
+class CustomerBalanceLedgerTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.customer_url = reverse('customer-list')
+        self.loan_url = reverse('loan-list')
+        self.payment_url = reverse('payment-list')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        customer_payload = {
+            'external_id': 'external_01',
+            'score': 4000.0,
+            'preapproved_at': '2023-02-12T22:29:27.177914Z'
+        }
+        self.client.post(self.customer_url, data=customer_payload, format='json')
+        self.customer = Customer.objects.get(external_id='external_01')
+        self.balance_url = reverse('customer-balance', args=[self.customer.id])
+
+        for external_id, amount, due in [('external_01-01', 1000.0, '2024-02-12T22:29:27Z'),
+                                         ('external_01-02', 500.0, '2024-03-12T22:29:27Z')]:
+            loan_payload = {
+                'external_id': external_id,
+                'customer': self.customer.id,
+                'amount': amount,
+                'contract_version': '1.0',
+                'maximum_payment_date': due
+            }
+            self.client.post(self.loan_url, data=loan_payload, format='json')
+
+    def test_ledger_follows_loans_and_payments(self):
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        self.assertEqual(balance.total_debt, Decimal('1500.00'))
+        self.assertEqual(balance.available_amount, Decimal('2500.00'))
+        self.assertEqual(balance.open_loan_count, 2)
+
+        payment_payload = {
+            'external_id': 'payment_01',
+            'customer': self.customer.id,
+            'total_amount': 1200.0,
+            'paid_at': '2023-06-12T12:00:00Z'
+        }
+        self.client.post(self.payment_url, data=payment_payload, format='json')
+
+        balance.refresh_from_db()
+        self.assertEqual(balance.total_debt, Decimal('300.00'))
+        self.assertEqual(balance.available_amount, Decimal('3700.00'))
+        self.assertEqual(balance.open_loan_count, 1)
+
+    def test_balance_endpoint_reads_the_ledger(self):
+        self.client.get(self.balance_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.balance_url)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual((data['total_debt'], data['available_amount']), (1500.0, 2500.0))
+        self.assertEqual(data['score'], '4000.00')
+        self.assertFalse(any(Loan._meta.db_table in query['sql'] for query in queries))
+
+    def test_score_change_updates_available_amount(self):
+        customer_detail_url = reverse('customer-detail', args=[self.customer.id])
+        self.client.patch(customer_detail_url, data={'score': 5000.0}, format='json')
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        self.assertEqual(balance.available_amount, Decimal('3500.00'))
+
+    def test_reconcile_detects_and_fixes_drift(self):
+        CustomerBalance.objects.filter(customer=self.customer).update(total_debt=Decimal('1.00'))
+
+        out = io.StringIO()
+        call_command('reconcile_balances', stdout=out)
+        self.assertIn(f'customer {self.customer.id}', out.getvalue())
+
+        call_command('reconcile_balances', '--fix', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('reconcile_balances', stdout=out)
+        self.assertIn('Ledger matches the loans table.', out.getvalue())
+        self.assertEqual(CustomerBalance.objects.get(customer=self.customer).total_debt, Decimal('1500.00'))
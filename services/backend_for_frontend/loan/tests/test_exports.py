@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, Loan, Payment
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.loan_export_url = reverse('loan-export')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        for i in range(3):
+            Loan.objects.create(
+                external_id=f'external_01-{i:02}', customer=self.customer, amount=Decimal('100.00'),
+                outstanding=Decimal('100.00'), maximum_payment_date=timezone.now()
+            )
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_loans_as_ndjson(self):
+        body = self.read(self.client.get(self.loan_export_url))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['external_id'] for row in rows],
+                         ['external_01-00', 'external_01-01', 'external_01-02'])
+        self.assertEqual(rows[0]['customer'], self.customer.id)
+        self.assertEqual(Decimal(rows[0]['outstanding']), Decimal('100.00'))
+
+    def test_export_payments_as_csv(self):
+        Payment.objects.create(
+            external_id='payment_01', customer=self.customer, total_amount=Decimal('50'),
+            paid_at=timezone.now()
+        )
+        response = self.client.get(reverse('payment-export') + '?file_format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['external_id'], 'payment_01')
+
+    @override_settings(EXPORT_WATERMARK_LAG=0)
+    def test_incremental_export_uses_watermark(self):
+        first = self.client.get(self.loan_export_url)
+        self.read(first)
+        watermark = first['X-Export-Watermark']
+
+        loan = Loan.objects.get(external_id='external_01-01')
+        loan.contract_version = '2.0'
+        loan.save()
+
+        response = self.client.get(self.loan_export_url, {'updated_after': watermark})
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['external_id'] for row in rows], ['external_01-01'])
+
+    def test_incremental_exports_overlap_to_catch_late_commits(self):
+        first = self.client.get(self.loan_export_url)
+        exported = [json.loads(line)['external_id'] for line in self.read(first).splitlines()]
+        watermark = parse_datetime(first['X-Export-Watermark'])
+        self.assertLess(watermark, timezone.now() - timedelta(seconds=settings.EXPORT_WATERMARK_LAG - 5))
+
+        # Stamped before the first export started, committed after it.
+        late = Loan.objects.get(external_id='external_01-01')
+        late.pk = None
+        late.external_id = 'external_01-late'
+        late.save()
+        Loan.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.client.get(self.loan_export_url, {'updated_after': first['X-Export-Watermark']})
+        rows = [json.loads(line)['external_id'] for line in self.read(response).splitlines()]
+        self.assertIn('external_01-late', rows)
+        self.assertNotIn('external_01-late', exported)
+
+    def test_export_rejects_unknown_format(self):
+        response = self.client.get(self.loan_export_url + '?file_format=xml')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,78 @@
+import datetime
+import json
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, Loan, Payment, PaymentDetail
+from loan.readers import row_reader
+from loan.renderers import ORJSONRenderer
+from loan.serializers import CustomerSerializer, LoanSerializer, PaymentSerializer, PaymentDetailSerializer
+
+
+class FastReadTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        paid_at = datetime.datetime(2023, 6, 12, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        customer = Customer.objects.create(
+            external_id='cliente_ñandú\u2028', status=1, score=Decimal('4000.5'), preapproved_at=timezone.now()
+        )
+        loan = Loan.objects.create(external_id='external_01-01', customer=customer, amount=Decimal('1000'),
+                                   outstanding=Decimal('999.99'), maximum_payment_date=paid_at)
+        Loan.objects.create(external_id='external_01-02', customer=customer, amount=Decimal('5'),
+                            outstanding=Decimal('5'), contract_version='1.0', taken_at=paid_at,
+                            maximum_payment_date=paid_at.replace(microsecond=0))
+        payment = Payment.objects.create(external_id='payment_01', customer=customer,
+                                         total_amount=Decimal('0.0000000001'), paid_at=paid_at)
+        PaymentDetail.objects.create(amount=Decimal('12.3456789012'), loan=loan, payment=payment)
+
+    def expected(self, serializer_class):
+        model = serializer_class.Meta.model
+        data = serializer_class(model.objects.order_by('id'), many=True).data
+        return JSONRenderer().render({'next': None, 'previous': None, 'results': data})
+
+    def test_list_is_byte_identical_to_serializer_output(self):
+        cases = [
+            ('customer-list', CustomerSerializer),
+            ('loan-list', LoanSerializer),
+            ('payment-list', PaymentSerializer),
+            ('payment-detail-list', PaymentDetailSerializer),
+        ]
+        for url_name, serializer_class in cases:
+            with self.subTest(url_name):
+                response = self.client.get(reverse(url_name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, self.expected(serializer_class))
+
+    def test_retrieve_is_byte_identical_to_serializer_output(self):
+        loan = Loan.objects.get(external_id='external_01-02')
+        response = self.client.get(reverse('loan-detail', args=[loan.id]))
+        self.assertEqual(response.content, JSONRenderer().render(LoanSerializer(loan).data))
+
+        response = self.client.get(reverse('loan-detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_reader_matches_serializer_fields(self):
+        reader = row_reader(LoanSerializer)
+        self.assertEqual(reader.field_names, tuple(LoanSerializer().fields))
+
+    def test_renderer_falls_back_for_indented_output(self):
+        data = {'amount': Decimal('1.50'), 'when': timezone.now(), 1: 'one'}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        context = {'indent': 4}
+        self.assertEqual(ORJSONRenderer().render(data, renderer_context=context),
+                         JSONRenderer().render(data, renderer_context=context))
@@ -0,0 +1,136 @@
+import json
+import threading
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from django.contrib.auth.models import User
+from backend_for_frontend.models import UserAPIKey
+from loan.models import Customer, Loan, Payment
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        self.loan_payload = {'external_id': 'external_01-01', 'customer': self.customer.id, 'amount': 1000.0,
+                             'contract_version': '1.0', 'maximum_payment_date': '2024-02-12T22:29:27Z'}
+
+    def post(self, url, payload, key, client=None):
+        return (client or self.client).post(url, data=payload, format='json', headers={'Idempotency-Key': key})
+
+    def test_retry_replays_the_loan_without_creating_another(self):
+        first = self.post(reverse('loan-list'), self.loan_payload, 'loan-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post(reverse('loan-list'), self.loan_payload, 'loan-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(retry.content), json.loads(first.content))
+        self.assertFalse([query for query in queries if 'loan_loan' in query['sql']])
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_payment_and_customer_creation_are_idempotent(self):
+        Loan.objects.create(external_id='external_01-01', customer=self.customer, amount=Decimal('1000'),
+                            outstanding=Decimal('1000'), maximum_payment_date=timezone.now())
+        payment = {'external_id': 'payment_01', 'customer': self.customer.id,
+                   'total_amount': 400.0, 'paid_at': '2023-06-12T12:00:00Z'}
+        for _ in range(2):
+            self.assertEqual(self.post(reverse('payment-list'), payment, 'payment-1').status_code, 201)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(Loan.objects.get().outstanding, Decimal('600'))
+
+        customer = {'external_id': 'external_02', 'score': 1000.0, 'preapproved_at': '2023-02-12T22:29:27Z'}
+        for _ in range(2):
+            self.assertEqual(self.post(reverse('customer-list'), customer, 'customer-1').status_code, 201)
+        self.assertEqual(Customer.objects.filter(external_id='external_02').count(), 1)
+
+    def test_reusing_a_key_for_another_body_is_rejected(self):
+        self.post(reverse('loan-list'), self.loan_payload, 'loan-1')
+        other = {**self.loan_payload, 'external_id': 'external_01-02'}
+        self.assertEqual(self.post(reverse('loan-list'), other, 'loan-1').status_code, 422)
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_rejected_requests_are_not_remembered(self):
+        payload = {**self.loan_payload, 'amount': 5000.0}
+        self.assertEqual(self.post(reverse('loan-list'), payload, 'loan-1').status_code, 400)
+        self.customer.score = Decimal('6000')
+        self.customer.save()
+        self.assertEqual(self.post(reverse('loan-list'), payload, 'loan-1').status_code, 201)
+
+    def test_keys_are_scoped_to_the_api_key(self):
+        self.post(reverse('loan-list'), self.loan_payload, 'loan-1')
+        user = User.objects.create_superuser(username='other', password='otherpassword')
+        _, api_key = UserAPIKey.objects.create_key(name=user.username, user=user)
+        other_client = APIClient()
+        other_client.credentials(HTTP_AUTHORIZATION='Api-Key ' + api_key)
+        # Not a replay: the loan is created again and hits the unique external id.
+        response = self.post(reverse('loan-list'), self.loan_payload, 'loan-1', client=other_client)
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_key_length_is_limited(self):
+        self.assertEqual(self.post(reverse('loan-list'), self.loan_payload, 'k' * 256).status_code, 400)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class IdempotencyConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_superuser(username='admin', password='adminpassword')
+        _, self.api_key = UserAPIKey.objects.create_key(name=user.username, user=user)
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        Loan.objects.create(external_id='external_01-01', customer=self.customer, amount=Decimal('1000'),
+                            outstanding=Decimal('1000'), maximum_payment_date=timezone.now())
+
+    def test_concurrent_duplicates_wait_for_the_first_result(self):
+        payload = {'external_id': 'payment_01', 'customer': self.customer.id,
+                   'total_amount': 100.0, 'paid_at': '2023-06-12T12:00:00Z'}
+        responses = []
+        barrier = threading.Barrier(4)
+
+        def pay():
+            try:
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.api_key)
+                barrier.wait()
+                response = client.post(reverse('payment-list'), data=payload, format='json',
+                                       headers={'Idempotency-Key': 'payment-1'})
+                responses.append((response.status_code, json.loads(response.content)['id']))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=pay) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+
+        self.assertEqual(len(responses), 4)
+        self.assertEqual({status for status, _ in responses}, {201})
+        self.assertEqual(len({payment_id for _, payment_id in responses}), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(Loan.objects.get().outstanding, Decimal('900'))
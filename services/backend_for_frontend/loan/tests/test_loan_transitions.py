@@ -0,0 +1,84 @@
+import json
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.ledger import find_drift
+from loan.models import Customer, CustomerBalance, Loan, OutboxEvent
+
+
+class LoanTransitionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('10000'), preapproved_at=timezone.now()
+        )
+        for i in range(4):
+            payload = {'external_id': f'external_01-{i:02}', 'customer': self.customer.id, 'amount': 1000.0,
+                       'contract_version': '1.0', 'maximum_payment_date': '2024-02-12T22:29:27Z'}
+            self.client.post(reverse('loan-list'), data=payload, format='json')
+        self.loans = list(Loan.objects.order_by('id'))
+        Loan.objects.filter(pk=self.loans[3].pk).update(status=2)
+
+    def test_activate_by_id_and_external_id(self):
+        body = {'ids': [self.loans[0].id, self.loans[3].id, 999999],
+                'external_ids': ['external_01-01', 'missing']}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('loan-activate'), data=body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {
+            'transitioned': [{'id': self.loans[0].id, 'external_id': 'external_01-00'},
+                             {'id': self.loans[1].id, 'external_id': 'external_01-01'}],
+            'ineligible': [{'id': self.loans[3].id, 'external_id': 'external_01-03', 'status': 2}],
+            'not_found': [999999, 'missing'],
+        })
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "loan_loan"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(list(Loan.objects.order_by('id').values_list('status', flat=True)), [2, 2, 1, 2])
+        self.assertEqual(sorted(OutboxEvent.objects.filter(kind='loan.activated').values_list('entity_id', flat=True)),
+                         [self.loans[0].id, self.loans[1].id])
+
+    def test_reject_releases_the_debt(self):
+        response = self.client.post(reverse('loan-reject'), data={'ids': [self.loans[0].id, self.loans[3].id]},
+                                    format='json')
+        result = json.loads(response.content)
+        self.assertEqual([loan['id'] for loan in result['transitioned']], [self.loans[0].id])
+        self.assertEqual(result['ineligible'][0]['id'], self.loans[3].id)
+
+        balance = CustomerBalance.objects.get(customer=self.customer)
+        self.assertEqual((balance.total_debt, balance.open_loan_count), (Decimal('3000'), 3))
+        self.assertEqual(list(find_drift()), [])
+
+        # Already rejected: nothing changes the second time.
+        again = json.loads(self.client.post(reverse('loan-reject'), data={'ids': [self.loans[0].id]},
+                                             format='json').content)
+        self.assertEqual((again['transitioned'], again['ineligible'][0]['status']), ([], 3))
+        self.assertEqual(CustomerBalance.objects.get(customer=self.customer).total_debt, Decimal('3000'))
+
+    def test_rejection_invalidates_the_cached_loan(self):
+        url = reverse('loan-detail', args=[self.loans[0].id])
+        self.assertEqual(json.loads(self.client.get(url).content)['status'], 1)
+        self.client.post(reverse('loan-reject'), data={'ids': [self.loans[0].id]}, format='json')
+        self.assertEqual(json.loads(self.client.get(url).content)['status'], 3)
+
+    def test_body_is_validated(self):
+        self.assertEqual(self.client.post(reverse('loan-activate'), data={}, format='json').status_code, 400)
+        response = self.client.post(reverse('loan-activate'), data={'ids': ['abc']}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -119,7 +119,7 @@ class LoanViewSetTest(TestCase):
         response = self.client.get(self.loan_url)
         self.assertEqual(response.status_code, 200)
         loans_data = json.loads(response.content)
-        self.assertEqual(len(loans_data), 2)  
+        self.assertEqual(len(loans_data['results']), 2)  
 
     def test_update_loan(self):
         """
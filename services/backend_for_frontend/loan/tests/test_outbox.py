@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from django.contrib.auth.models import User
+from backend_for_frontend.models import UserAPIKey
+from loan.models import Customer, OutboxEvent
+from loan.outbox import SEQUENCER_LOCK_ID, record_events, sequence_events
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        self.events_url = reverse('event-list')
+
+    def create_loan(self, external_id, amount):
+        payload = {'external_id': external_id, 'customer': self.customer.id, 'amount': amount,
+                   'contract_version': '1.0', 'maximum_payment_date': '2024-02-12T22:29:27Z'}
+        response = self.client.post(reverse('loan-list'), data=payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        return json.loads(response.content)['id']
+
+    def read(self, after=0, **params):
+        sequence_events()
+        response = self.client.get(self.events_url, {'after': after, **params})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_feed_follows_the_loan_and_payment_lifecycle(self):
+        loan_id = self.create_loan('external_01-01', 1000.0)
+        payment = {'external_id': 'payment_01', 'customer': self.customer.id,
+                   'total_amount': 1000.0, 'paid_at': '2023-06-12T12:00:00Z'}
+        payment_id = json.loads(self.client.post(reverse('payment-list'), data=payment, format='json').content)['id']
+        self.client.patch(reverse('payment-confirm', args=[payment_id]))
+
+        feed = self.read()
+        self.assertEqual(
+            [(event['seq'], event['kind'], event['entity_id']) for event in feed['events']],
+            [(1, 'loan.created', loan_id), (2, 'payment.allocated', payment_id),
+             (3, 'loan.paid', loan_id), (4, 'payment.confirmed', payment_id)],
+        )
+        self.assertEqual(feed['events'][0]['payload']['amount'], '1000.00')
+        self.assertEqual(feed['events'][1]['payload']['details'], [{'loan': loan_id, 'amount': '1000.0000000000'}])
+        self.assertEqual(feed['last_seq'], 4)
+
+        self.assertEqual(self.read(after=2, limit=1)['events'][0]['kind'], 'loan.paid')
+        self.assertEqual(self.read(after=4), {'events': [], 'last_seq': 4})
+
+    def test_rejected_writes_leave_no_events(self):
+        payload = {'external_id': 'external_01-01', 'customer': self.customer.id, 'amount': 5000.0,
+                   'contract_version': '1.0', 'maximum_payment_date': '2024-02-12T22:29:27Z'}
+        self.assertEqual(self.client.post(reverse('loan-list'), data=payload, format='json').status_code, 400)
+        self.assertEqual(self.read()['events'], [])
+
+    def test_bulk_origination_emits_one_event_per_accepted_loan(self):
+        items = [{'external_id': f'external_01-{i:02}', 'customer': self.customer.id, 'amount': 1500.0,
+                  'maximum_payment_date': '2024-02-12T22:29:27Z'} for i in range(3)]
+        self.client.post(reverse('loan-bulk'), data=items, format='json')
+        self.assertEqual([event['kind'] for event in self.read()['events']], ['loan.created'] * 2)
+
+    def test_compaction_keeps_recent_events_and_the_sequence(self):
+        for i in range(3):
+            self.create_loan(f'external_01-{i:02}', 100.0)
+        self.read()
+        OutboxEvent.objects.update(created_at=timezone.now() - timedelta(days=30))
+
+        out = StringIO()
+        call_command('compact_outbox', retention_days=7, stdout=out)
+        self.assertIn('Deleted 2 event(s).', out.getvalue())
+
+        response = self.client.get(self.events_url, {'after': 0})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(json.loads(response.content)['oldest_seq'], 3)
+
+        self.create_loan('external_01-03', 100.0)
+        self.assertEqual([event['seq'] for event in self.read(after=3)['events']], [4])
+
+    def test_reads_leave_sequencing_to_the_sequencer(self):
+        self.create_loan('external_01-01', 100.0)
+        response = self.client.get(self.events_url)
+        self.assertEqual(json.loads(response.content), {'events': [], 'last_seq': 0})
+        self.assertFalse(OutboxEvent.objects.filter(seq__isnull=False).exists())
+
+        out = StringIO()
+        call_command('sequence_outbox', once=True, stdout=out)
+        self.assertIn('Sequenced 1 event(s).', out.getvalue())
+        self.assertEqual([event['seq'] for event in json.loads(self.client.get(self.events_url).content)['events']],
+                         [1])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.events_url, {'after': 'abc'}).status_code, 400)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class OutboxOrderingTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_superuser(username='admin', password='adminpassword')
+        _, api_key = UserAPIKey.objects.create_key(name=user.username, user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + api_key)
+
+    def read(self, after=0, **params):
+        sequence_events()
+        return json.loads(self.client.get(reverse('event-list'), {'after': after, **params}).content)
+
+    def in_other_transaction(self, started, release):
+        def write():
+            try:
+                with transaction.atomic():
+                    record_events([('loan.created', 1, {})])
+                    started.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        return thread
+
+    def test_events_are_not_sequenced_past_an_open_transaction(self):
+        started, release = threading.Event(), threading.Event()
+        thread = self.in_other_transaction(started, release)
+        started.wait(10)
+
+        # Inserted later but committed first: it must not be read before the open one.
+        record_events([('loan.created', 2, {})])
+        self.assertEqual(self.read(), {'events': [], 'last_seq': 0})
+
+        release.set()
+        thread.join(10)
+        self.assertEqual([(event['seq'], event['entity_id']) for event in self.read()['events']], [(1, 1), (2, 2)])
+
+    def test_long_poll_returns_when_an_event_arrives(self):
+        def write_later():
+            try:
+                time.sleep(0.5)
+                record_events([('loan.created', 1, {})])
+                sequence_events()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=write_later)
+        thread.start()
+        started = time.monotonic()
+        feed = self.read(wait=10)
+        thread.join(10)
+        self.assertEqual([event['entity_id'] for event in feed['events']], [1])
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_a_busy_sequencer_is_skipped_not_waited_for(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('The sequencer lock is a Postgres advisory lock.')
+        record_events([('loan.created', 1, {})])
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_sequencer_lock():
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCER_LOCK_ID])
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_sequencer_lock)
+        thread.start()
+        locked.wait(10)
+        try:
+            started = time.monotonic()
+            self.assertEqual(sequence_events(), 0)
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            release.set()
+            thread.join(10)
+        self.assertEqual(sequence_events(), 1)
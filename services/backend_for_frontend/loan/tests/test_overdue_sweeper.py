@@ -0,0 +1,160 @@
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.ledger import claim_balances, ensure_balances, find_drift, lock_balances
+from loan.models import Customer, Loan, OutboxEvent
+from loan.sweeper import sweep_overdue_loans
+
+
+class OverdueSweeperTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('100000'), preapproved_at=timezone.now()
+        )
+        now = timezone.now()
+        self.loans = {}
+        for name, days_past_due, status in [('future', -10, 2), ('late', 10, 2), ('pending_late', 10, 1),
+                                            ('very_late', 100, 2), ('overdue_now_default', 100, 5),
+                                            ('overdue', 20, 5), ('paid', 100, 4), ('rejected', 100, 3)]:
+            self.loans[name] = Loan.objects.create(
+                external_id=name, customer=self.customer, amount=Decimal('1000'), status=status,
+                outstanding=Decimal('0') if status in (3, 4) else Decimal('1000'),
+                maximum_payment_date=now - timedelta(days=days_past_due),
+            )
+
+    def statuses(self):
+        return {loan.external_id: loan.status for loan in Loan.objects.all()}
+
+    def test_sweep_in_resumable_chunks(self):
+        checkpoint = sweep_overdue_loans(chunk_size=3, pause=0, max_chunks=1)
+        self.assertIsNone(checkpoint.finished_at)
+        self.assertEqual(checkpoint.last_id, self.loans['future'].id + 2)
+        self.assertEqual(self.statuses()['very_late'], 2)
+
+        checkpoint = sweep_overdue_loans(chunk_size=3, pause=0)
+        self.assertIsNotNone(checkpoint.finished_at)
+        self.assertEqual((checkpoint.overdue, checkpoint.defaulted, checkpoint.skipped, checkpoint.chunks),
+                         (1, 2, 0, 3))
+        self.assertEqual(self.statuses(), {
+            'future': 2, 'late': 5, 'pending_late': 1, 'very_late': 6, 'overdue_now_default': 6,
+            'overdue': 5, 'paid': 4, 'rejected': 3,
+        })
+        self.assertEqual(
+            sorted(OutboxEvent.objects.values_list('kind', 'entity_id')),
+            sorted([('loan.overdue', self.loans['late'].id),
+                    ('loan.defaulted', self.loans['very_late'].id),
+                    ('loan.defaulted', self.loans['overdue_now_default'].id)]),
+        )
+
+        # A finished pass is followed by a new one, which finds nothing left to do.
+        checkpoint = sweep_overdue_loans(chunk_size=3, pause=0)
+        self.assertEqual((checkpoint.overdue, checkpoint.defaulted), (0, 0))
+
+    def test_pending_loans_past_due_are_left_alone(self):
+        pending = Loan.objects.create(external_id='pending_very_late', customer=self.customer,
+                                      amount=Decimal('1000'), outstanding=Decimal('1000'), status=1,
+                                      maximum_payment_date=timezone.now() - timedelta(days=200))
+        sweep_overdue_loans(pause=0)
+        self.assertEqual(Loan.objects.get(pk=pending.pk).status, 1)
+        self.assertFalse(OutboxEvent.objects.filter(entity_id=pending.pk).exists())
+
+        response = self.client.post(reverse('loan-reject'), data={'ids': [pending.pk]}, format='json')
+        self.assertEqual([loan['id'] for loan in json.loads(response.content)['transitioned']], [pending.pk])
+
+    def test_loans_paid_before_the_claim_are_not_reported(self):
+        def pay_off_then_claim(customer_ids):
+            # A payment committed between the chunk's first read and its ledger locks.
+            Loan.objects.filter(pk=self.loans['late'].pk).update(status=4, outstanding=Decimal('0'))
+            return claim_balances(customer_ids)
+
+        with mock.patch('loan.sweeper.claim_balances', side_effect=pay_off_then_claim):
+            checkpoint = sweep_overdue_loans(pause=0)
+        self.assertEqual(Loan.objects.get(pk=self.loans['late'].pk).status, 4)
+        self.assertFalse(OutboxEvent.objects.filter(entity_id=self.loans['late'].pk).exists())
+        self.assertEqual((checkpoint.overdue, checkpoint.defaulted), (0, 2))
+
+    def test_overdue_loans_still_count_as_debt_and_take_payments(self):
+        balance_url = reverse('customer-balance', args=[self.customer.id])
+        before = json.loads(self.client.get(balance_url).content)
+        sweep_overdue_loans(pause=0)
+        self.assertEqual(json.loads(self.client.get(balance_url).content), before)
+        self.assertEqual(list(find_drift()), [])
+
+        loan_url = reverse('loan-detail', args=[self.loans['very_late'].id])
+        self.assertEqual(json.loads(self.client.get(loan_url).content)['status'], 6)
+
+        payload = {'external_id': 'payment_01', 'customer': self.customer.id,
+                   'total_amount': 1000.0, 'paid_at': '2023-06-12T12:00:00Z'}
+        self.assertEqual(self.client.post(reverse('payment-list'), data=payload, format='json').status_code, 201)
+        self.assertEqual(Loan.objects.get(external_id='very_late').status, 4)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('sweep_overdue_loans', pause=0, stdout=out)
+        self.assertIn('finished: 1 overdue, 2 defaulted, 0 skipped in 1 chunk(s).', out.getvalue())
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class OverdueSweeperLockTest(TransactionTestCase):
+    def test_busy_customers_are_skipped_not_waited_for(self):
+        past_due = timezone.now() - timedelta(days=10)
+        customers = []
+        for i in range(2):
+            customer = Customer.objects.create(
+                external_id=f'external_{i:02}', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+            )
+            Loan.objects.create(external_id=f'external_{i:02}-01', customer=customer, amount=Decimal('1000'),
+                                outstanding=Decimal('1000'), status=2, maximum_payment_date=past_due)
+            customers.append(customer)
+
+        ensure_balances([customer.id for customer in customers])
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_ledger():
+            try:
+                with transaction.atomic():
+                    lock_balances([customers[0].id])
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_ledger)
+        thread.start()
+        locked.wait(10)
+        try:
+            checkpoint = sweep_overdue_loans(pause=0)
+        finally:
+            release.set()
+            thread.join(10)
+
+        self.assertEqual((checkpoint.overdue, checkpoint.skipped), (1, 1))
+        self.assertEqual(Loan.objects.get(customer=customers[0]).status, 2)
+        self.assertEqual(Loan.objects.get(customer=customers[1]).status, 5)
+
+        sweep_overdue_loans(pause=0)
+        self.assertEqual(Loan.objects.get(customer=customers[0]).status, 5)
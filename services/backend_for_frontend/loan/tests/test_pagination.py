@@ -0,0 +1,64 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, Loan
+from loan.pagination import KeysetPagination
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.loan_url = reverse('loan-list')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        Loan.objects.bulk_create([
+            Loan(
+                external_id=f'external_01-{i:02}', customer=customer, amount=Decimal('100.00'),
+                outstanding=Decimal('100.00'), maximum_payment_date=timezone.now() + timedelta(days=i)
+            )
+            for i in range(5)
+        ])
+
+    def test_walks_every_page_in_id_order(self):
+        ids = []
+        url = self.loan_url + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content)
+            self.assertLessEqual(len(data['results']), 2)
+            ids.extend(loan['id'] for loan in data['results'])
+            url = data['next']
+
+        self.assertEqual(ids, list(Loan.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_cursor_is_stable_when_rows_are_removed(self):
+        data = json.loads(self.client.get(self.loan_url + '?page_size=2').content)
+        Loan.objects.filter(external_id='external_01-00').delete()
+
+        second_page = json.loads(self.client.get(data['next']).content)
+        self.assertEqual([loan['external_id'] for loan in second_page['results']],
+                         ['external_01-02', 'external_01-03'])
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(KeysetPagination, 'max_page_size', 3):
+            data = json.loads(self.client.get(self.loan_url + '?page_size=50').content)
+        self.assertEqual(len(data['results']), 3)
@@ -0,0 +1,89 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.allocation import plan_allocation
+from loan.models import Customer, Loan, PaymentDetail
+
+
+class PaymentAllocationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.payment_url = reverse('payment-list')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+        # Warm the API key cache so every measured request pays the same auth cost.
+        self.client.get(self.payment_url)
+
+    def create_customer_with_loans(self, external_id, loan_count):
+        customer = Customer.objects.create(
+            external_id=external_id, status=1, score=Decimal('1000000'),
+            preapproved_at=timezone.now()
+        )
+        due = timezone.now()
+        Loan.objects.bulk_create([
+            Loan(
+                external_id=f'{external_id}-{i:03}', customer=customer, amount=Decimal('100.00'),
+                outstanding=Decimal('100.00'), maximum_payment_date=due + timedelta(days=i)
+            )
+            for i in range(loan_count)
+        ])
+        return customer
+
+    def post_payment(self, external_id, customer, total_amount):
+        payload = {
+            'external_id': external_id,
+            'customer': customer.id,
+            'total_amount': total_amount,
+            'paid_at': '2023-06-12T12:00:00Z'
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.payment_url, data=payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_loan_count(self):
+        few = self.create_customer_with_loans('few', 2)
+        many = self.create_customer_with_loans('many', 40)
+
+        few_queries = self.post_payment('payment_few', few, 150.0)
+        many_queries = self.post_payment('payment_many', many, 3950.0)
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(PaymentDetail.objects.filter(payment__external_id='payment_many').count(), 40)
+
+    def test_allocates_oldest_due_first(self):
+        customer = self.create_customer_with_loans('external_01', 3)
+        self.post_payment('payment_01', customer, 150.0)
+
+        loans = list(Loan.objects.filter(customer=customer).order_by('maximum_payment_date'))
+        self.assertEqual([loan.outstanding for loan in loans],
+                         [Decimal('0.00'), Decimal('50.00'), Decimal('100.00')])
+        self.assertEqual([loan.status for loan in loans], [4, 1, 1])
+
+    def test_plan_allocation_skips_loans_paid_earlier_in_the_batch(self):
+        loans = [
+            Loan(id=1, status=1, outstanding=Decimal('100.00')),
+            Loan(id=2, status=2, outstanding=Decimal('50.00')),
+        ]
+        first = plan_allocation(Decimal('100.00'), loans)
+        second = plan_allocation(Decimal('20.00'), loans)
+
+        self.assertEqual([(loan.id, amount) for loan, amount in first], [(1, Decimal('100.00'))])
+        self.assertEqual([(loan.id, amount) for loan, amount in second], [(2, Decimal('20.00'))])
+        self.assertEqual(loans[0].status, 4)
+        self.assertEqual(loans[1].outstanding, Decimal('30.00'))
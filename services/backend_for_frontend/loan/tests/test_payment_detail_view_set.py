@@ -86,7 +86,7 @@ class PaymentDetailViewSetTest(TestCase):
         response = self.client.get(self.payment_detail_url)
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.content)
-        self.assertEqual(len(data), 2)
+        self.assertEqual(len(data['results']), 2)
     
     def test_create_payment_detail(self):
         payload = {
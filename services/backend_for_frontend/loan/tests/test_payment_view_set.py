@@ -142,7 +142,7 @@ class PaymentViewSetTest(TestCase):
 
         response = self.client.get(self.payment_url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(json.loads(response.content)), 2)
+        self.assertEqual(len(json.loads(response.content)['results']), 2)
 
     def test_update_payment(self):
         payment_payload = {
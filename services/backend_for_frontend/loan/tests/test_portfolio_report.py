@@ -0,0 +1,109 @@
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, Loan, Payment, PaymentDetail
+
+
+class PortfolioReportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.as_of = date(2024, 6, 30)
+        self.end_of_day = timezone.make_aware(datetime(2024, 7, 1))
+        customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('100000'), preapproved_at=timezone.now()
+        )
+        # Days past due as of 2024-06-30 -> expected bucket.
+        for days, outstanding in [(-5, '100'), (0, '200'), (30, '300'), (31, '400'), (75, '500'), (120, '600')]:
+            Loan.objects.create(external_id=f'loan_{days}', customer=customer, amount=Decimal('1000'),
+                                outstanding=Decimal(outstanding), status=2,
+                                maximum_payment_date=self.end_of_day - timedelta(days=days, hours=12))
+        paid = Loan.objects.create(external_id='loan_paid', customer=customer, amount=Decimal('1000'),
+                                   outstanding=Decimal('0'), status=4,
+                                   maximum_payment_date=self.end_of_day)
+        Loan.objects.filter(pk=paid.pk).update(created_at=self.end_of_day - timedelta(days=90))
+        Loan.objects.exclude(pk=paid.pk).update(created_at=self.end_of_day - timedelta(days=200))
+
+        for external_id, paid_at, amount in [('payment_01', self.end_of_day - timedelta(days=60), '600'),
+                                             ('payment_02', self.end_of_day - timedelta(days=10), '400'),
+                                             ('payment_03', self.end_of_day + timedelta(days=1), '250')]:
+            payment = Payment.objects.create(external_id=external_id, customer=customer,
+                                             total_amount=Decimal(amount), paid_at=paid_at)
+            PaymentDetail.objects.create(payment=payment, loan=paid, amount=Decimal(amount))
+
+    def test_report(self):
+        response = self.client.get(reverse('report-portfolio'), {'as_of': '2024-06-30'})
+        self.assertEqual(response.status_code, 200)
+        report = json.loads(response.content)
+
+        self.assertEqual(report['by_status'], {
+            'Active': {'count': 6, 'amount': '6000.00', 'outstanding': '2100.00'},
+            'Paid': {'count': 1, 'amount': '1000.00', 'outstanding': '0.00'},
+        })
+        self.assertEqual(
+            {label: (bucket['count'], bucket['outstanding']) for label, bucket in report['aging'].items()},
+            {'current': (1, '100.00'), '0-30': (2, '500.00'), '31-60': (1, '400.00'),
+             '61-90': (1, '500.00'), '90+': (1, '600.00')},
+        )
+        self.assertEqual(report['delinquency'], {'open_outstanding': '2100.00', 'past_due_outstanding': '2000.00',
+                                                 'past_due_rate': 0.9524})
+        self.assertEqual(report['collections'], {'originated': '7000.00', 'collected': '1000.00',
+                                                 'collected_last_30_days': '400.00', 'collection_rate': 0.1429})
+
+    def test_pending_and_rejected_loans_are_not_originated(self):
+        customer = Customer.objects.get(external_id='external_01')
+        for external_id, status in [('loan_pending', 1), ('loan_rejected', 3)]:
+            Loan.objects.create(external_id=external_id, customer=customer, amount=Decimal('5000'),
+                                outstanding=Decimal('5000'), status=status, maximum_payment_date=self.end_of_day)
+        Loan.objects.filter(status__in=[1, 3]).update(created_at=self.end_of_day - timedelta(days=10))
+
+        report = json.loads(self.client.get(reverse('report-portfolio'), {'as_of': '2024-06-30'}).content)
+        self.assertEqual((report['by_status']['Pending']['count'], report['by_status']['Rejected']['count']), (1, 1))
+        self.assertEqual((report['collections']['originated'], report['collections']['collection_rate']),
+                         ('7000.00', 0.1429))
+
+    def test_loans_created_after_the_as_of_date_are_left_out(self):
+        report = json.loads(self.client.get(reverse('report-portfolio'), {'as_of': '2024-03-31'}).content)
+        self.assertNotIn('Paid', report['by_status'])
+        self.assertEqual(report['collections']['collected'], '0.00')
+
+    def test_report_is_cached_per_as_of_date(self):
+        url = reverse('report-portfolio')
+        self.client.get(url, {'as_of': '2024-06-30'})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'as_of': '2024-06-30'})
+        self.assertFalse([query for query in queries if 'loan_loan' in query['sql']])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'as_of': '2024-06-29'})
+        self.assertEqual(len([query for query in queries if 'loan_loan' in query['sql']]), 3)
+
+    def test_invalid_date(self):
+        self.assertEqual(self.client.get(reverse('report-portfolio'), {'as_of': '30/06/2024'}).status_code, 400)
+
+    def test_command_prints_the_same_report(self):
+        out = StringIO()
+        call_command('portfolio_report', as_of=self.as_of, stdout=out)
+        expected = json.loads(self.client.get(reverse('report-portfolio'), {'as_of': '2024-06-30'}).content)
+        self.assertEqual(json.loads(out.getvalue()), expected)
@@ -0,0 +1,87 @@
+import hashlib
+import json
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from backend_for_frontend.routers import replica_reads
+from loan.ledger import lock_balances
+from loan.models import Customer
+
+
+# 'replica' is the local mirror of default that settings define when no replica hosts are configured.
+LOCAL_REPLICAS = settings.REPLICA_DATABASES or ['replica']
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTest(TestCase):
+    def test_reads_use_primary_outside_replica_scope(self):
+        self.assertEqual(Customer.objects.all().db, 'default')
+        with replica_reads():
+            self.assertEqual(Customer.objects.all().db, 'replica')
+            with replica_reads(False):
+                self.assertEqual(Customer.objects.all().db, 'default')
+
+    def test_writes_and_locks_use_primary(self):
+        with replica_reads():
+            self.assertEqual(Customer.objects.all().select_for_update().db, 'default')
+            customer = Customer.objects.create(external_id='external_01', status=1, score=Decimal('1000'),
+                                               preapproved_at=timezone.now())
+            self.assertEqual(customer._state.db, 'default')
+            balance = lock_balances([customer.id])[customer.id]
+            self.assertEqual(balance._state.db, 'default')
+
+
+@override_settings(REPLICA_DATABASES=LOCAL_REPLICAS)
+class ReplicaRoutingMiddlewareTest(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.customer_url = reverse('customer-list')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+    def queries_per_alias(self, method, *args, **kwargs):
+        replica = connections[settings.REPLICA_DATABASES[0]]
+        with CaptureQueriesContext(connections['default']) as primary_queries, \
+                CaptureQueriesContext(replica) as replica_queries:
+            response = method(*args, **kwargs)
+        return response, len(primary_queries), len(replica_queries)
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=0)
+    def test_safe_requests_read_from_replica(self):
+        _, primary, replica = self.queries_per_alias(self.client.get, self.customer_url)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        payload = {'external_id': 'external_01', 'score': 4000.0, 'preapproved_at': '2023-02-12T22:29:27Z'}
+        response, _, replica = self.queries_per_alias(self.client.post, self.customer_url, data=payload,
+                                                      format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(replica, 0)
+
+        response, _, replica = self.queries_per_alias(self.client.get, self.customer_url)
+        self.assertEqual(replica, 0)
+        self.assertEqual(len(json.loads(response.content)['results']), 1)
+
+        # Once the pin expires, safe reads go back to the replica.
+        cache.delete('replica-pin:' + hashlib.sha256(self.admin_api_key.encode()).hexdigest())
+        _, primary, replica = self.queries_per_alias(self.client.get, self.customer_url)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
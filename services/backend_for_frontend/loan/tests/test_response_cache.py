@@ -0,0 +1,151 @@
+import json
+import threading
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from django.contrib.auth.models import User
+from backend_for_frontend.models import UserAPIKey
+from loan.allocation import allocate_payments, load_open_loans
+from loan.cache import response_cache
+from loan.ledger import lock_balances
+from loan.models import Customer, Loan, Payment
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        response_cache.reset_stats()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        Loan.objects.create(external_id='external_01-01', customer=self.customer, amount=Decimal('1000'),
+                            outstanding=Decimal('1000'), maximum_payment_date=timezone.now())
+        self.balance_url = reverse('customer-balance', args=[self.customer.id])
+
+    def pay(self, external_id, amount):
+        payload = {'external_id': external_id, 'customer': self.customer.id,
+                   'total_amount': amount, 'paid_at': '2023-06-12T12:00:00Z'}
+        response = self.client.post(reverse('payment-list'), data=payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        return json.loads(response.content)['id']
+
+    def test_balance_is_served_from_cache_until_a_payment(self):
+        self.assertEqual(json.loads(self.client.get(self.balance_url).content)['total_debt'], 1000.0)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.balance_url)
+        self.assertEqual(len(queries), 0)
+
+        self.pay('payment_01', 400.0)
+        data = json.loads(self.client.get(self.balance_url).content)
+        self.assertEqual((data['total_debt'], data['available_amount']), (600.0, 3400.0))
+        self.assertEqual(response_cache.stats()['balance'], {'hits': 1, 'misses': 2, 'hit_rate': 0.3333})
+
+    def test_loan_creation_invalidates_balance(self):
+        self.client.get(self.balance_url)
+        payload = {'external_id': 'external_01-02', 'customer': self.customer.id, 'amount': 500.0,
+                   'contract_version': '1.0', 'maximum_payment_date': '2024-02-12T22:29:27Z'}
+        self.assertEqual(self.client.post(reverse('loan-list'), data=payload, format='json').status_code, 201)
+        self.assertEqual(json.loads(self.client.get(self.balance_url).content)['open_loan_count'], 2)
+
+    def test_allocation_invalidates_loan_detail(self):
+        loan = Loan.objects.get()
+        loan_url = reverse('loan-detail', args=[loan.id])
+        self.assertEqual(json.loads(self.client.get(loan_url).content)['outstanding'], '1000.00')
+        self.pay('payment_01', 1000.0)
+        data = json.loads(self.client.get(loan_url).content)
+        self.assertEqual((data['outstanding'], data['status']), ('0.00', 4))
+
+    def test_confirm_invalidates_payment_detail(self):
+        payment_id = self.pay('payment_01', 100.0)
+        payment_url = reverse('payment-detail', args=[payment_id])
+        self.assertEqual(json.loads(self.client.get(payment_url).content)['status'], 1)
+        self.client.patch(reverse('payment-confirm', args=[payment_id]))
+        self.assertEqual(json.loads(self.client.get(payment_url).content)['status'], 2)
+
+    def test_payment_details_are_listed_and_cached_per_payment(self):
+        first = self.pay('payment_01', 100.0)
+        second = self.pay('payment_02', 200.0)
+        url = reverse('payment-detail-list')
+
+        results = json.loads(self.client.get(url, {'payment': second}).content)['results']
+        self.assertEqual([(row['payment'], row['amount']) for row in results], [(second, '200.0000000000')])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'payment': second})
+        self.assertEqual(len(queries), 0)
+
+        self.assertEqual(len(json.loads(self.client.get(url, {'payment': first}).content)['results']), 1)
+        self.assertEqual(self.client.get(url, {'payment': 'abc'}).status_code, 400)
+
+    def test_stats_endpoint(self):
+        self.client.get(self.balance_url)
+        self.client.get(self.balance_url)
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['responses']['balance']['hits'], 1)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ResponseCacheCommitTest(TransactionTestCase):
+    """A reader racing the payment transaction must not leave a stale balance behind."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_superuser(username='admin', password='adminpassword')
+        _, api_key = UserAPIKey.objects.create_key(name=user.username, user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + api_key)
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        Loan.objects.create(external_id='external_01-01', customer=self.customer, amount=Decimal('1000'),
+                            outstanding=Decimal('1000'), maximum_payment_date=timezone.now())
+        self.balance_url = reverse('customer-balance', args=[self.customer.id])
+
+    def read_balance_in_other_connection(self):
+        result = {}
+
+        def read():
+            try:
+                client = APIClient()
+                client.credentials(**self.client._credentials)
+                result['total_debt'] = json.loads(client.get(self.balance_url).content)['total_debt']
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join(10)
+        return result['total_debt']
+
+    def test_no_stale_balance_after_payment_commits(self):
+        self.client.get(self.balance_url)
+
+        with transaction.atomic():
+            lock_balances([self.customer.id])
+            loans = load_open_loans([self.customer.id])[self.customer.id]
+            payment = Payment.objects.create(external_id='payment_01', customer=self.customer,
+                                             total_amount=Decimal('400'), paid_at=timezone.now())
+            allocate_payments([payment], {self.customer.id: loans})
+            # Cached again from the last committed state while the payment is in flight.
+            self.assertEqual(self.read_balance_in_other_connection(), 1000.0)
+
+        self.assertEqual(json.loads(self.client.get(self.balance_url).content)['total_debt'], 600.0)
+        self.assertEqual(self.read_balance_in_other_connection(), 600.0)
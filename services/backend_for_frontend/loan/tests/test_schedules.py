@@ -0,0 +1,134 @@
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import ContractTerms, Customer, Loan, LoanInstallment
+from loan.schedules import amortize
+
+
+class ScheduleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        self.customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('1000000'), preapproved_at=timezone.now()
+        )
+        ContractTerms.objects.create(contract_version='1.0', installments=3, period_days=30,
+                                     annual_rate=Decimal('0.12'))
+
+    def create_loan(self, external_id, contract_version='1.0', amount=1000.0):
+        payload = {'external_id': external_id, 'customer': self.customer.id, 'amount': amount,
+                   'contract_version': contract_version, 'maximum_payment_date': '2024-02-12T22:29:27Z'}
+        response = self.client.post(reverse('loan-list'), data=payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        return json.loads(response.content)['id']
+
+    def test_schedule_of_a_new_loan(self):
+        loan_id = self.create_loan('external_01-01')
+        response = self.client.get(reverse('loan-schedule', args=[loan_id]))
+        self.assertEqual(response.status_code, 200)
+        schedule = json.loads(response.content)
+        self.assertEqual((schedule['loan'], schedule['contract_version']), (loan_id, '1.0'))
+        self.assertEqual(
+            [(row['number'], row['due_date'], row['payment'], row['principal'], row['interest'], row['balance'])
+             for row in schedule['installments']],
+            [(1, '2023-12-14T22:29:27Z', '339.93', '330.07', '9.86', '669.93'),
+             (2, '2024-01-13T22:29:27Z', '339.93', '333.32', '6.61', '336.61'),
+             (3, '2024-02-12T22:29:27Z', '339.93', '336.61', '3.32', '0.00')],
+        )
+
+    def test_loans_without_terms_get_a_single_installment(self):
+        loan_id = self.create_loan('external_01-01', contract_version='unknown')
+        installments = json.loads(self.client.get(reverse('loan-schedule', args=[loan_id])).content)['installments']
+        self.assertEqual([(row['principal'], row['interest'], row['balance']) for row in installments],
+                         [('1000.00', '0.00', '0.00')])
+
+    def test_bulk_origination_inserts_schedules_in_batches(self):
+        items = [
+            {'external_id': f'external_01-{i:03}', 'customer': self.customer.id, 'amount': '100.00',
+             'contract_version': '1.0' if i % 2 else '2.0', 'maximum_payment_date': '2024-02-12T22:29:27Z'}
+            for i in range(50)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('loan-bulk'), data=items, format='json')
+        self.assertEqual(response.status_code, 201)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "loan_loaninstallment"')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(LoanInstallment.objects.count(), 25 * 3 + 25)
+
+    def test_schedule_follows_loan_changes(self):
+        loan_id = self.create_loan('external_01-01')
+        url = reverse('loan-schedule', args=[loan_id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries if 'loan_loaninstallment' in query['sql']])
+
+        self.client.patch(reverse('loan-detail', args=[loan_id]), data={'amount': 300.0}, format='json')
+        installments = json.loads(self.client.get(url).content)['installments']
+        self.assertEqual(sum(Decimal(row['principal']) for row in installments), Decimal('300.00'))
+
+        self.client.delete(reverse('loan-detail', args=[loan_id]))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_command_generates_missing_schedules(self):
+        maximum_payment_date = datetime(2024, 2, 12, tzinfo=dt_timezone.utc)
+        for i in range(5):
+            Loan.objects.create(external_id=f'imported_{i}', customer=self.customer, amount=Decimal('500'),
+                                outstanding=Decimal('500'), contract_version='1.0',
+                                maximum_payment_date=maximum_payment_date)
+        self.create_loan('external_01-01')
+
+        out = StringIO()
+        call_command('generate_schedules', chunk_size=2, stdout=out)
+        self.assertIn('Generated 15 installment(s) for 5 loan(s).', out.getvalue())
+        self.assertEqual(LoanInstallment.objects.filter(number=3).count(), 6)
+        self.assertEqual(LoanInstallment.objects.get(loan__external_id='imported_0', number=1).due_date,
+                         maximum_payment_date - timedelta(days=60))
+
+    def test_terms_need_installments_and_a_period(self):
+        url = reverse('contractterms-list')
+        response = self.client.post(url, data={'contract_version': '2.0', 'installments': 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('installments', json.loads(response.content))
+
+        response = self.client.post(url, data={'contract_version': '2.0', 'installments': 3, 'period_days': 0},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('period_days', json.loads(response.content))
+
+        response = self.client.post(url, data={'contract_version': '2.0', 'installments': 1, 'period_days': 0},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        terms_id = json.loads(response.content)['id']
+        response = self.client.patch(reverse('contractterms-detail', args=[terms_id]), data={'installments': 2},
+                                     format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_amortize_adds_up_for_every_loan(self):
+        amounts = [1, 99, 100000, 33333, 123456789]
+        payment, principal, interest, balance = amortize(amounts, 12, 0.2 * 30 / 365)
+        self.assertEqual(principal.sum(axis=1).tolist(), amounts)
+        self.assertEqual((payment == principal + interest).all(), True)
+        self.assertEqual(balance[:, -1].tolist(), [0] * len(amounts))
+        self.assertEqual(len(set(payment[-1, :-1].tolist())), 1)
@@ -0,0 +1,74 @@
+import json
+from decimal import Decimal
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.conf import settings
+from loan.models import Customer, Loan
+
+
+class SparseFieldsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.register_admin_url = reverse('register-admin')
+        self.loan_url = reverse('loan-list')
+        self.admin_payload = {
+            'secret_key': settings.SINGLE_USE_CREATE_CUSTOMER_SECRET_KEY,
+            'username': 'admin',
+            'password': 'adminpassword'
+        }
+
+        response = self.client.post(self.register_admin_url, data=self.admin_payload)
+        self.admin_api_key = json.loads(response.content)['api_key']
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key ' + self.admin_api_key)
+
+        customer = Customer.objects.create(
+            external_id='external_01', status=1, score=Decimal('4000'), preapproved_at=timezone.now()
+        )
+        for i in range(3):
+            Loan.objects.create(external_id=f'external_01-{i:02}', customer=customer, amount=Decimal('1000'),
+                                outstanding=Decimal('750'), maximum_payment_date=timezone.now())
+
+    def loan_queries(self, queries):
+        return [query['sql'] for query in queries if 'FROM "loan_loan"' in query['sql']]
+
+    def test_fields_trim_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.loan_url, {'fields': 'external_id,status,outstanding'})
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)['results']
+        self.assertEqual(results[0], {'external_id': 'external_01-00', 'status': 1, 'outstanding': '750.00'})
+
+        [sql] = self.loan_queries(queries)
+        self.assertIn('"outstanding"', sql)
+        self.assertNotIn('"amount"', sql)
+        self.assertNotIn('"created_at"', sql)
+
+    def test_pagination_works_without_id(self):
+        response = self.client.get(self.loan_url, {'fields': 'external_id', 'page_size': 2})
+        data = json.loads(response.content)
+        self.assertEqual(data['results'], [{'external_id': 'external_01-00'}, {'external_id': 'external_01-01'}])
+
+        data = json.loads(self.client.get(data['next']).content)
+        self.assertEqual(data['results'], [{'external_id': 'external_01-02'}])
+
+    def test_exclude_and_retrieve(self):
+        loan = Loan.objects.first()
+        response = self.client.get(reverse('loan-detail', args=[loan.id]),
+                                   {'exclude': 'created_at,updated_at,taken_at'})
+        data = json.loads(response.content)
+        self.assertEqual(data['external_id'], loan.external_id)
+        self.assertNotIn('created_at', data)
+        self.assertNotIn('taken_at', data)
+        self.assertIn('amount', data)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(self.loan_url, {'fields': 'external_id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'fields': ['Unknown field(s): password']})
+
+        response = self.client.get(reverse('customer-list'), {'fields': 'id', 'exclude': 'id'})
+        self.assertEqual(response.status_code, 400)
@@ -1,13 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (CustomerViewSet, LoanViewSet, PaymentViewSet, 
-                    PaymentDetailViewSet)
+                    PaymentDetailViewSet, ContractTermsViewSet, EventViewSet, ReportViewSet)
 
 router = DefaultRouter()
 router.register(r'customers', CustomerViewSet)
 router.register(r'loans', LoanViewSet)
 router.register(r'payments', PaymentViewSet)
 router.register(r'payment-detail', PaymentDetailViewSet,  basename='payment-detail')
+router.register(r'contract-terms', ContractTermsViewSet)
+router.register(r'events', EventViewSet, basename='event')
+router.register(r'reports', ReportViewSet, basename='report')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,118 +1,284 @@
+import time
+from datetime import date
 from decimal import Decimal
 
-from django.db.models import Sum
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_api_key.permissions import HasAPIKey
 
-from .models import Customer, Loan, Payment, PaymentDetail
+from .allocation import allocate_payments, load_open_loans, queued_amount
+from .bulk import bulk_status, ingest_payments, originate_loans, transition_loans
+from .ledger import apply_balance_deltas, ensure_balances, lock_balances, record_score_change
+from .cache import response_cache
+from .idempotency import idempotent
+from .mixins import CachedDetailMixin, ConditionalRetrieveMixin, ExportMixin, FastReadMixin
+from .models import (
+    AllocationTask, ContractTerms, Customer, CustomerBalance, Loan, Payment, PaymentDetail, OPEN_LOAN_STATUSES
+)
+from .outbox import loan_created_events, payment_confirmed_events, read_events, record_events
+from .reports import portfolio_report
+from .schedules import build_schedules
 from .serializers import (
-    CustomerSerializer, LoanSerializer, PaymentSerializer, 
-    PaymentDetailSerializer, CustomerBalanceSerializer
+    CustomerSerializer, CustomerBulkSerializer, LoanSerializer, PaymentSerializer, 
+    PaymentDetailSerializer, CustomerBalanceSerializer, OutboxEventSerializer, LoanTransitionSerializer,
+    ContractTermsSerializer, LoanInstallmentSerializer
 )
 from backend_for_frontend.permissions import HasCustomAPIKey
+from backend_for_frontend.routers import replica_reads
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(CachedDetailMixin, ConditionalRetrieveMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated, HasCustomAPIKey]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         is_many = isinstance(request.data, list)
+        if is_many and len(request.data) > settings.BULK_MAX_ITEMS:
+            return Response({'error': f'A batch cannot have more than {settings.BULK_MAX_ITEMS} items'},
+                            status=status.HTTP_400_BAD_REQUEST)
         if is_many:
             for customer_data in request.data:
                 customer_data['status'] = 1  # Set status to Active by default
         else:
             request.data['status'] = 1  # Set status to Active by default
 
-        serializer = self.get_serializer(data=request.data, many=is_many)
+        if is_many:
+            serializer = CustomerBulkSerializer(data=request.data, many=True,
+                                                context=self.get_serializer_context())
+        else:
+            serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+
+        try:
+            self.perform_create(serializer)
+        except IntegrityError:
+            return Response({'error': 'A customer with the same external id was created concurrently'},
+                            status=status.HTTP_409_CONFLICT)
+
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            customers = serializer.instance if isinstance(serializer.instance, list) else [serializer.instance]
+            CustomerBalance.objects.bulk_create(
+                [CustomerBalance(customer=customer, available_amount=customer.score) for customer in customers],
+                batch_size=settings.BULK_BATCH_SIZE,
+            )
+            if isinstance(serializer.instance, list):  # bulk_create skips the invalidation signals
+                response_cache.invalidate('customer', [customer.pk for customer in customers])
+                response_cache.invalidate('balance', [customer.pk for customer in customers])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+            record_score_change(serializer.instance)
+
     @action(detail=True, methods=['get'])
     def balance(self, request, pk=None):
-        customer = self.get_object()
-        serializer = CustomerBalanceSerializer(customer)
-        return Response(serializer.data)
+        def compute():
+            customer = self.get_object()
+            balance = ensure_balances([customer.id])[customer.id]
+            balance.customer = customer
+            return dict(CustomerBalanceSerializer(balance).data)
+
+        return Response(response_cache.get_or_set('balance', self.get_cache_pk(), compute))
 
-class LoanViewSet(viewsets.ModelViewSet):
+class LoanViewSet(CachedDetailMixin, ConditionalRetrieveMixin, FastReadMixin, ExportMixin,
+                  viewsets.ModelViewSet):
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
     permission_classes = [IsAuthenticated, HasCustomAPIKey]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         customer = serializer.validated_data['customer']
+        amount = serializer.validated_data['amount']
 
-        total_debt = Loan.objects.filter(customer=customer, status__in=[1, 2]).aggregate(total=Sum('outstanding'))['total'] or 0
+        serializer.validated_data['status'] = 1 
+        serializer.validated_data['outstanding'] = amount
 
-        if serializer.validated_data['amount'] + total_debt > customer.score:
-            return Response({'error': 'Loan amount exceeds customer credit limit'}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            # Serializes concurrent loans of this customer only.
+            balance = lock_balances([customer.id])[customer.id]
 
-        serializer.validated_data['status'] = 1 
-        serializer.validated_data['outstanding'] = serializer.validated_data['amount'] 
+            if amount + balance.total_debt > customer.score:
+                return Response({'error': 'Loan amount exceeds customer credit limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+            self.perform_create(serializer)
+            build_schedules([serializer.instance])
+            apply_balance_deltas({customer.id: (amount, 1)})
+            record_events(loan_created_events([serializer.instance]))
 
-        self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of loans'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > settings.BULK_MAX_ITEMS:
+            return Response({'error': f'A batch cannot have more than {settings.BULK_MAX_ITEMS} items'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        result = originate_loans(request.data)
+        return Response(result, status=bulk_status(result))
+
+    @action(detail=False, methods=['post'])
+    def activate(self, request):
+        """Move a batch of Pending loans to Active."""
+        return self.transition(request, 2)
+
+    @action(detail=False, methods=['post'])
+    def reject(self, request):
+        """Move a batch of Pending loans to Rejected."""
+        return self.transition(request, 3)
+
+    @action(detail=True, methods=['get'])
+    def schedule(self, request, pk=None):
+        def compute():
+            loan = self.get_object()
+            installments = loan.installments.order_by('number')
+            return {
+                'loan': loan.id,
+                'contract_version': loan.contract_version,
+                'installments': [dict(row) for row in LoanInstallmentSerializer(installments, many=True).data],
+            }
+
+        return Response(response_cache.get_or_set('schedule', self.get_cache_pk(), compute))
+
+    def transition(self, request, new_status):
+        serializer = LoanTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(transition_loans(serializer.validated_data['ids'], serializer.validated_data['external_ids'],
+                                         new_status))
+
+    def perform_update(self, serializer):
+        previous_customer_id = serializer.instance.customer_id
+        previous_terms = self.schedule_inputs(serializer.instance)
+        with transaction.atomic():
+            new_customer = serializer.validated_data.get('customer')
+            if new_customer is not None and new_customer.id != previous_customer_id:
+                lock_balances([previous_customer_id, new_customer.id])
+                serializer.instance.refresh_from_db(fields=['status', 'outstanding'])
+            super().perform_update(serializer)
+            loan = serializer.instance
+            if loan.customer_id != previous_customer_id and loan.status in OPEN_LOAN_STATUSES:
+                apply_balance_deltas({
+                    previous_customer_id: (-loan.outstanding, -1),
+                    loan.customer_id: (loan.outstanding, 1),
+                })
+            if self.schedule_inputs(loan) != previous_terms:
+                build_schedules([loan])
+
+    @staticmethod
+    def schedule_inputs(loan):
+        return loan.amount, loan.contract_version, loan.maximum_payment_date
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            lock_balances([instance.customer_id])
+            instance.refresh_from_db(fields=['status', 'outstanding'])
+            super().perform_destroy(instance)
+            if instance.status in OPEN_LOAN_STATUSES:
+                apply_balance_deltas({instance.customer_id: (-instance.outstanding, -1)})
+
+class PaymentViewSet(CachedDetailMixin, ConditionalRetrieveMixin, FastReadMixin, ExportMixin,
+                     viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated, HasCustomAPIKey]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
-        
         request.data['status'] = 1
 
-        customer_id = request.data.get('customer')
-        customer = Customer.objects.get(id=customer_id)
-        total_debt = Loan.objects.filter(customer=customer, status__in=[1, 2]).aggregate(
-            total=Sum('outstanding'))['total'] or 0
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        total_amount = Decimal(request.data.get('total_amount'))
+        customer = serializer.validated_data['customer']
 
-        if total_amount > total_debt:
-            return Response({'error': 'Payment amount exceeds total debt'},
-                            status=status.HTTP_400_BAD_REQUEST)
+        if settings.PAYMENT_ALLOCATION == 'async':
+            return self.create_queued(serializer)
+
+        with transaction.atomic():
+            # Serializes concurrent payments of this customer only; the loans
+            # are read after taking the lock so the debt check sees every
+            # allocation committed before it. Payments still queued from async
+            # mode keep their share of the debt.
+            lock_balances([customer.id])
+            loans = load_open_loans([customer.id])[customer.id]
+            total_debt = sum((loan.outstanding for loan in loans), Decimal(0)) - queued_amount(customer.id)
 
-        payment = super().create(request, *args, **kwargs)
-        payment_instance = Payment.objects.get(id=payment.data['id'])
+            if serializer.validated_data['total_amount'] > total_debt:
+                return Response({'error': 'Payment amount exceeds total debt'},
+                                status=status.HTTP_400_BAD_REQUEST)
 
-        loans = Loan.objects.filter(customer=customer, status__in=[1, 2]).order_by(
-            'maximum_payment_date')
+            self.perform_create(serializer)
+            allocate_payments([serializer.instance], {customer.id: loans})
+
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-        for loan in loans:
-            if total_amount <= 0:
-                break
+    def create_queued(self, serializer):
+        """Persist the payment and leave its allocation to the allocation workers."""
+        customer = serializer.validated_data['customer']
 
-            outstanding = loan.outstanding
+        with transaction.atomic():
+            # The ledger already counts allocated payments; queued ones are
+            # taken off here so they cannot be paid twice.
+            balance = lock_balances([customer.id])[customer.id]
+            if serializer.validated_data['total_amount'] > balance.total_debt - queued_amount(customer.id):
+                return Response({'error': 'Payment amount exceeds total debt'},
+                                status=status.HTTP_400_BAD_REQUEST)
 
-            if total_amount >= outstanding:
-                loan.outstanding = 0
-                loan.status = 4  # Paid
-                loan_instance = Loan.objects.get(id=loan.id)
-                PaymentDetail.objects.create(payment=payment_instance, loan=loan_instance, amount=outstanding)
-                total_amount -= outstanding
-            else:
-                loan.outstanding -= total_amount
-                loan_instance = Loan.objects.get(id=loan.id)
-                PaymentDetail.objects.create(payment=payment_instance, loan=loan_instance, amount=total_amount)
-                total_amount = 0
+            self.perform_create(serializer)
+            AllocationTask.objects.create(payment=serializer.instance, customer=customer)
 
-            loan.save()
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED, headers=headers)
 
-        serializer = self.get_serializer(payment_instance)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    @action(detail=True, methods=['get'])
+    def allocation(self, request, pk=None):
+        payment = self.get_object()
+        task = AllocationTask.objects.filter(payment=payment).first()
+        if task is None:
+            return Response({'payment': payment.id, 'state': 'allocated', 'attempts': None, 'last_error': None})
+        return Response({
+            'payment': payment.id,
+            'state': 'queued' if task.status == 1 else 'failed',
+            'attempts': task.attempts,
+            'last_error': task.last_error or None,
+        })
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of payments'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > settings.BULK_MAX_ITEMS:
+            return Response({'error': f'A batch cannot have more than {settings.BULK_MAX_ITEMS} items'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            result = ingest_payments(request.data)
+        except IntegrityError:
+            # Another request inserted one of the external ids after the duplicate check.
+            return Response({'error': 'A payment with the same external id was created concurrently'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(result, status=bulk_status(result))
 
     @action(detail=True, methods=['patch'])
     def confirm(self, request, pk=None):
@@ -121,13 +287,121 @@ class PaymentViewSet(viewsets.ModelViewSet):
         if payment.status != 1:  # Solo se pueden confirmar pagos pendientes
             return Response({'error': 'Payment is not in pending status'}, status=status.HTTP_400_BAD_REQUEST)
 
-        payment.status = 2
-        payment.save()
+        with transaction.atomic():
+            payment.status = 2
+            payment.save()
+            record_events(payment_confirmed_events(payment))
         serializer = self.get_serializer(payment)
         return Response(serializer.data)
 
 
-class PaymentDetailViewSet(viewsets.ReadOnlyModelViewSet):
+class PaymentDetailViewSet(CachedDetailMixin, ConditionalRetrieveMixin, FastReadMixin, ExportMixin,
+                           viewsets.ReadOnlyModelViewSet):
     queryset = PaymentDetail.objects.all()
     serializer_class = PaymentDetailSerializer
     permission_classes = [IsAuthenticated, HasCustomAPIKey]
+
+    def get_payment_filter(self):
+        payment_id = self.request.query_params.get('payment')
+        if not payment_id:
+            return None
+        try:
+            return int(payment_id)
+        except ValueError:
+            raise ValidationError({'payment': ['A valid integer is required.']})
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        payment_id = self.get_payment_filter()
+        if payment_id is not None:
+            queryset = queryset.filter(payment_id=payment_id)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        payment_id = self.get_payment_filter()
+        if payment_id is None:
+            return super().list(request, *args, **kwargs)
+
+        # The details of one payment, cached per page and ?fields= variant.
+        data = response_cache.get_or_set(
+            'payment-details', payment_id,
+            lambda: super(PaymentDetailViewSet, self).list(request, *args, **kwargs).data,
+            variant=request.build_absolute_uri(),
+        )
+        return Response(data)
+
+class ContractTermsViewSet(viewsets.ModelViewSet):
+    """
+    Installment terms per contract version. Schedules are generated with the
+    terms in force when the loan is created; changing them later does not
+    touch existing schedules (see ``manage.py generate_schedules --rebuild``).
+    """
+    queryset = ContractTerms.objects.all()
+    serializer_class = ContractTermsSerializer
+    permission_classes = [IsAuthenticated, HasCustomAPIKey]
+
+
+class EventViewSet(viewsets.ViewSet):
+    """
+    Change feed of loans and payments, read from the transactional outbox.
+
+    ``?after=<seq>`` returns the events that follow it; with ``?wait=<seconds>``
+    an empty read is retried until an event arrives or the time is up. Reads
+    only see events ``sequence_outbox`` has numbered. A waiting request holds
+    its worker thread, so long waits belong on ``/async/events/`` under ASGI.
+    """
+    permission_classes = [IsAuthenticated, HasCustomAPIKey]
+
+    def get_int_param(self, name, default, maximum=None):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({name: ['A valid integer is required.']})
+        if value < 0:
+            raise ValidationError({name: ['Ensure this value is greater than or equal to 0.']})
+        return min(value, maximum) if maximum is not None else value
+
+    def list(self, request):
+        after = self.get_int_param('after', 0)
+        limit = max(self.get_int_param('limit', settings.REST_FRAMEWORK['PAGE_SIZE'],
+                                       settings.PAGINATION_MAX_PAGE_SIZE), 1)
+        deadline = time.monotonic() + self.get_int_param('wait', 0, settings.EVENTS_MAX_WAIT)
+
+        events = read_events(after, limit)
+        while not events and time.monotonic() < deadline:
+            time.sleep(settings.EVENTS_POLL_INTERVAL)
+            events = read_events(after, limit)
+
+        # seq has no gaps, so a jump past ``after`` means the events in between were compacted.
+        if events and events[0].seq != after + 1:
+            return Response({'error': f'Events after {after} were compacted', 'oldest_seq': events[0].seq},
+                            status=status.HTTP_410_GONE)
+
+        return Response({
+            'events': OutboxEventSerializer(events, many=True).data,
+            'last_seq': events[-1].seq if events else after,
+        })
+
+
+class ReportViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated, HasCustomAPIKey]
+
+    @action(detail=False, methods=['get'])
+    def portfolio(self, request):
+        """Portfolio figures as of ``?as_of=YYYY-MM-DD`` (default today), cached per date."""
+        as_of = request.query_params.get('as_of')
+        try:
+            as_of = date.fromisoformat(as_of) if as_of else timezone.localdate()
+        except ValueError:
+            raise ValidationError({'as_of': ['Date has wrong format. Use one of these formats instead: YYYY-MM-DD.']})
+
+        def compute():
+            # Only expires, it is never invalidated, so a replica is as good as the primary.
+            with replica_reads():
+                return portfolio_report(as_of)
+
+        return Response(response_cache.get_or_set('portfolio', as_of.isoformat(), compute,
+                                                  timeout=settings.PORTFOLIO_REPORT_CACHE_TTL))